@@ -5,76 +5,315 @@
 #------------------------------------------------------------------------------#
 """
 Main function of adcirc-nn, calling inititialize, run, and finalize.
-"""
 
-from __future__ import print_function
+The command line is parsed and checked before the ADCIRC backend, and with it
+the shared library and MPI, is loaded in AdcircNN.coupler_initialize.
+"""
 
-from sys import version_info
+import argparse
+import os
 import time
-import ctypes as ct
-
-from pyADCIRC import libadcpy as pa
 
+IMPORT_START = time.perf_counter()
 if __name__ == '__main__':
-    from coupler.adcirc_nn_class import AdcircNN
+    from coupler import adcirc_backend
+    from coupler.adcirc_bc_sink import BC_SINKS
+    from coupler.adcirc_nn_class import AdcircNN, COUPLING_TYPES, NN_INPUTS
+    from coupler.coupler_log import configure_logging, log, LOG_LEVELS
+    from coupler.coupling_schedule import CouplingSchedule
+    from coupler.lstmnn import LongShortTermMemoryNN_class, NN_PRECISIONS
+    from coupler.nn_ensemble import ensemble_statistic
+    from coupler.nn_pipeline import NN_PIPELINE_MODES
+    from coupler.series_interpolation import SERIES_INTERPOLATIONS
 else:
-    from .coupler.adcirc_nn_class import AdcircNN
+    from .coupler import adcirc_backend
+    from .coupler.adcirc_bc_sink import BC_SINKS
+    from .coupler.adcirc_nn_class import AdcircNN, COUPLING_TYPES, NN_INPUTS
+    from .coupler.coupler_log import configure_logging, log, LOG_LEVELS
+    from .coupler.coupling_schedule import CouplingSchedule
+    from .coupler.lstmnn import LongShortTermMemoryNN_class, NN_PRECISIONS
+    from .coupler.nn_ensemble import ensemble_statistic
+    from .coupler.nn_pipeline import NN_PIPELINE_MODES
+    from .coupler.series_interpolation import SERIES_INTERPOLATIONS
+IMPORT_TIME = time.perf_counter() - IMPORT_START
 
 
 ################################################################################
-DEBUG_LOCAL = 1
-
 __all__ = ['main'] # The only thing from this module to import if needed.
 
 ################################################################################
-def main():
+def edge_string_ids(text):
+    """Check an ADCIRC edge string ID, or a comma separated list of them."""
+    try:
+        ids = [int(i) for i in text.split(',')]
+    except ValueError:
+        ids = []
+    if not ids or min(ids) < 1 or len(set(ids)) != len(ids):
+        raise argparse.ArgumentTypeError(
+            'expected distinct 1-based edge string IDs, e.g., 1 or 1,3; got {!r}'.format(text))
+    return text
+
+################################################################################
+def weights_files(text):
+    """Check an NN weights file, or a comma separated list of one per edge string.
+
+    An empty entry of the list leaves that edge string to the analytic
+    hydrograph. Returns the file, or the list with None for the empty entries.
+    """
+    files = [name.strip() or None for name in text.split(',')]
+    missing = [name for name in files if name is not None and not os.path.isfile(name)]
+    if missing or files == [None]:
+        raise argparse.ArgumentTypeError('expected NN weights .npz files, e.g., w.npz or '
+            'w1.npz,,w3.npz; not found: {}'.format(', '.join(missing) or repr(text)))
+    return files[0] if len(files) == 1 else files
+
+################################################################################
+def positive_int(text):
+    """Check a count of at least 1."""
+    try:
+        value = int(text)
+    except ValueError:
+        value = 0
+    if value < 1:
+        raise argparse.ArgumentTypeError('expected an integer of at least 1; got {!r}'.format(text))
+    return value
+
+################################################################################
+def nonnegative_int(text):
+    """Check a count of at least 0."""
+    try:
+        value = int(text)
+    except ValueError:
+        value = -1
+    if value < 0:
+        raise argparse.ArgumentTypeError('expected an integer of at least 0; got {!r}'.format(text))
+    return value
+
+################################################################################
+def positive_float(text):
+    """Check a number greater than 0."""
+    try:
+        value = float(text)
+    except ValueError:
+        value = 0.0
+    if not value > 0.0:
+        raise argparse.ArgumentTypeError('expected a number greater than 0; got {!r}'.format(text))
+    return value
+
+################################################################################
+def nonnegative_float(text):
+    """Check a number of at least 0."""
+    try:
+        value = float(text)
+    except ValueError:
+        value = -1.0
+    if not value >= 0.0:
+        raise argparse.ArgumentTypeError('expected a number of at least 0; got {!r}'.format(text))
+    return value
+
+################################################################################
+def dropout_rate(text):
+    """Check a dropout rate in [0, 1)."""
+    value = nonnegative_float(text)
+    if value >= 1.0:
+        raise argparse.ArgumentTypeError('expected a rate in [0, 1); got {!r}'.format(text))
+    return value
+
+################################################################################
+def statistic_name(text):
+    """Check an NN ensemble statistic, e.g., mean, median, p90, or member0."""
+    try:
+        ensemble_statistic(text)
+    except ValueError as err:
+        raise argparse.ArgumentTypeError(str(err))
+    return text
+
+################################################################################
+def parse_args(args=None):
+    """Parse and check the command line, or the list args."""
+    parser = argparse.ArgumentParser(prog='adcirc_nn',
+            description='Physics based machine learning with ADCIRC.')
+    parser.add_argument('couplingtype', choices=COUPLING_TYPES,
+            help='coupling type; the NN (n) and ADCIRC (A) in the order they run')
+    parser.add_argument('edgestrings', type=edge_string_ids,
+            help='ADCIRC edge string ID, or a comma separated list of them')
+
+    parser.add_argument('--nn-weights', type=weights_files, metavar='FILE', dest='nnweights',
+            help='.npz file of trained LSTM weights, or a comma separated list of one per edge '
+                 'string, empty for the analytic hydrograph (default: the analytic hydrograph)')
+
+    plan = parser.add_argument_group('dry run')
+    plan.add_argument('--plan', action='store_true',
+            help='print the coupling plan without initializing ADCIRC')
+    plan.add_argument('--adcirc-dt', type=positive_float, metavar='DTDP',
+            help='ADCIRC time step in seconds')
+    plan.add_argument('--rnday', type=positive_float, metavar='RNDAY', help='run length in days')
+    plan.add_argument('--statim', type=float, default=0.0, metavar='STATIM',
+            help='starting time in days (default: %(default)s)')
+
+    coupling = parser.add_argument_group('coupling')
+    coupling.add_argument('--bc-sink', choices=tuple(sorted(BC_SINKS)), dest='bcsink',
+            help='how the boundary series reaches ADCIRC, in memory or through fort.19 '
+                 '(default: memory)')
+    coupling.add_argument('--nn-input', choices=NN_INPUTS, dest='nninput',
+            help='mean ADCIRC variable of each edge string driving the NN (default: depth)')
+    coupling.add_argument('--history-length', type=positive_int, metavar='INTERVALS',
+            dest='historylength', help='ADCIRC intervals kept as the NN input window')
+    coupling.add_argument('--nn-pipeline', choices=NN_PIPELINE_MODES, dest='nnpipeline',
+            help='run the NN ahead of ADCIRC on a thread, a process, or a sidecar process, '
+                 'in ndA coupling')
+    coupling.add_argument('--nn-pipeline-depth', type=positive_int, metavar='INTERVALS',
+            dest='nnpipelinedepth', help='NN intervals run ahead of ADCIRC by the pipeline')
+    coupling.add_argument('--checkpoint', type=nonnegative_int, metavar='STEPS', dest='checkpointinterval',
+            help='checkpoint every STEPS ADCIRC time steps (default: with the hot start files)')
+    coupling.add_argument('--resume', action='store_true',
+            help='resume from the checkpoint of the ADCIRC hot start')
+    coupling.add_argument('--coupling-tol', type=positive_float, metavar='TOL', dest='couplingtol',
+            help='merge coupling intervals while the series changes by less than TOL')
+    coupling.add_argument('--coupling-max-span', type=positive_int, metavar='INTERVALS',
+            dest='couplingmaxspan', help='at most INTERVALS merged')
+    coupling.add_argument('--series-interp', choices=SERIES_INTERPOLATIONS, dest='seriesinterp',
+            help='series fed to ADCIRC within a coupling interval (default: linear)')
+    coupling.add_argument('--series-pieces', type=positive_int, metavar='PIECES', dest='seriespieces',
+            help='linear pieces per interval of the pchip series')
+    coupling.add_argument('--nn-cache', type=positive_int, metavar='RUNS', dest='nncachesize',
+            help='memoize up to RUNS NN runs in memory')
+    coupling.add_argument('--nn-cache-dir', metavar='DIR', dest='nncachedir',
+            help='also store the memoized NN runs in DIR')
+    coupling.add_argument('--nn-precision', choices=tuple(NN_PRECISIONS), dest='nnprecision',
+            help='precision of the NN arithmetic (default: float64)')
+    coupling.add_argument('--nn-shadow-check', type=nonnegative_int, metavar='RUNS', dest='nnshadowcheck',
+            help='in float32, check the NN against a float64 shadow over 10 NN runs every RUNS '
+                 'NN runs; 0 turns it off')
+    coupling.add_argument('--bc-output', action='store_true', dest='bcoutput',
+            help='stream the boundary series to a binary file per PE')
+    coupling.add_argument('--harvest', metavar='DIR',
+            help='record the NN inputs and outputs and the ADCIRC response as training data in DIR')
+    coupling.add_argument('--harvest-shard-size', type=positive_int, metavar='RECORDS',
+            dest='harvestshardsize', help='coupling intervals per training data shard')
+
+    ensemble = parser.add_argument_group('NN ensemble')
+    ensemble.add_argument('--nn-ensemble', type=positive_int, metavar='MEMBERS', dest='nnensemble',
+            help='run MEMBERS members of the NN together')
+    ensemble.add_argument('--nn-statistic', type=statistic_name, metavar='STATISTIC',
+            dest='nnstatistic',
+            help='statistic of the members handed to ADCIRC: mean, median, p<q>, or member<k> '
+                 '(default: mean)')
+    ensemble.add_argument('--nn-dropout', type=dropout_rate, metavar='RATE', dest='nndropout',
+            help='Monte Carlo dropout rate of the output layer input of each member')
+    ensemble.add_argument('--nn-forcing-noise', type=nonnegative_float, metavar='STD',
+            dest='nnforcingnoise',
+            help='standard deviation of the noise added to the normalized inputs of each member')
+
+    logs = parser.add_argument_group('logging')
+    logs.add_argument('--log-level', choices=tuple(LOG_LEVELS), dest='loglevel',
+            help='log messages at this level and above (default: info)')
+    logs.add_argument('--log-ranks', choices=('0', 'all'), dest='logranks',
+            help='PEs logging to stdout (default: 0)')
+    logs.add_argument('--log-file', metavar='BASENAME', dest='logfile',
+            help='also log each PE to BASENAME.<PE>.log')
+
+    options = parser.parse_args(args)
+    if options.plan and (options.adcirc_dt is None or options.rnday is None):
+        parser.error('the --plan dry run needs --adcirc-dt and --rnday')
+    if (isinstance(options.nnweights, list)
+            and len(options.nnweights) != len(options.edgestrings.split(','))):
+        parser.error('--nn-weights lists {} files for the {} edge strings {}'.format(
+            len(options.nnweights), len(options.edgestrings.split(',')), options.edgestrings))
+    if options.nnpipeline is not None and options.couplingtype != 'ndA':
+        parser.error('--nn-pipeline needs the one-way ndA coupling')
+    if options.nnpipelinedepth is not None and options.nnpipeline is None:
+        parser.error('--nn-pipeline-depth needs --nn-pipeline')
+    members = options.nnensemble or 1
+    if members == 1 and any(getattr(options, name) is not None
+            for name in ('nnstatistic', 'nndropout', 'nnforcingnoise')):
+        parser.error('--nn-statistic, --nn-dropout, and --nn-forcing-noise need --nn-ensemble '
+                     'of at least 2 members')
+    if members > 1 and ',' in options.edgestrings:
+        parser.error('an NN ensemble can be coupled to one edge string only')
+    if members > 1 and options.nnweights is None:
+        parser.error('an NN ensemble needs --nn-weights')
+    if (options.nnstatistic is not None and options.nnstatistic.startswith('member')
+            and int(options.nnstatistic[6:]) >= members):
+        parser.error('--nn-statistic {}: the NN ensemble has {} members'.format(
+            options.nnstatistic, members))
+    return options
+
+################################################################################
+def print_plan(options):
+    """Print the coupling plan without initializing ADCIRC.
+
+    The ADCIRC time step DTDP in seconds, and STATIM and RNDAY in days, are
+    taken from the --adcirc-dt, --statim, and --rnday options, and the NN time
+    step and final time from the --nn-weights, which all NNs of a list share.
+    """
+    weightsfiles = options.nnweights
+    if not isinstance(weightsfiles, list):
+        weightsfiles = [weightsfiles]
+    nn = LongShortTermMemoryNN_class(next((name for name in weightsfiles if name is not None), None))
+    nn.initialize()
+    dtdp, statim, rnday = options.adcirc_dt, options.statim, options.rnday
+    schedule = CouplingSchedule(nn.dt, nn.timer, nn.niter, dtdp, statim*86400.0,
+            (statim+rnday)*86400.0, int(rnday*86400.0/dtdp+0.5), nntimefact=nn.timefact,
+            adcircfirst=options.couplingtype in ('Adn', 'AdndA'))
+    print("Coupling plan for {}, {} going first:".format(options.couplingtype,
+        'ADCIRC' if schedule.adcircfirst else 'NN'))
+    schedule.print_plan()
+    return 0
+
+################################################################################
+def main(args=None):
     """Main function of adcirc-nn."""
 
-    argv = ct.POINTER(ct.c_wchar_p if version_info >= (3, ) else ct.c_char_p)()
-    argc = ct.c_int()
-    ct.pythonapi.Py_GetArgcArgv(ct.byref(argc), ct.byref(argv))
-
-    if DEBUG_LOCAL == 1:
-        print('Number of arguments passed to python: {}\nArgs:'.format(argc.value)),
-        for i in range(argc.value):
-            print('    {}'.format(argv[i]))
-        print
-    if (argc.value < 4):
-        print("\nProblem with command line arguments.")
-        print("Format is : python <*.py> <Coupling type> <ADCIRC edge string ID>")
-        print("Coupling type is one of {Adn, ndA, AdndA, ndAdn}")
-        print("Exiting without testing.")
-        return -1
-
-    print("Coupling type: {}".format(argv[argc.value-2]))
-    print("ADCIRC boundary string ID: {}".format(argv[argc.value-1]))
-
-    t0 = time.time()
-    print("Initializing adcirc-nn")
-    adcnn = AdcircNN()
-    adcnn.coupler_initialize(argc, argv)
-
-    t1 = time.time()
-    print("Running adcirc-nn")
+    options = parse_args(args)
+    # The log level and ranks apply from here on; the log file once the PE is known.
+    configure_logging(level=options.loglevel, ranks=options.logranks)
+
+    if options.plan:
+        return print_plan(options)
+
+    log.info("Coupling type: %s", options.couplingtype)
+    log.info("ADCIRC boundary string ID: %s", options.edgestrings)
+
+    # Options not given keep the defaults of AdcircNN.
+    settings = {name: getattr(options, name) for name in ('bcsink', 'nninput',
+        'historylength', 'nnpipeline', 'nnpipelinedepth', 'nnensemble', 'nnstatistic',
+        'nndropout', 'nnforcingnoise', 'checkpointinterval',
+        'couplingtol', 'couplingmaxspan', 'seriesinterp', 'seriespieces',
+        'nncachesize', 'nncachedir', 'loglevel', 'logranks', 'logfile', 'harvest',
+        'harvestshardsize', 'nnprecision', 'nnshadowcheck')
+        if getattr(options, name) is not None}
+
+    t0 = time.perf_counter()
+    log.info("Initializing adcirc-nn")
+    adcnn = AdcircNN(nnweights=options.nnweights, resume=options.resume,
+            bcoutput=options.bcoutput, **settings)
+    adcnn.coupler_initialize(options.couplingtype, options.edgestrings)
+
+    t1 = time.perf_counter()
+    log.info("Running adcirc-nn")
     adcnn.coupler_run()
 
-    t2 = time.time()
-    print("Finalizing adcirc-nn")
+    t2 = time.perf_counter()
+    log.info("Finalizing adcirc-nn")
     adcnn.coupler_finalize()
 
-    t3 = time.time()
+    t3 = time.perf_counter()
 
-    tInit = t1-t0
+    # The ADCIRC backend is imported in coupler_initialize; count it as import time.
+    tImport = IMPORT_TIME + adcirc_backend.backend_load_time
+    tInit = t1-t0 - adcirc_backend.backend_load_time
     tRun = t2-t1
     tFin = t3-t2
-    tTot = t3-t0
+    tTot = IMPORT_TIME + t3-t0 # backend_load_time is within t3-t0
 
-    print("Initialize time = {0}".format(tInit))
-    print("Run time        = {0}".format(tRun))
-    print("Finalize time   = {0}".format(tFin))
-    print("Total time      = {0}".format(tTot))
+    log.info("Import time     = %s", tImport)
+    log.info("Startup time    = %s", tInit)
+    log.info("Run time        = %s", tRun)
+    log.info("Finalize time   = %s", tFin)
+    log.info("Total time      = %s", tTot)
 
-    print("\nFinished running adcirc-nn")
+    log.info("\nFinished running adcirc-nn")
 
     return 0
 
@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+#------------------------------------------------------------------------------#
+# adcirc-nn - Software for physics-based machine learning with ADCIRC
+# LICENSE: BSD 3-Clause "New" or "Revised"
+#------------------------------------------------------------------------------#
+"""
+Sweep of independent adcirc-nn runs over a table of scenarios.
+
+Run as python -m adcirc_nn.adcirc_nn_sweep, or adcirc_nn_sweep once installed;
+the pool processes import this module by name, so it is not run as a script.
+"""
+
+import argparse
+import sys
+
+from .coupler.scenario_sweep import available_cores, read_scenarios, run_sweep
+
+################################################################################
+__all__ = ['main']
+
+################################################################################
+def parse_args(args=None):
+    """Parse the command line, or the list args."""
+    parser = argparse.ArgumentParser(prog='adcirc_nn_sweep',
+            description='Run independent adcirc-nn scenarios in a pool of processes.')
+    parser.add_argument('table',
+            help='CSV scenario table with columns name, couplingtype, edgestrings, inputdir, '
+                 'and any AdcircNN settings')
+    parser.add_argument('--sweep-dir', default='sweep', metavar='DIR', dest='sweepdir',
+            help='directory of the run directories and the index (default: %(default)s)')
+    parser.add_argument('--jobs', type=int, metavar='N',
+            help='scenarios run at once (default: the {} available cores)'.format(available_cores()))
+    parser.add_argument('--link-inputs', action='store_true', dest='link',
+            help='link the fort.* inputs into the run directories instead of copying them')
+    parser.add_argument('--no-retry', action='store_false', dest='retry',
+            help='do not rerun scenarios that failed in an earlier sweep')
+    return parser.parse_args(args)
+
+################################################################################
+def main(args=None):
+    """Run the sweep; return 1 if any scenario failed, 130 if interrupted."""
+
+    options = parse_args(args)
+    scenarios = read_scenarios(options.table)
+    print("Sweep of {} scenarios in {}".format(len(scenarios), options.sweepdir))
+    try:
+        index = run_sweep(scenarios, options.sweepdir, jobs=options.jobs, link=options.link,
+                retry=options.retry)
+    except KeyboardInterrupt:
+        print("Interrupted; rerun the sweep to resume it")
+        return 130
+    failed = [name for name, summary in index['scenarios'].items() if summary['status'] != 'done']
+    print("Finished {} of {} scenarios".format(len(index['scenarios']) - len(failed),
+        len(scenarios)))
+    if failed:
+        print("Failed: " + ', '.join(failed))
+    return int(bool(failed))
+
+################################################################################
+if __name__ == '__main__':
+    sys.exit(main())
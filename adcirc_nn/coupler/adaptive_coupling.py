@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+#------------------------------------------------------------------------------#
+# adcirc-nn - Software for physics-based machine learning with ADCIRC
+# LICENSE: BSD 3-Clause "New" or "Revised"
+#------------------------------------------------------------------------------#
+"""
+Adaptive coupling interval, driven by the rate of change of the boundary series.
+
+The intervals of the coupling plan are the finest at which NN and ADCIRC
+exchange data. While the boundary series changes slowly, several of them are
+run as one coupling interval, with a single exchange and boundary update; the
+number of plan intervals merged is chosen so that the series would change by
+at most a tolerance over the coupling interval at the largest slope of the last
+interval:
+    span = floor(tolerance/(max|slope|*dt)),
+limited to ADAPTIVE_COUPLING_MAX_SPAN plan intervals, and to growing by
+ADAPTIVE_COUPLING_GROWTH times per interval. The span drops back at once when
+the series rises quickly.
+"""
+import math
+
+import numpy as np
+
+from .coupler_log import log
+
+################################################################################
+ADAPTIVE_COUPLING_MAX_SPAN = 16 # Most plan intervals run as one coupling interval
+ADAPTIVE_COUPLING_GROWTH = 2    # Largest growth of the span from one interval to the next
+
+################################################################################
+class AdaptiveCoupling():
+    """Chooses the number of plan intervals of each coupling interval."""
+
+    #--------------------------------------------------------------------------#
+    def __init__(self, tolerance, maxspan=ADAPTIVE_COUPLING_MAX_SPAN,
+            growth=ADAPTIVE_COUPLING_GROWTH):
+        """Construct the controller for a change of the series of at most tolerance per interval."""
+        if tolerance <= 0.0:
+            raise ValueError('Adaptive coupling tolerance must be positive, not {}'.format(tolerance))
+        self.tolerance = float(tolerance)
+        self.maxspan = max(1, int(maxspan))
+        self.growth = max(1, int(growth))
+        self.span = 1
+        self.log = [] # (plan interval, span, max slope) at every change of the span
+
+    #--------------------------------------------------------------------------#
+    def choose(self, index, maxslope, dt):
+        """Return the span of the coupling interval starting at plan interval index.
+
+        maxslope is the largest absolute slope of the series in the last
+        interval, in units per second, and dt the duration in seconds of one
+        plan interval.
+        """
+        if maxslope*dt > 0.0:
+            span = int(min(self.maxspan, math.floor(self.tolerance/(maxslope*dt))))
+        else:
+            span = self.maxspan
+        span = max(1, min(span, self.span*self.growth))
+        if span != self.span or not self.log:
+            self.log.append((index, span, maxslope))
+        self.span = span
+        return span
+
+    #--------------------------------------------------------------------------#
+    def print_log(self):
+        """Log the span chosen at each change."""
+        log.info('Adaptive coupling, tolerance %s: span changes', self.tolerance)
+        log.info('%8s %6s %14s', 'interval', 'span', 'max slope')
+        for index, span, maxslope in self.log:
+            log.info('%8d %6d %14.6e', index, span, maxslope)
+
+################################################################################
+def series_max_slope(anns):
+    """Return the largest absolute slope of the coupled series over all PEs."""
+    maxslope = float(np.abs(anns.adcircseriesslope).max(initial=0.0))
+    if anns.pu.messg == anns.pu.on:
+        # All PEs must merge the same intervals.
+        maxslope = anns.pmsg.pymsg_dbl_max(maxslope, anns.adcirc_comm_comp)
+    return maxslope
+
+################################################################################
+if __name__ == '__main__':
+    pass
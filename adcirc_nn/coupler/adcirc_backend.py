@@ -0,0 +1,47 @@
+#!/usr/bin/env python
+#------------------------------------------------------------------------------#
+# adcirc-nn - Software for physics-based machine learning with ADCIRC
+# LICENSE: BSD 3-Clause "New" or "Revised"
+#------------------------------------------------------------------------------#
+"""
+Selection of the ADCIRC backend used by the coupler.
+
+The backend is chosen with the ADCIRC_NN_BACKEND environment variable:
+'pyadcirc' (default) for the compiled pyADCIRC library, or 'mock' for the pure
+Python stand-in of mock_libadcpy. It is imported on first use, in
+AdcircNN.coupler_initialize, so that importing adcirc_nn, the command line
+help, or a dry run do not load the shared library and MPI.
+"""
+import importlib
+import os
+import time
+
+################################################################################
+ADCIRC_BACKENDS = {'pyadcirc': 'pyADCIRC.libadcpy', 'mock': '.mock_libadcpy'}
+ADCIRC_BACKEND_DEFAULT = 'pyadcirc'
+
+_libadcpy = None
+backend_load_time = 0.0 # Seconds spent importing the backend
+
+################################################################################
+def adcirc_backend_name():
+    """Return the backend selected by ADCIRC_NN_BACKEND, without importing it."""
+    backend = os.environ.get('ADCIRC_NN_BACKEND', ADCIRC_BACKEND_DEFAULT)
+    if backend not in ADCIRC_BACKENDS:
+        raise ImportError('Unknown ADCIRC_NN_BACKEND {}; use one of {}'.format(
+            backend, tuple(ADCIRC_BACKENDS)))
+    return backend
+
+################################################################################
+def load_adcirc_backend():
+    """Return the libadcpy module of the selected backend, importing it on first use."""
+    global _libadcpy, backend_load_time
+    if _libadcpy is None:
+        t0 = time.perf_counter()
+        _libadcpy = importlib.import_module(ADCIRC_BACKENDS[adcirc_backend_name()], __package__)
+        backend_load_time = time.perf_counter() - t0
+    return _libadcpy
+
+################################################################################
+if __name__ == '__main__':
+    pass
@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+#------------------------------------------------------------------------------#
+# adcirc-nn - Software for physics-based machine learning with ADCIRC
+# LICENSE: BSD 3-Clause "New" or "Revised"
+#------------------------------------------------------------------------------#
+"""
+Boundary sinks handing the coupled elevation series over to ADCIRC.
+
+The 'memory' sink relies on ESBIN1/ESBIN2/ETIME1/ETIME2 being updated in place
+by the set-BC functions and does no file I/O per coupling interval. The 'file'
+sink keeps the fort.19 replacement path as a fallback, writing the whole series
+from one preformatted buffer instead of formatting it line by line.
+"""
+
+################################################################################
+BC_SINK_DEFAULT = 'memory'
+FORT19_UNIT = 19
+FORT19_FORMAT = '%10f\n'
+# Added to ETIME2 by the memory sink so that ADCIRC, stopping within TIME_TOL of
+# the NN time, never reads unit 19 for the next record of the series.
+MEMORY_SINK_ETIME_PAD = 1.0e-3
+
+################################################################################
+class AdcircBoundarySink():
+    """Base class of the ADCIRC elevation boundary sinks."""
+
+    name = ''
+
+    #--------------------------------------------------------------------------#
+    def __init__(self):
+        """Construct the boundary sink."""
+        self._fmtcache = {}
+
+    #--------------------------------------------------------------------------#
+    def _format(self, values, nrepeat=1):
+        """Return values repeated nrepeat times as one fort.19 text buffer."""
+        n = len(values)*nrepeat
+        fmt = self._fmtcache.get(n)
+        if fmt is None:
+            fmt = self._fmtcache[n] = FORT19_FORMAT*n
+        return fmt % (tuple(values.tolist())*nrepeat)
+
+    #--------------------------------------------------------------------------#
+    def _replace_fort19(self, anns, buffer):
+        """Close unit 19, replace the fort.19 copy with buffer, and reopen it."""
+        errorio = anns.pu.pycloseopenedfileforread(FORT19_UNIT)
+        assert(errorio==0)
+        with open(anns.adcircfort19pathname, 'w') as fort19file:
+            fort19file.write(buffer)
+        errorio = anns.pg.pyopenfileforread(FORT19_UNIT, anns.adcircfort19pathname)
+        assert(errorio==0)
+
+    #--------------------------------------------------------------------------#
+    def initialize(self, anns):
+        """Replace fort.19 once with the initial series for all sink types."""
+        from .adcirc_nn_class import SERIESLENGTH
+        self._replace_fort19(anns,
+                self._format(anns.pg.esbin2[:anns.pb.neta], SERIESLENGTH))
+
+    #--------------------------------------------------------------------------#
+    def update(self, anns):
+        """Publish ESBIN2/ETIME2 of the current coupling interval to ADCIRC."""
+        raise NotImplementedError
+
+    #--------------------------------------------------------------------------#
+    def reset(self, anns):
+        """Hand ADCIRC a zero series once the NN has stopped running."""
+        raise NotImplementedError
+
+    #--------------------------------------------------------------------------#
+    def restore(self, anns):
+        """Hand ADCIRC the series restored from a checkpoint; it is in memory already."""
+        pass
+
+################################################################################
+class MemoryBoundarySink(AdcircBoundarySink):
+    """Boundary sink that leaves the series in ADCIRC memory; no file I/O."""
+
+    name = 'memory'
+
+    #--------------------------------------------------------------------------#
+    def update(self, anns):
+        """Pad ETIME2 so that ADCIRC keeps interpolating the in-memory series."""
+        anns.pg.etime2 = anns.pg.etime2 + MEMORY_SINK_ETIME_PAD
+
+    #--------------------------------------------------------------------------#
+    def reset(self, anns):
+        """Do in memory what ADCIRC does when reading the zero fort.19 record."""
+        anns.pg.etime2 = anns.pg.etime1 + anns.pg.etiminc
+        anns.pg.esbin2[:anns.pb.neta] = 0.0
+
+################################################################################
+class FileBoundarySink(AdcircBoundarySink):
+    """Boundary sink that rewrites the fort.19 replacement every interval."""
+
+    name = 'file'
+
+    #--------------------------------------------------------------------------#
+    def update(self, anns):
+        """Write the current series twice, so ADCIRC holds it past ETIME2."""
+        self._replace_fort19(anns, self._format(anns.pg.esbin2[:anns.pb.neta], 2))
+
+    #--------------------------------------------------------------------------#
+    def reset(self, anns):
+        """Write a zero series for ADCIRC to read at its next time step."""
+        from .adcirc_nn_class import SERIESLENGTH
+        self._replace_fort19(anns,
+                '0.0\n'*(anns.adcircedgestringnnodes*SERIESLENGTH))
+
+    #--------------------------------------------------------------------------#
+    def restore(self, anns):
+        """Rewrite the fort.19 replacement as it was when the checkpoint was taken."""
+        if anns.nn.runflag != anns.pu.off:
+            self.update(anns)
+        else:
+            self.reset(anns)
+
+################################################################################
+BC_SINKS = {sink.name: sink for sink in (MemoryBoundarySink, FileBoundarySink)}
+
+def make_adcirc_bc_sink(name=BC_SINK_DEFAULT):
+    """Return a new boundary sink of the given type, 'memory' or 'file'."""
+    if name not in BC_SINKS:
+        raise ValueError('Unknown ADCIRC boundary sink {}; use one of {}'.format(
+            name, sorted(BC_SINKS)))
+    return BC_SINKS[name]()
+
+################################################################################
+if __name__ == '__main__':
+    pass
@@ -6,43 +6,152 @@
 """
 The main adcirc-nn class.
 """
+import os
+
 import numpy as np
 
-from pyADCIRC import libadcpy
+from .adcirc_backend import load_adcirc_backend
 
+from .adaptive_coupling import AdaptiveCoupling, ADAPTIVE_COUPLING_MAX_SPAN, series_max_slope
+from .adcirc_bc_sink import BC_SINK_DEFAULT, make_adcirc_bc_sink
 from .adcirc_init_bc_func import adcirc_init_bc_from_nn_hydrograph
 from .adcirc_set_bc_func  import adcirc_set_bc_from_nn_hydrograph
+from .boundary_history import BOUNDARY_HISTORY_LENGTH
+from .boundary_series_output import BoundarySeriesWriter, BOUNDARY_SERIES_FILE_BASENAME
+from .coupler_checkpoint import CouplerCheckpoint, CHECKPOINT_FILE_BASENAME
+from .coupler_checkpoint import restore_checkpoint_state
+from .coupler_log import configure_logging, flush_log, log
+from .nn_init_bc_func import nn_init_bc_from_adcirc_depths
+from .nn_set_bc_func  import adcirc_edgestring_mean, allocate_edgestring_mean
+from .nn_set_bc_func  import nn_set_bc_from_adcirc_depths
+from .coupler_timers import CouplerTimers
+from .coupling_schedule import CouplingSchedule, merge_intervals
+from .nn_cache import NNRunCache, NN_CACHE_SIZE
+from .nn_ensemble import NNEnsemble, ENSEMBLE_FILE_BASENAME, ENSEMBLE_STATISTIC_DEFAULT
+from .nn_exchange import NNStateExchange, require_mpi4py
+from .nn_pipeline import NNPipeline, NN_PIPELINE_DEPTH
+from .nn_shadow_check import NNShadowCheck, NN_SHADOW_EVERY
+from .series_interpolation import SeriesInterpolator, SERIES_INTERPOLATIONS, SERIES_PIECES
+from .training_harvest import TrainingHarvest, HARVEST_SHARD_SIZE
 from .lstmnn import LongShortTermMemoryNN_class as nn
+from .lstmnn import BatchedLongShortTermMemoryNN_class as batchnn
 
 #------------------------------------------------------------------------------#
 TIME_TOL = 1.0e-3
 SERIESLENGTH = 4 #This is the MINIMUM number of lines required in an ADCIRC series to be coupled. Compulsory.
-DEBUG_LOCAL = 1
+NN_INPUTS = ('depth', 'elev') # ADCIRC variables at the edge string that can drive the NN
+COUPLING_TYPES = ('Adn', 'ndA', 'AdndA', 'ndAdn')
 
 #------------------------------------------------------------------------------#
 class AdcircNN():
     """The main class of adcirc-nn."""
 
     #--------------------------------------------------------------------------#
-    def __init__(self):
-        """Inititialize AdcircNN class."""
-        self.pa    = libadcpy
-        self.ps    = libadcpy.sizes
-        self.pg    = libadcpy.pyglobal
-        self.pm    = libadcpy.pymesh
-        self.pmsg  = libadcpy.pymessenger
-        self.pb    = libadcpy.pyboundaries
-        self.pmain = libadcpy.pyadcirc_mod
-        self.pu    = libadcpy.utilities
+    def __init__(self, bcsink=BC_SINK_DEFAULT, nnweights=None, timing=None,
+            nnpipeline=None, nnpipelinedepth=NN_PIPELINE_DEPTH, nninput='depth',
+            historylength=BOUNDARY_HISTORY_LENGTH, nnensemble=1,
+            nnstatistic=ENSEMBLE_STATISTIC_DEFAULT, nndropout=0.0, nnforcingnoise=0.0,
+            checkpointinterval=None, resume=False, couplingtol=None,
+            couplingmaxspan=ADAPTIVE_COUPLING_MAX_SPAN, seriesinterp='linear',
+            seriespieces=SERIES_PIECES, nncachesize=0, nncachedir=None, bcoutput=False,
+            loglevel=None, logranks=None, logfile=None, harvest=None,
+            harvestshardsize=HARVEST_SHARD_SIZE, nnprecision='float64', nnshadowcheck=None):
+        """Inititialize AdcircNN class.
+
+        Boundary sink:
+            bcsink          : How the boundary series reaches ADCIRC, 'memory',
+                              or the fort.19 'file' fallback
+        NN:
+            nnweights       : .npz file of trained LSTM weights; without it, the
+                              NN gives an analytic hydrograph. With several
+                              edge strings, also a list of one file, or None,
+                              per edge string
+            nninput         : ADCIRC variable, 'depth' or 'elev', averaged over
+                              each edge string to drive the NN in the Adn,
+                              AdndA and ndAdn couplings
+            historylength   : ADCIRC intervals kept as the NN input window
+            nnensemble      : Members of the NN run together, differing by
+                              their weights, nndropout, or nnforcingnoise
+            nnstatistic     : Statistic of the members handed to ADCIRC, e.g.,
+                              'mean', 'p90', or 'member0'
+            nndropout       : Monte Carlo dropout rate of the members
+            nnforcingnoise  : Standard deviation of the noise added to the
+                              normalized inputs of the members
+            nnpipeline      : Runs the NN ahead of ADCIRC in ndA coupling, on a
+                              'thread', a 'process', or a 'sidecar' process
+                              publishing through shared memory
+            nnpipelinedepth : NN intervals the pipeline runs ahead of ADCIRC
+            nncachesize     : NN runs memoized in an LRU, for scenarios
+                              rerunning the same NN forcing
+            nncachedir      : Directory also keeping the memoized NN runs
+            nnprecision     : Precision of the NN arithmetic, 'float64' or
+                              'float32'
+            nnshadowcheck   : NN runs between the checks of a float32 NN
+                              against a float64 shadow run alongside it for
+                              NN_SHADOW_WINDOW runs, by default
+                              NN_SHADOW_EVERY; 0 turns the check off
+        Coupling:
+            checkpointinterval : ADCIRC time steps between checkpoints of the
+                              coupler state, by default with ADCIRC's hot start
+                              files every NHSINC time steps; 0 for none
+            resume          : Restart from the checkpoint of the ADCIRC hot start
+            couplingtol     : Runs up to couplingmaxspan intervals of the
+                              coupling plan as one while the boundary series
+                              changes by less than couplingtol over them
+            couplingmaxspan : Most intervals run as one
+            seriesinterp    : 'pchip' feeds ADCIRC a monotone cubic
+                              interpolant of the last NN outputs in the ndA and
+                              ndAdn couplings, rather than the 'linear' series
+            seriespieces    : Linear pieces per interval of the 'pchip' series
+        Output:
+            bcoutput        : Streams the series set by the NN in every coupling
+                              interval to a memory-mapped binary file per PE
+            harvest         : Directory recording the NN inputs and outputs and
+                              the ADCIRC response of every coupling interval as
+                              training data
+            harvestshardsize : Records per compressed training data shard
+        Logging:
+            loglevel        : Level of the messages logged, and above
+            logranks        : PEs logging to stdout, '0' or 'all'
+            logfile         : Every PE also logs to <logfile>.<PE>.log; see
+                              coupler_log
+            timing          : Turns on the per-phase timers of the coupling
+                              loop; defaults to ADCIRC_NN_TIMING
+        """
+        if nninput not in NN_INPUTS:
+            raise ValueError('Unknown NN input {}; use one of {}'.format(nninput, NN_INPUTS))
+        if seriesinterp not in SERIES_INTERPOLATIONS:
+            raise ValueError('Unknown series interpolation {}; use one of {}'.format(
+                seriesinterp, SERIES_INTERPOLATIONS))
+        # The ADCIRC backend is loaded in coupler_initialize.
+        self.pa    = None
+        self.ps    = None
+        self.pg    = None
+        self.pm    = None
+        self.pmsg  = None
+        self.pb    = None
+        self.pmain = None
+        self.pu    = None
 
         self.couplingtype = ""
         self.couplingntsteps = 1 # No. of ADCIRC time steps between coupled intervals; minimum = 1
         self.couplingdtfactor = 1
+        self.couplingtol = couplingtol
+        self.couplingmaxspan = couplingmaxspan
+        self.adaptivecoupling = None
+        self.couplingspan = 1 # Plan intervals in the current coupling interval
+        self.ncouplingintervals = 0
         self.npes = 0
         self.myid = 0
+        if timing is None:
+            timing = os.environ.get('ADCIRC_NN_TIMING', '0') not in ('', '0')
+        self.timers = CouplerTimers(timing)
+        self.loglevel = loglevel
+        self.logranks = logranks
+        self.logfile = logfile
 
         # ADCIRC data
-        self.adcircrunflag=self.pu.on
+        self.adcircrunflag=None
         self.adcircdt=0.0
         self.adcircnt=0
         self.adcirctstart=0.0
@@ -54,51 +163,115 @@ class AdcircNN():
         self.adcirc_comm_comp=0
 
         self.adcircseries=0
-        self.adcircedgestringid=self.pu.unset_int
-        self.adcircedgestringnnodes=self.pu.unset_int
+        self.adcircseriesslope=np.zeros(0) # Series slope at each edge string node
+        self.adcircseriesarea=np.zeros(0)  # Series area at each edge string node
+        self.adcircseriesinterp=seriesinterp
+        self.adcircseriespieces=seriespieces
+        self.seriesinterpolator=None
+        self.adcircbcoutput=bcoutput
+        self.bcwriter=None
+        self.harvestdir=harvest
+        self.harvestshardsize=harvestshardsize
+        self.harvest=None
+        self.harvestinputs=np.zeros((0, 0)) # NN inputs of the steps of the current interval
+        self.adcircedgestringid=None
+        self.adcircedgestringids=[] # All coupled edge strings; adcircedgestringid is the first
+        self.adcircedgestringnnodes=0 # Total over the coupled edge strings
+        self.adcircedgestringcounts=np.zeros(0, dtype=int) # Nodes of each edge string
+        self.adcircedgestringindices=np.zeros(0, dtype=int) # Coupled nodes in ESBIN arrays
+        self.adcircedgestringesbin=slice(0, 0) # Slice of the indices if contiguous, else the indices
+        self.adcircedgestringnodes=np.zeros(0, dtype=int) # 0-based mesh nodes of the edge strings
+        self.adcircedgestringboundary=np.zeros(0, dtype=int) # Edge string of each of these nodes
         self.adcircedgestringlen=0.0
         self.adcircfort19pathname=''
+        self.adcircrundir=''  # ADCIRC input directory, where the coupler writes its files
+        self.adcircbcsink=make_adcirc_bc_sink(bcsink)
         self.adcirc_hprev=0.0   # Avg depth
         self.adcirc_hprev_len=0.0   # count
+        self.adcirc_hprev_t=0.0     # ADCIRC time of adcirc_hprev
+        self.adcirchistorylength=historylength
+        self.adcirchistory=None     # Ring buffer of NN inputs from ADCIRC
 
         # Neural Network data
-        self.nn = nn()
+        self.nnweights = nnweights
+        self.nn = None # Built for the coupled edge strings in coupler_initialize
+        self.nnensemblesize=nnensemble
+        self.nnstatistic=nnstatistic
+        self.nndropout=nndropout
+        self.nnforcingnoise=nnforcingnoise
+        self.nnensemble=None
         self.effectivenndt=0.0
+        self.nnpipelinemode=nnpipeline
+        self.nnpipelinedepth=nnpipelinedepth
+        self.nnpipeline=None
+        self.nnexchange=NNStateExchange()
+        self.nninput=nninput
+        self.nncachesize=nncachesize
+        self.nncachedir=nncachedir
+        self.nnprecision=nnprecision
+        self.nnshadowevery=nnshadowcheck
+        self.nnshadowcheck=None
+
+        # Checkpoint and restart data
+        self.checkpointinterval=checkpointinterval
+        self.checkpoint=None
+        self.resume=resume
+        self.resumestate=None
+        self.resumeinterval=0   # Interval of the plan to resume from
+        self.adcircstepsdone=0  # ADCIRC time steps of that interval done before the restart
 
     #--------------------------------------------------------------------------#
-    def coupler_initialize(self, argc, argv):
-        """Initialize the ADCIRC model and the Neural Network."""
+    def _load_backend(self):
+        """Load the ADCIRC backend, on first use, and bind its modules."""
+        libadcpy = load_adcirc_backend()
+        self.pa    = libadcpy
+        self.ps    = libadcpy.sizes
+        self.pg    = libadcpy.pyglobal
+        self.pm    = libadcpy.pymesh
+        self.pmsg  = libadcpy.pymessenger
+        self.pb    = libadcpy.pyboundaries
+        self.pmain = libadcpy.pyadcirc_mod
+        self.pu    = libadcpy.utilities
 
-        # argv[argc-2] must be coupling type from {Adn, ndA, AdndA, ndAdn}
-        # argv[argc-1] must be edge string ID of the ADCIRC model
+    #--------------------------------------------------------------------------#
+    def coupler_initialize(self, couplingtype, edgestrings):
+        """Initialize the ADCIRC model and the Neural Network.
+
+        couplingtype is one of COUPLING_TYPES, and edgestrings the 1-based
+        edge string ID of the ADCIRC model, or a comma separated list of them.
+        """
+        if couplingtype not in COUPLING_TYPES:
+            raise ValueError('Unknown coupling type {}; use one of {}'.format(
+                couplingtype, COUPLING_TYPES))
         ######################################################
         #SET UP ADCIRC.
         ######################################################
-        if self.pu.debug == self.pu.on and DEBUG_LOCAL != 0:
-            print("\nInitializing ADCIRC\n")
+        self._load_backend()
+        log.debug("\nInitializing ADCIRC\n")
         self.pmain.pyadcirc_init()
         self.npes = self.ps.mnproc
         self.myid = self.ps.myproc
+        # The rank is known now; set up the log of this PE.
+        configure_logging(self.myid, self.loglevel, self.logranks, self.logfile)
         if self.pu.messg == self.pu.on:
-            self.adcirc_comm_world = self.pmsgmpi_comm_adcirc
-            self.adcirc_comm_comp = self.pgcomm
-        if self.pu.debug == self.pu.on and DEBUG_LOCAL != 0:
-            print("MPI Info: npes =", self.npes, ", myid =", self.myid)
+            self.adcirc_comm_world = self.pmsg.mpi_comm_adcirc
+            self.adcirc_comm_comp = self.pg.comm
+        log.debug("MPI Info: npes = %d, myid = %d", self.npes, self.myid)
 
         ######################################################
         if self.pu.messg == self.pu.on:
             #self.pmsgmsg_init()
-            if (self.pu.debug == self.pu.on and DEBUG_LOCAL!=0):
-                print('Python: adcirc_comm_world pointer value : '+hex(self.adcirc_comm_world))
-                print('Python: adcirc_comm_comp  pointer value : '+hex(self.adcirc_comm_comp))
-            print("*********************** MPI Initialized ***********************")
-            print("***************************************************************")
+            log.debug('Python: adcirc_comm_world pointer value : %#x', self.adcirc_comm_world)
+            log.debug('Python: adcirc_comm_comp  pointer value : %#x', self.adcirc_comm_comp)
+            log.info("*********************** MPI Initialized ***********************\n"
+                     "***************************************************************")
+            require_mpi4py(self)
 
 
-        print("********************* ADCIRC Initialized **********************")
-        print("***************************************************************")
+        log.info("********************* ADCIRC Initialized **********************\n"
+                 "***************************************************************")
 
-        self.couplingtype=argv[argc.value-2]
+        self.couplingtype=couplingtype
         #self.couplingdtfactor = 480
         self.adcircrunflag=self.pu.on
         self.adcirctstart=0.+self.pg.statim*86400.0 #statim is in days.
@@ -109,27 +282,370 @@ class AdcircNN():
         self.adcirctfinal=(self.pg.statim + self.pg.rnday)*86400.0
         self.adcircntsteps=0+self.pmain.itime_end #Needed 0+ to prevent the two from being the same object :-/ Careful!!!!
         self.adcircfort19pathname=''.join(np.append(np.char.strip(self.ps.inputdir),'/fort.19.new'))
-        self.adcircedgestringid=int(argv[argc.value-1])-1
-        self.adcircedgestringnnodes=self.pb.nvell[self.adcircedgestringid]
-        self.adcircedgestringnodes=self.pb.nbvv[1:self.adcircedgestringnnodes]
-
-        self.nn.initialize()
+        self.adcircrundir=os.path.dirname(self.adcircfort19pathname)
+        # One edge string ID, or a comma separated list of them.
+        self.adcircedgestringids=[int(i)-1 for i in str(edgestrings).split(',')]
+        if max(self.adcircedgestringids) >= len(self.pb.nvell):
+            raise ValueError('ADCIRC has {} edge strings; no edge string {}'.format(
+                len(self.pb.nvell), max(self.adcircedgestringids)+1))
+        self.adcircedgestringid=self.adcircedgestringids[0]
+        self.adcircedgestringcounts=np.array([self.pb.nvell[i] for i in self.adcircedgestringids], dtype=int)
+        self.adcircedgestringnnodes=int(self.adcircedgestringcounts.sum())
+        self.adcircedgestringboundary=np.repeat(np.arange(len(self.adcircedgestringids)),
+                self.adcircedgestringcounts)
+        # 0-based node numbers, to gather nodal values at the edge strings in one go.
+        self.adcircedgestringnodes=np.concatenate([np.asarray(self.pb.nbvv[i,1:n+1], dtype=np.intp) - 1
+                for i, n in zip(self.adcircedgestringids, self.adcircedgestringcounts)])
+        # Edge string locations in the ESBIN arrays; computed once for the whole run.
+        self.adcircedgestringindices=np.concatenate([int(np.sum(self.pb.nvdll[:i])) + np.arange(n)
+                for i, n in zip(self.adcircedgestringids, self.adcircedgestringcounts)])
+        self.adcircedgestringesbin=self.adcircedgestringindices
+        if np.array_equal(self.adcircedgestringindices,
+                np.arange(self.adcircedgestringindices[0], self.adcircedgestringindices[-1]+1)):
+            self.adcircedgestringesbin=slice(int(self.adcircedgestringindices[0]),
+                    int(self.adcircedgestringindices[-1])+1)
+
+        self.nn = self._make_nn(self.nnprecision)
+        self._check_nn_inputs()
         self.nn.runflag=self.pu.on
+        if self.nnprecision != 'float64' and self.nnshadowevery != 0 and self.myid == 0:
+            self.nnshadowcheck = NNShadowCheck(self._make_nn('float64'),
+                    self.nnshadowevery or NN_SHADOW_EVERY)
+        if (self.nncachesize > 0 or self.nncachedir is not None) and self.myid == 0:
+            self.nn.cache = NNRunCache(self.nncachesize or NN_CACHE_SIZE, self.nncachedir)
         self.effectivenndt=self.nn.dt # in seconds. This is in case we decide to use single_event_end time as ending time
         self.nntprev=self.nn.timer # in minutes
         self.nntfinal=self.nn.niter # in minutes
 
+        # The NN gives one boundary value, or one per edge string node.
+        nelev = self.nn.nelev()
+        if nelev not in (1, self.adcircedgestringnnodes):
+            raise ValueError('NN gives {} boundary values for edge strings of {} nodes'.format(
+                nelev, self.adcircedgestringnnodes))
+        self.nnexchange = NNStateExchange(nelev)
+        self.adcircseriesslope = np.zeros(self.adcircedgestringnnodes)
+        self.adcircseriesarea = np.zeros(self.adcircedgestringnnodes)
+
+        # Feed ADCIRC the NN output at a finer resolution than the coupling interval.
+        if self.adcircseriesinterp == 'pchip':
+            if self.couplingtype in ('ndA', 'ndAdn'):
+                self.seriesinterpolator = SeriesInterpolator(nelev, self.adcircseriespieces)
+            else:
+                log.warning('Series interpolation needs the NN to run first; ADCIRC interpolates linearly.')
+
+        # Merge the intervals of the plan while the boundary series changes slowly.
+        if self.couplingtol is not None:
+            if self.couplingtype == 'Adn':
+                log.warning('Adaptive coupling needs the NN to drive ADCIRC; coupling every interval.')
+            else:
+                self.adaptivecoupling = AdaptiveCoupling(self.couplingtol, self.couplingmaxspan)
+
+        # Checkpoints go with ADCIRC's hot start files, unless asked otherwise.
+        if self.checkpointinterval is None:
+            nhstar = getattr(self.pg, 'nhstar', 0)
+            self.checkpointinterval = getattr(self.pg, 'nhsinc', 0) if nhstar != 0 else 0
+        self.checkpoint = CouplerCheckpoint(self.checkpointinterval, self.myid,
+                os.path.join(self.adcircrundir, CHECKPOINT_FILE_BASENAME))
+        # On a restart, ADCIRC has read its hot start; pick up the plan of the original run.
+        itime_bgn0 = self.pmain.itime_bgn
+        if self.resume:
+            self.resumestate = self.checkpoint.read(self.pmain.itime_bgn-1)
+            itime_bgn0 = int(self.resumestate['itime_bgn0'])
+            self.resumeinterval = int(self.resumestate['interval'])
+            self.adcircstepsdone = int(self.resumestate['adcircstepsdone'])
+            log.info("Resuming the coupling at ADCIRC time step %d, coupling interval %d",
+                    self.pmain.itime_bgn-1, self.resumeinterval)
+
+        self.schedule = CouplingSchedule(self.effectivenndt, self.nn.timer, self.nntfinal,
+                self.pg.dtdp, self.adcirctstart, self.adcirctfinal, self.adcircntsteps,
+                couplingdtfactor=self.couplingdtfactor, nntimefact=self.nn.timefact,
+                itime_bgn=itime_bgn0,
+                adcircfirst=self.couplingtype in ('Adn', 'AdndA'))
+
+        # Each PE records the series of its own edge string nodes.
+        if self.adcircbcoutput and self.couplingtype != 'Adn' and self.adcircedgestringnnodes > 0:
+            self.bcwriter = BoundarySeriesWriter(os.path.join(self.adcircrundir,
+                '{}.{:04d}.bin'.format(BOUNDARY_SERIES_FILE_BASENAME, self.myid)),
+                self.adcircedgestringnodes + 1, len(self.schedule.plan()),
+                resume=None if self.resumestate is None else
+                int(self.resumestate['bcoutput_nrecords']))
+
+        # Ensemble members are reduced on PE 0, which records all of them.
+        if self.nn.ensemblesize > 1:
+            self.nnensemble = NNEnsemble(self.nn.ensemblesize, nelev, self.nnstatistic)
+            if self.myid == 0:
+                self.nnensemble.open(sum(interval.nnrun for interval in self.schedule.plan()),
+                        os.path.join(self.adcircrundir, ENSEMBLE_FILE_BASENAME), resume=0 if self.resumestate is None else
+                        int(self.resumestate['ensemble_nrecords']))
+
+        # The ADCIRC response of the training data is the edge string mean driving
+        # the NN; only ndA, in which ADCIRC does not drive the NN, reduces it for
+        # the harvest alone. PE 0 records it.
+        if self.harvestdir is not None:
+            if self.couplingtype == 'ndA':
+                allocate_edgestring_mean(self)
+            if self.myid == 0:
+                self.harvest = TrainingHarvest(self.harvestdir,
+                        self.nn.input_window(np.array([self.nn.timer])).shape[1], nelev,
+                        len(self.adcircedgestringids), metadata={
+                            'couplingtype': self.couplingtype,
+                            'edgestrings': [i+1 for i in self.adcircedgestringids],
+                            'nninput': self.nninput, 'nndt': self.effectivenndt,
+                            'adcircdt': float(self.pg.dtdp),
+                            'nnweights': self.nn.weights_digest()},
+                        shardsize=self.harvestshardsize,
+                        resume=None if self.resumestate is None else
+                        int(self.resumestate['harvest_nshards']))
+
 
 
     #--------------------------------------------------------------------------#
     def coupler_finalize(self):
         """Finalize the ADCIRC model and the neural network."""
-        if self.pu.debug==self.pu.on and DEBUG_LOCAL!=0 and self.myid==0:
-            print('\n\nFinalizing ADCIRC\n')
+        log.debug('\n\nFinalizing ADCIRC\n')
         ierr_code = self.pmain.pyadcirc_finalize()
-        if self.myid==0:
-            print("********************** ADCIRC Finalized ***********************")
-            print("***************************************************************")
+        log.info("********************** ADCIRC Finalized ***********************\n"
+                 "***************************************************************")
+        if self.pu.messg == self.pu.on and self.myid==0:
+            self.nnexchange.print_summary()
+        if self.checkpoint is not None and self.checkpoint.nwritten > 0 and self.myid==0:
+            log.info("Coupler checkpoints written: %d, every %d ADCIRC time steps",
+                self.checkpoint.nwritten, self.checkpoint.increment)
+        if self.adaptivecoupling is not None and self.myid==0:
+            self.adaptivecoupling.print_log()
+            log.info("Coupling intervals: %d for %d intervals of the plan",
+                self.ncouplingintervals, len(self.schedule.plan()))
+        if self.bcwriter is not None:
+            self.bcwriter.close()
+            if self.myid==0:
+                log.info("Boundary series: %d intervals written to %s",
+                    self.bcwriter.nrecords, self.bcwriter.filename)
+        if self.nn.cache is not None and self.myid==0:
+            self.nn.cache.print_summary()
+        if self.nnshadowcheck is not None and self.nnshadowcheck.nshadowruns > 0:
+            self.nnshadowcheck.print_summary()
+        if self.harvest is not None:
+            self.harvest.close()
+            log.info("Training harvest: %d records in %d shards in %s",
+                self.harvest.nrecords, self.harvest.nshards, self.harvest.directory)
+        if self.seriesinterpolator is not None and self.myid==0:
+            log.info("Interpolated series: %d pieces of up to %d per interval",
+                self.seriesinterpolator.npiecesrun, self.seriesinterpolator.npieces)
+        if self.nnensemble is not None and self.myid==0:
+            self.nnensemble.close()
+            log.info("NN ensemble of %d members: %d intervals recorded, ADCIRC forced by the %s",
+                self.nnensemble.ensemblesize, self.nnensemble.nrecords, self.nnensemble.statistic)
+        if self.timers.enabled:
+            summary = self.timers.write(self.adcircrundir, self.myid, self.npes)
+            if self.myid==0:
+                log.info("\nCoupling phase timings on PE 0 [ms]:")
+                self.timers.print_summary(summary)
+        flush_log()
+
+    #--------------------------------------------------------------------------#
+    def _make_nn(self, precision):
+        """Return the initialized NN of the coupled edge strings; one NN, or a batch with one per edge string."""
+        if len(self.adcircedgestringids) == 1:
+            anns = nn(weightsfile=self.nnweights, ensemblesize=self.nnensemblesize,
+                    dropout=self.nndropout, forcingnoise=self.nnforcingnoise, precision=precision)
+        elif self.nnensemblesize > 1:
+            raise ValueError('An NN ensemble can be coupled to one edge string only')
+        else:
+            weightsfiles = self.nnweights
+            if not isinstance(weightsfiles, (list, tuple)):
+                weightsfiles = [weightsfiles]*len(self.adcircedgestringids)
+            anns = batchnn(weightsfiles, self.adcircedgestringcounts, precision=precision)
+        anns.initialize()
+        return anns
+
+    #--------------------------------------------------------------------------#
+    def _check_nn_inputs(self):
+        """Check that the NN takes the inputs the coupling drives it with.
+
+        Unless ADCIRC only follows the NN, in ndA, the NN reads the mean ADCIRC
+        nninput of each coupled edge string: one NN reads one input per edge
+        string, and each NN of a batch the one input of its own edge string.
+        """
+        if self.couplingtype == 'ndA':
+            return
+        if isinstance(self.nn, batchnn):
+            nns, width = self.nn.members, 1
+        else:
+            nns, width = [self.nn], len(self.adcircedgestringids)
+        for m in nns:
+            if m.weights is not None and m.inputsize != width:
+                raise ValueError('NN weights {} take {} inputs, but {} coupling drives the NN '
+                    'with {} input(s), the mean ADCIRC {} of each of its edge strings {}'.format(
+                    m.weightsfile, m.inputsize, self.couplingtype, width, self.nninput,
+                    [i+1 for i in self.adcircedgestringids]))
+
+    #--------------------------------------------------------------------------#
+    def _nn_run(self):
+        """Run the NN to nn.niter, or take its result from the NN pipeline."""
+        if self.nnpipeline is None and self.nnshadowcheck is not None:
+            ierr_code = self.nnshadowcheck.run(self.nn)
+        elif self.nnpipeline is None:
+            ierr_code = self.nn.run()
+        else:
+            niter, self.nn.timer, self.nn.elev = self.nnpipeline.get()
+            # Results within a merged coupling interval, or before a restart, are not needed.
+            while niter < self.nn.niter - TIME_TOL:
+                niter, self.nn.timer, self.nn.elev = self.nnpipeline.get()
+            assert(abs(niter-self.nn.niter) < TIME_TOL)
+            ierr_code = 0
+        if self.nnensemble is not None and ierr_code == 0:
+            # Record all members, and hand ADCIRC their statistic.
+            self.nn.elev = self.nnensemble.collect(self.nn.timer, self.nn.elev)
+        return ierr_code
+
+    #--------------------------------------------------------------------------#
+    def _exchange_nn_state(self):
+        """Give all PEs the NN state of PE 0; its elevations in one collective."""
+        log.debug('Before messg: timer = %s, elev = %s', self.nn.timer, self.nn.elev)
+        self.timers.start('messg')
+        self.nnexchange.exchange(self)
+        self.timers.stop('messg')
+        log.debug('After messg : timer = %s, elev = %s', self.nn.timer, self.nn.elev)
+
+    #--------------------------------------------------------------------------#
+    def _coupling_intervals(self):
+        """Yield the coupling intervals; in adaptive coupling, several intervals of the plan at a time."""
+        plan = self.schedule.plan()
+        i = self.resumeinterval
+        span = self.couplingspan # On a restart, as at the checkpoint
+        while i < len(plan):
+            if self.adaptivecoupling is not None and i > self.resumeinterval:
+                iv = plan[i]
+                dt = max(iv.nnsteps*self.effectivenndt, iv.adcircntsteps*self.pg.dtdp)
+                span = self.adaptivecoupling.choose(i, series_max_slope(self), dt)
+            group = plan[i:i+1]
+            # Only intervals in which the same models run are merged.
+            while (len(group) < span and i+len(group) < len(plan)
+                    and plan[i+len(group)].nnrun == group[0].nnrun
+                    and plan[i+len(group)].adcircrun == group[0].adcircrun):
+                group.append(plan[i+len(group)])
+            i += len(group)
+            self.couplingspan = len(group)
+            self.ncouplingintervals += 1
+            if len(group) == 1:
+                yield group[0]
+                continue
+            interval = merge_intervals(group)
+            if self.couplingtype == 'AdndA':
+                # ADCIRC goes first, on the series set at the end of the last interval;
+                # stretch it out to the end of the merged interval.
+                self.pg.etime2 = max(self.pg.etime2, interval.adcirctime + TIME_TOL)
+            yield interval
+
+    #--------------------------------------------------------------------------#
+    def _run_nn_interval(self, interval):
+        """Run the NN over one interval of the coupling plan, on PE 0."""
+        if not interval.nnrun:
+            self.nn.runflag = self.pu.off
+            self.nn.go    = self.pu.off
+            return
+
+        self.nn.niter = interval.nniter
+        superdt = interval.nnsteps*self.effectivenndt
+
+        log.debug("\n*******************************************\nRunning NN:"
+                "\ndt             = %s\ntimer          = %s\nniter          = %s"
+                "\nsuperdt        = %s\nend time       = %s", self.nn.dt, self.nn.timer,
+                self.nn.niter, superdt, self.nn.timer*self.nn.timefact + superdt)
+
+        # Run NN only on 1 processsor: PE 0.
+        if self.myid == 0:
+            if self.harvest is not None:
+                # The inputs the NN reads, before ADCIRC adds to its forcing in ndAdn.
+                self.harvestinputs = self.nn.input_window(
+                        self.nn.timer + self.nn.dt*np.arange(1, self.nn.nsteps()+1))
+            self.timers.start('nn_run')
+            ierr_code = self._nn_run()
+            self.timers.stop('nn_run')
+            assert(ierr_code == 0)
+            # Needed to force nn to run for next time step:
+            self.nn.go    = self.pu.on
+        else:
+            # Note: We are keeping nn.runflag as on, but nn.go as FALSE!!
+            # This matters in adcirc_set_bc functions!
+            self.nn.go    = self.pu.off
+        # ADCIRC only needs the NN state if the NN drives it.
+        if self.pu.messg == self.pu.on and self.couplingtype != 'Adn':
+            self._exchange_nn_state()
+
+    #--------------------------------------------------------------------------#
+    def _run_adcirc_interval(self, interval):
+        """Run ADCIRC over one interval of the coupling plan."""
+        if not interval.adcircrun:
+            self.adcircrunflag=self.pu.off
+            return
+
+        # On a restart, part of the interval may have been run already.
+        ntsteps = interval.adcircntsteps - self.adcircstepsdone
+        self.adcirctnext = interval.adcirctime
+
+        log.debug("\n****************************************\nRunning ADCIRC:"
+                "\ndt             = %s\nt_prev         = %s\nt_final        = %s"
+                "\nntsteps        = %d", self.adcircdt, self.adcirctprev, self.adcirctnext, ntsteps)
+
+        # Each piece of an interpolated interval runs on its own linear series.
+        interp = self.seriesinterpolator
+        piece = None
+        if interp is not None and interp.active:
+            piece = interp.piece(interval.adcircntsteps)
+
+        # Run ADCIRC, stopping at the pieces and the checkpoints on the way.
+        while ntsteps > 0:
+            nrun = ntsteps
+            if piece is not None:
+                nrun = min(nrun, piece - self.adcircstepsdone % piece)
+                if self.adcircstepsdone % piece == 0:
+                    interp.set_piece(self, self.adcirctprev, self.adcirctprev + nrun*self.pg.dtdp)
+            tocheckpoint = self.checkpoint.steps_to_next(self.pmain.itime_bgn-1)
+            if tocheckpoint is not None:
+                nrun = min(nrun, tocheckpoint)
+            self.timers.start('adcirc_run')
+            self.pmain.pyadcirc_run(nrun)
+            self.timers.stop('adcirc_run')
+            ntsteps -= nrun
+            self.adcircstepsdone += nrun
+            self.adcirctprev = (self.pmain.itime_bgn-1)*self.pg.dtdp + self.pg.statim*86400.0
+            if self.checkpoint.due(self.pmain.itime_bgn-1):
+                self.timers.start('checkpoint')
+                if self.bcwriter is not None:
+                    self.bcwriter.flush()
+                if self.harvest is not None:
+                    self.harvest.flush(wait=True)
+                self.checkpoint.write(self, interval, self.adcircstepsdone)
+                self.timers.stop('checkpoint')
+        self.adcircstepsdone = 0
+        if piece is not None:
+            interp.restore(self)
+
+    #--------------------------------------------------------------------------#
+    def _set_adcirc_bc(self, interval):
+        """Set the ADCIRC boundary series from the NN, and record it."""
+        self.timers.start('set_bc')
+        adcirc_set_bc_from_nn_hydrograph(self)
+        if self.seriesinterpolator is not None:
+            self.seriesinterpolator.record(self)
+        if self.bcwriter is not None and self.nn.runflag != self.pu.off:
+            self.bcwriter.write(self, interval.index)
+        self.timers.stop('set_bc')
+
+    #--------------------------------------------------------------------------#
+    def _harvest_interval(self, interval):
+        """Record the training data of an interval; a collective on all PEs."""
+        if self.harvestdir is None:
+            return
+        self.timers.start('harvest')
+        # Except in ndA, the coupler has just reduced the response as the NN input.
+        if self.couplingtype == 'ndA':
+            adcirc_edgestring_mean(self)
+        if self.harvest is not None:
+            inputs = self.harvestinputs if interval.nnrun else self.harvestinputs[:0]
+            self.harvest.record(self, interval.index, interval.nnrun, self.adcirc_hprev, inputs)
+        self.timers.stop('harvest')
 
     #--------------------------------------------------------------------------#
     def coupler_run_nn_driving_adcirc(self):
@@ -145,134 +661,128 @@ class AdcircNN():
         self.nn.niter = 0
         # Run NN only on 1 processsor: PE 0.
         if self.myid == 0:
+            self.timers.start('nn_run')
             ierr_code = self.nn.run()
+            self.timers.stop('nn_run')
             assert(ierr_code == 0)
             self.nn.go    = self.pu.on
         else:
             # Assumes NN cannot start at negative time!
             self.nn.go    = self.pu.off
-        if self.pu.messg == self.pu.on:
-            if (self.pu.debug ==self.pu.on or DEBUG_LOCAL != 0):
-                print('PE[{}] Before messg: timer = {}'.format(self.myid,self.nn.timer))
-            self.nn.timer = self.pmsg.pymsg_dbl_max(self.nn.timer, self.adcirc_comm_comp)
-            if (self.pu.debug ==self.pu.on or DEBUG_LOCAL != 0):
-                print('PE[{}] After messg : timer = {}'.format(self.myid,self.nn.timer))
-
-        while (self.adcirctprev<self.adcirctfinal or self.nn.timer<self.nntfinal):
-            ######################################################
-            if (self.nn.timer < self.nntfinal):
-                # Decided while writing report. Driving model must take at least one time step forward.
-                superdt = self.effectivenndt
-                while (self.nn.timer*self.nn.timefact + superdt < self.adcirctprev+self.adcircdt-TIME_TOL):
-                    superdt                    += self.effectivenndt
-
-                self.nn.niter               += int(max(1.0, (superdt+TIME_TOL)/self.nn.timefact))
-                # This one is the important one that determines end time:
-                #self.nn.single_event_end     = self.nn.b_lt_start + (self.nn.timer*self.nn.timefact + superdt)/86400.0 #Julian
-
-                if (self.adcircrunflag==self.pu.off): #If ADCIRC is done first, let NN finish off directly.
-                    self.nn.niter            = self.nntfinal
-                    #self.nn.single_event_end = self.nn.b_lt_start + self.nn.niter/1440.0 #nntfinal was original niter in mins
-
-                if self.nn._DEBUG == self.pu.on and DEBUG_LOCAL != 0 and self.myid == 0:
-                    print("\n*******************************************\nRunning NN:")
-                    print("dt             =", self.nn.dt)
-                    print("timer          =", self.nn.timer)
-                    print("niter          =", self.nn.niter)
-                    print("superdt        =", superdt)
-                    print("end time       =", self.nn.timer*self.nn.timefact + superdt)
-                elif self.myid==0:
-                    print("\n*******************************************\nRunning NN:")
-
-                # Run NN only on 1 processsor: PE 0.
-                if self.myid == 0:
-                    ierr_code = self.nn.run()
-                    assert(ierr_code == 0)
-                    # Needed to force nn to run for next time step:
-                    self.nn.go    = self.pu.on
-                else:
-                    # Note: We are keeping nn.runflag as on, but nn.go as FALSE!!
-                    # This matters in adcirc_set_bc functions!
-                    self.nn.go    = self.pu.off
-                if self.pu.messg == self.pu.on:
-                    if (self.pu.debug ==self.pu.on or DEBUG_LOCAL != 0):
-                        print('PE[{}] Before messg: timer = {}'.format(self.myid,self.nn.timer))
-                    self.nn.timer = self.pmsg.pymsg_dbl_max(ctypes_c_double(self.nn.timer), self.adcirc_comm_comp)
-                    if (self.pu.debug ==self.pu.on or DEBUG_LOCAL != 0):
-                        print('PE[{}] After messg : timer = {}'.format(self.myid,self.nn.timer))
-
+        if self.pu.messg == self.pu.on and self.resumestate is None:
+            self._exchange_nn_state()
+        if self.seriesinterpolator is not None:
+            self.seriesinterpolator.append(self.nn.timer*self.nn.timefact, self.nn.elev)
+
+        # In one-way coupling, let a worker run the NN ahead of ADCIRC.
+        if self.nnpipelinemode is not None and self.myid == 0:
+            if self.couplingtype == 'ndA':
+                niters = [interval.nniter for interval in self.schedule.plan() if interval.nnrun]
+                self.nnpipeline = NNPipeline(self.nn.clone(), niters,
+                        mode=self.nnpipelinemode, depth=self.nnpipelinedepth)
+                # On a restart, the NN state of the checkpoint was on the worker; the NN
+                # is replayed up to there.
+                self.nnpipeline.start()
+                if self.nnshadowcheck is not None:
+                    log.warning('NN shadow check does not apply to the NN pipeline; skipping it.')
             else:
-                self.nn.runflag = self.pu.off
-                self.nn.go    = self.pu.off
+                log.warning('NN pipeline needs one-way ndA coupling; running the NN in line.')
 
-            ######################################################
-            # Set ADCIRC Boundary conditions from NN
-            adcirc_set_bc_from_nn_hydrograph(self)
+        # On a restart, the NN and the boundary series are where the checkpoint left them.
+        if self.resumestate is not None:
+            restore_checkpoint_state(self, self.resumestate)
+            self.adcircbcsink.restore(self)
 
-            ######################################################
-            if (self.adcirctprev < self.adcirctfinal):
-                ntsteps = 0
-                while (self.adcirctnext < self.nn.timer*self.nn.timefact-self.adcircdt+TIME_TOL):
-                    ntsteps += self.couplingdtfactor
-                    self.adcirctnext += self.adcircdt
-                if (self.nn.runflag == self.pu.off):
-                    ntsteps = (self.adcircntsteps-self.pmain.itime_bgn+1)
-                    self.adcirctnext = self.adcirctfinal
-
-                if self.pu.debug == self.pu.on and DEBUG_LOCAL != 0 and self.myid == 0:
-                    print("\n****************************************\nRunning ADCIRC:")
-                    print("dt             =", self.adcircdt)
-                    print("t_prev         =", self.adcirctprev)
-                    print("t_final        =", self.adcirctnext)
-                    print("ntsteps        =", ntsteps)
-                elif self.myid==0:
-                    print("\n****************************************\nRunning ADCIRC:")
-
-                # Run ADCIRC
-                self.pmain.pyadcirc_run(ntsteps)
-                self.adcirctprev = (self.pmain.itime_bgn-1)*self.pg.dtdp + self.pg.statim*86400.0
+        # Walk the precomputed plan of coupling intervals.
+        for interval in self._coupling_intervals():
+            # A checkpoint is taken while ADCIRC runs, after the NN has run and set
+            # the boundary series of its interval.
+            if self.adcircstepsdone == 0:
+                self._run_nn_interval(interval)
 
-            else:
-                self.adcircrunflag=self.pu.off
+                ######################################################
+                # Set ADCIRC Boundary conditions from NN
+                self._set_adcirc_bc(interval)
+
+            self._run_adcirc_interval(interval)
 
             ######################################################
             ## Set NN Boundary conditions from ADCIRC
             if self.couplingtype == 'ndAdn':
+                self.timers.start('nn_set_bc')
                 nn_set_bc_from_adcirc_depths(self)
+                self.timers.stop('nn_set_bc')
+
+            self._harvest_interval(interval)
+
+        if self.nnpipeline is not None:
+            self.nnpipeline.stop()
+            self.nnpipeline = None
+
+    #--------------------------------------------------------------------------#
+    def coupler_run_adcirc_driving_nn(self):
+        """Run function with ADCIRC staying ahead of NN."""
+
+        nn_init_bc_from_adcirc_depths(self)
+        if self.couplingtype == 'AdndA':
+            adcirc_init_bc_from_nn_hydrograph(self)
+        if self.resumestate is not None:
+            restore_checkpoint_state(self, self.resumestate)
+            if self.couplingtype == 'AdndA':
+                self.adcircbcsink.restore(self)
+
+        # Walk the precomputed plan of coupling intervals.
+        for interval in self._coupling_intervals():
+            self._run_adcirc_interval(interval)
+
+            ######################################################
+            ## Set NN Boundary conditions from ADCIRC
+            self.timers.start('nn_set_bc')
+            nn_set_bc_from_adcirc_depths(self)
+            self.timers.stop('nn_set_bc')
+
+            self._run_nn_interval(interval)
+
+            ######################################################
+            # Set ADCIRC Boundary conditions from NN
+            if self.couplingtype == 'AdndA':
+                self._set_adcirc_bc(interval)
+
+            self._harvest_interval(interval)
 
     #--------------------------------------------------------------------------#
     def coupler_run(self):
         """Run the physics based machine learning ADCIRC model."""
 
-        print("\n\n***************************************************************")
-        print(    "***************************************************************")
+        log.info("\n\n***************************************************************\n"
+                   "***************************************************************")
         if self.couplingtype == 'ndA':
             run_string = 'Running NN driving ADCIRC, One-way coupling'
-            print(run_string)
+            log.info(run_string)
             self.coupler_run_nn_driving_adcirc()
 
         elif self.couplingtype == 'Adn':
             run_string = 'Running ADCIRC driving NN, One-way coupling'
-            print(run_string)
+            log.info(run_string)
             self.coupler_run_adcirc_driving_nn()
 
         elif self.couplingtype == 'ndAdn':
             run_string = 'Running NN driving ADCIRC driving NN, Two-way coupling'
-            print(run_string)
+            log.info(run_string)
             self.coupler_run_nn_driving_adcirc()
 
-        elif self.couplingtype == 'ndAdn':
+        elif self.couplingtype == 'AdndA':
             run_string = 'Running ADCIRC driving NN driving ADCIRC, Two-way coupling'
-            print(run_string)
+            log.info(run_string)
             self.coupler_run_adcirc_driving_nn()
 
         else:
-            print('Unkown coupling type supplied by user: {}\nExiting.'.format(self.couplingtype))
+            log.error('Unkown coupling type supplied by user: %s\nExiting.', self.couplingtype)
             return
 
-        print("\n\n***************************************************************")
-        print(    "***************************************************************")
-        print(    "Finished", run_string)
-        print(    "***************************************************************")
-        print(    "***************************************************************")
+        log.info("\n\n***************************************************************\n"
+                   "***************************************************************\n"
+                   "Finished %s\n"
+                   "***************************************************************\n"
+                   "***************************************************************", run_string)
 
@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+#------------------------------------------------------------------------------#
+# adcirc-nn - Software for physics-based machine learning with ADCIRC
+# LICENSE: BSD 3-Clause "New" or "Revised"
+#------------------------------------------------------------------------------#
+"""
+Fixed-capacity history of the ADCIRC boundary state that drives the NN.
+
+The history is a ring buffer whose samples are written twice, at i and at
+i+capacity, of arrays twice the capacity long. The last n samples are then
+always contiguous, so the NN reads its input window as a view, without copying
+or concatenating. Memory does not grow with the length of the run.
+"""
+import numpy as np
+
+################################################################################
+BOUNDARY_HISTORY_LENGTH = 256 # Default number of ADCIRC intervals kept
+
+################################################################################
+class BoundaryHistory():
+    """Ring buffer of (time, values) samples of the ADCIRC boundary state."""
+
+    #--------------------------------------------------------------------------#
+    def __init__(self, capacity=BOUNDARY_HISTORY_LENGTH, width=1):
+        """Construct an empty history of capacity samples of width values each."""
+        if capacity < 1:
+            raise ValueError('Boundary history needs a capacity of at least 1')
+        self.capacity = int(capacity)
+        self.width = int(width)
+        self.times = np.zeros(2*self.capacity)
+        self.values = np.zeros((2*self.capacity, self.width))
+        self.head = 0  # Slot of the next sample
+        self.size = 0  # Number of samples held
+        self.nappends = 0
+
+    #--------------------------------------------------------------------------#
+    def __len__(self):
+        return self.size
+
+    #--------------------------------------------------------------------------#
+    def _write(self, i, t, x):
+        """Write a sample to slot i and its copy."""
+        self.times[i] = t
+        self.times[i+self.capacity] = t
+        self.values[i] = x
+        self.values[i+self.capacity] = x
+
+    #--------------------------------------------------------------------------#
+    def append(self, t, x):
+        """Append the sample x at time t, dropping the oldest one if full."""
+        self._write(self.head, t, x)
+        self.head = (self.head + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+        self.nappends += 1
+
+    #--------------------------------------------------------------------------#
+    def replace_last(self, t, x):
+        """Replace the last sample, or append it to an empty history."""
+        if self.size == 0:
+            self.append(t, x)
+        else:
+            self._write((self.head - 1) % self.capacity, t, x)
+
+    #--------------------------------------------------------------------------#
+    def last_time(self):
+        """Return the time of the last sample, or -inf if there is none."""
+        if self.size == 0:
+            return -np.inf
+        return self.times[(self.head - 1) % self.capacity]
+
+    #--------------------------------------------------------------------------#
+    def get_state(self):
+        """Return a dict of the arrays of the history, for checkpoints."""
+        return {'times': self.times, 'values': self.values, 'head': self.head,
+                'size': self.size, 'nappends': self.nappends}
+
+    #--------------------------------------------------------------------------#
+    def set_state(self, state):
+        """Restore the history from a dict returned by get_state()."""
+        if state['values'].shape != self.values.shape:
+            raise ValueError('Boundary history of shape {} cannot be restored to {}'.format(
+                state['values'].shape, self.values.shape))
+        self.times[:] = state['times']
+        self.values[:] = state['values']
+        self.head = int(state['head'])
+        self.size = int(state['size'])
+        self.nappends = int(state['nappends'])
+
+    #--------------------------------------------------------------------------#
+    def window(self, n=None):
+        """Return views (times (n,), values (n, width)) of the last n samples, oldest first."""
+        n = self.size if n is None else min(int(n), self.size)
+        stop = self.head + self.capacity
+        return self.times[stop-n:stop], self.values[stop-n:stop]
+
+################################################################################
+if __name__ == '__main__':
+    pass
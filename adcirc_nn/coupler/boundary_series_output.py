@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+#------------------------------------------------------------------------------#
+# adcirc-nn - Software for physics-based machine learning with ADCIRC
+# LICENSE: BSD 3-Clause "New" or "Revised"
+#------------------------------------------------------------------------------#
+"""
+Streaming binary output of the boundary series imposed by the NN on ADCIRC.
+
+Each PE with nodes on the coupled edge strings writes one record per coupling
+interval to a preallocated, memory-mapped file
+    <basename>.<PE>.bin
+laid out as
+    header  BOUNDARY_SERIES_HEADER (64 bytes): magic, version, nnodes,
+            capacity, nrecords, record size
+    nodes   int64 (nnodes,): 1-based ADCIRC node numbers of the values
+    records BOUNDARY_SERIES_RECORD of nnodes (capacity,)
+Records are written in memory and flushed every BOUNDARY_SERIES_FLUSH records;
+nrecords in the header counts the flushed records only, so that a reader never
+sees a partly written one. read_boundary_series() maps the records lazily.
+"""
+import os
+
+import numpy as np
+
+################################################################################
+BOUNDARY_SERIES_FILE_BASENAME = 'adcirc_nn_boundary'
+BOUNDARY_SERIES_MAGIC = b'ADCNNBS1'
+BOUNDARY_SERIES_VERSION = 1
+BOUNDARY_SERIES_FLUSH = 256 # Records written between flushes
+BOUNDARY_SERIES_HEADER = np.dtype([('magic', 'S8'), ('version', '<i8'), ('nnodes', '<i8'),
+    ('capacity', '<i8'), ('nrecords', '<i8'), ('recordsize', '<i8'), ('reserved', '<i8', (2,))])
+
+def boundary_series_record(nnodes):
+    """Return the record dtype of edge strings of nnodes nodes."""
+    return np.dtype([('interval', '<i8'), ('adcirctime', '<f8'), ('nntime', '<f8'),
+        ('etime1', '<f8'), ('etime2', '<f8'), ('value', '<f8', (nnodes,)),
+        ('slope', '<f8', (nnodes,)), ('area', '<f8', (nnodes,))])
+
+################################################################################
+def read_boundary_series(filename):
+    """Return the node numbers and a read-only memory map of the flushed records of a file."""
+    header = np.fromfile(filename, dtype=BOUNDARY_SERIES_HEADER, count=1)[0]
+    if header['magic'] != BOUNDARY_SERIES_MAGIC:
+        raise ValueError('{} is not an adcirc-nn boundary series file'.format(filename))
+    nnodes, nrecords = int(header['nnodes']), int(header['nrecords'])
+    nodes = np.fromfile(filename, dtype='<i8', count=nnodes, offset=BOUNDARY_SERIES_HEADER.itemsize)
+    records = np.memmap(filename, dtype=boundary_series_record(nnodes), mode='r',
+            offset=BOUNDARY_SERIES_HEADER.itemsize + 8*nnodes, shape=(nrecords,))
+    return nodes, records
+
+################################################################################
+class BoundarySeriesWriter():
+    """Appends the boundary series of each coupling interval to a memory-mapped file."""
+
+    #--------------------------------------------------------------------------#
+    def __init__(self, filename, nodes, capacity, resume=None, flushevery=BOUNDARY_SERIES_FLUSH):
+        """Create the file for capacity records of the given 1-based nodes.
+
+        If resume is not None, the file is reopened and writing continues
+        after its first resume records.
+        """
+        self.filename = filename
+        self.nnodes = len(nodes)
+        self.dtype = boundary_series_record(self.nnodes)
+        self.flushevery = max(1, int(flushevery))
+        offset = BOUNDARY_SERIES_HEADER.itemsize + 8*self.nnodes
+        if resume is None:
+            with open(filename, 'wb') as f:
+                f.truncate(offset + capacity*self.dtype.itemsize)
+        self.header = np.memmap(filename, dtype=BOUNDARY_SERIES_HEADER, mode='r+', shape=(1,))
+        if resume is None:
+            self.header[0] = (BOUNDARY_SERIES_MAGIC, BOUNDARY_SERIES_VERSION, self.nnodes,
+                    capacity, 0, self.dtype.itemsize, (0, 0))
+            nodemap = np.memmap(filename, dtype='<i8', mode='r+',
+                    offset=BOUNDARY_SERIES_HEADER.itemsize, shape=(self.nnodes,))
+            nodemap[:] = nodes
+            nodemap.flush()
+            del nodemap
+        elif self.header[0]['nnodes'] != self.nnodes or self.header[0]['capacity'] != capacity:
+            raise ValueError('Boundary series file {} does not match the run'.format(filename))
+        self.records = np.memmap(filename, dtype=self.dtype, mode='r+', offset=offset,
+                shape=(capacity,))
+        self.nrecords = 0 if resume is None else int(resume)
+        self.nflushed = self.nrecords
+
+    #--------------------------------------------------------------------------#
+    def write(self, anns, index):
+        """Write the series set for coupling interval index."""
+        if self.nrecords == len(self.records):
+            raise IndexError('Boundary series file {} is full'.format(self.filename))
+        record = self.records[self.nrecords]
+        record['interval'] = index
+        record['adcirctime'] = anns.adcirctprev
+        record['nntime'] = anns.nn.timer*anns.nn.timefact
+        record['etime1'] = anns.pg.etime1
+        record['etime2'] = anns.pg.etime2
+        record['value'] = anns.pg.esbin2[anns.adcircedgestringesbin]
+        record['slope'] = anns.adcircseriesslope
+        record['area'] = anns.adcircseriesarea
+        self.nrecords += 1
+        if self.nrecords - self.nflushed >= self.flushevery:
+            self.flush()
+
+    #--------------------------------------------------------------------------#
+    def flush(self):
+        """Flush the records written, then count them in the header."""
+        if self.nrecords == self.nflushed:
+            return
+        self.records.flush()
+        self.header[0]['nrecords'] = self.nrecords
+        self.header.flush()
+        self.nflushed = self.nrecords
+
+    #--------------------------------------------------------------------------#
+    def close(self):
+        """Flush and unmap the file."""
+        self.flush()
+        del self.records
+        del self.header
+
+################################################################################
+if __name__ == '__main__':
+    pass
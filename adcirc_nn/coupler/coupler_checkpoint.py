@@ -0,0 +1,172 @@
+#!/usr/bin/env python
+#------------------------------------------------------------------------------#
+# adcirc-nn - Software for physics-based machine learning with ADCIRC
+# LICENSE: BSD 3-Clause "New" or "Revised"
+#------------------------------------------------------------------------------#
+"""
+Checkpoints of the coupler state, for restarting a run from an ADCIRC hot start.
+
+ADCIRC writes its own hot start files every NHSINC time steps; these only hold
+the ADCIRC solution. The coupler state at the same time steps, i.e., the NN
+hidden and cell states and timer, the last boundary values handed to ADCIRC,
+the window of ADCIRC values driving the NN, and the position in the coupling
+plan, is written by each PE to
+    <basename>.<time step>.<PE>.npz
+The file is first written under a temporary name and then renamed, so that a
+run killed while writing leaves the previous checkpoint intact. Only the last
+CHECKPOINT_KEEP checkpoints are kept.
+"""
+import glob
+import os
+
+import numpy as np
+
+################################################################################
+CHECKPOINT_FILE_BASENAME = 'adcirc_nn_checkpoint'
+CHECKPOINT_KEEP = 2 # Number of checkpoints kept on disk
+
+################################################################################
+def checkpoint_state(anns, interval, stepsdone):
+    """Return a dict of the coupler state at the current ADCIRC time step.
+
+    interval is the CouplingInterval being run, and stepsdone the number of
+    its ADCIRC time steps done.
+    """
+    pg = anns.pg
+    esbin = anns.adcircedgestringesbin
+    state = {
+        'step'            : anns.pmain.itime_bgn - 1,
+        'interval'        : interval.index,
+        'adcircstepsdone' : stepsdone,
+        'itime_bgn0'      : anns.schedule.itime_bgn,
+        'couplingspan'    : anns.couplingspan,
+        'adaptivespan'    : 1 if anns.adaptivecoupling is None else anns.adaptivecoupling.span,
+        'adcirctprev'     : anns.adcirctprev,
+        'adcirctnext'     : anns.adcirctnext,
+        'adcircrunflag'   : anns.adcircrunflag,
+        'etime1'          : pg.etime1,
+        'etime2'          : pg.etime2,
+        'etiminc'         : pg.etiminc,
+        'esbin1'          : pg.esbin1[esbin],
+        'esbin2'          : pg.esbin2[esbin],
+        'adcircseriesslope' : anns.adcircseriesslope,
+        'adcircseriesarea'  : anns.adcircseriesarea,
+        'adcirc_hprev'    : anns.adcirc_hprev,
+        'adcirc_hprev_t'  : anns.adcirc_hprev_t,
+        'adcirc_hprev_len': anns.adcirc_hprev_len,
+        'ensemble_nrecords' : 0 if anns.nnensemble is None else anns.nnensemble.nrecords,
+        'bcoutput_nrecords' : 0 if anns.bcwriter is None else anns.bcwriter.nrecords,
+        'harvest_nshards' : 0 if anns.harvest is None else anns.harvest.nshards,
+        'harvest_inputs'  : anns.harvestinputs,
+        }
+    for key, value in anns.nn.get_state().items():
+        state['nn_'+key] = value
+    if anns.adcirchistory is not None:
+        for key, value in anns.adcirchistory.get_state().items():
+            state['history_'+key] = value
+    if anns.seriesinterpolator is not None:
+        for key, value in anns.seriesinterpolator.get_state().items():
+            state['interp_'+key] = value
+    return state
+
+################################################################################
+def restore_checkpoint_state(anns, state):
+    """Restore the coupler state of a dict returned by checkpoint_state.
+
+    The position in the coupling plan, but for the number of its intervals run
+    as one, is left to the caller.
+    """
+    pg = anns.pg
+    esbin = anns.adcircedgestringesbin
+    # As left by the last ADCIRC run before the checkpoint.
+    anns.pmain.itime_end = int(state['step'])
+    anns.couplingspan = int(state['couplingspan'])
+    if anns.adaptivecoupling is not None:
+        anns.adaptivecoupling.span = int(state['adaptivespan'])
+    anns.adcirctprev = float(state['adcirctprev'])
+    anns.adcirctnext = float(state['adcirctnext'])
+    anns.adcircrunflag = int(state['adcircrunflag'])
+    pg.etime1 = float(state['etime1'])
+    pg.etime2 = float(state['etime2'])
+    pg.etiminc = float(state['etiminc'])
+    pg.esbin1[esbin] = state['esbin1']
+    pg.esbin2[esbin] = state['esbin2']
+    anns.adcircseriesslope[:] = state['adcircseriesslope']
+    anns.adcircseriesarea[:] = state['adcircseriesarea']
+    anns.adcirc_hprev = state['adcirc_hprev'] if np.ndim(state['adcirc_hprev']) else \
+            float(state['adcirc_hprev'])
+    anns.adcirc_hprev_t = float(state['adcirc_hprev_t'])
+    anns.adcirc_hprev_len = float(state['adcirc_hprev_len'])
+    anns.harvestinputs = np.array(state['harvest_inputs'])
+    anns.nn.set_state({key[3:]: state[key] for key in state if key.startswith('nn_')})
+    if anns.adcirchistory is not None:
+        anns.adcirchistory.set_state({key[8:]: state[key] for key in state
+            if key.startswith('history_')})
+        anns.nn.set_forcing(*anns.adcirchistory.window())
+    if anns.seriesinterpolator is not None:
+        anns.seriesinterpolator.set_state({key[7:]: state[key] for key in state
+            if key.startswith('interp_')})
+
+################################################################################
+class CouplerCheckpoint():
+    """Writes and reads the checkpoints of one PE every increment ADCIRC time steps."""
+
+    #--------------------------------------------------------------------------#
+    def __init__(self, increment, myid=0, basename=CHECKPOINT_FILE_BASENAME,
+            keep=CHECKPOINT_KEEP):
+        """Construct the checkpoints; none are written if increment is 0."""
+        self.increment = int(increment)
+        self.myid = myid
+        self.basename = basename
+        self.keep = keep
+        self.nwritten = 0
+
+    #--------------------------------------------------------------------------#
+    def filename(self, step):
+        """Return the checkpoint file name of ADCIRC time step step."""
+        return '{}.{:010d}.{:04d}.npz'.format(self.basename, step, self.myid)
+
+    #--------------------------------------------------------------------------#
+    def steps(self):
+        """Return the sorted time steps of the checkpoints of this PE on disk."""
+        pattern = '{}.*.{:04d}.npz'.format(self.basename, self.myid)
+        return sorted(int(os.path.basename(f).split('.')[-3]) for f in glob.glob(pattern))
+
+    #--------------------------------------------------------------------------#
+    def steps_to_next(self, step):
+        """Return the number of time steps from step to the next checkpoint, or None."""
+        if self.increment <= 0:
+            return None
+        return self.increment - step % self.increment
+
+    #--------------------------------------------------------------------------#
+    def due(self, step):
+        """Return whether a checkpoint is due at time step step."""
+        return self.increment > 0 and step > 0 and step % self.increment == 0
+
+    #--------------------------------------------------------------------------#
+    def write(self, anns, interval, stepsdone):
+        """Write the checkpoint of the current ADCIRC time step."""
+        state = checkpoint_state(anns, interval, stepsdone)
+        filename = self.filename(state['step'])
+        tmpname = filename[:-len('.npz')] + '.tmp.npz'
+        np.savez(tmpname, **state)
+        os.replace(tmpname, filename)
+        self.nwritten += 1
+        for step in self.steps()[:-self.keep]:
+            os.remove(self.filename(step))
+        return filename
+
+    #--------------------------------------------------------------------------#
+    def read(self, step):
+        """Return the state dict of the checkpoint of time step step."""
+        filename = self.filename(step)
+        if not os.path.exists(filename):
+            raise FileNotFoundError('No coupler checkpoint {} for the ADCIRC hot start at time'
+                    ' step {}; checkpoints are at time steps {}'.format(filename, step, self.steps()))
+        with np.load(filename) as data:
+            return {key: data[key] for key in data.files}
+
+################################################################################
+if __name__ == '__main__':
+    pass
@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+#------------------------------------------------------------------------------#
+# adcirc-nn - Software for physics-based machine learning with ADCIRC
+# LICENSE: BSD 3-Clause "New" or "Revised"
+#------------------------------------------------------------------------------#
+"""
+Rank-aware, level-gated, buffered logging of the coupler.
+
+Messages go through the 'adcirc_nn' logger of the standard logging module with
+%-style arguments, so that a message below the level is never formatted.
+Arguments that are expensive to compute, e.g., ESBIN slices gathered with an
+index array, are wrapped in lazy(), which defers the call until the message is
+formatted. Each PE buffers its formatted records and writes them LOG_BUFFER at a time,
+and warnings at once. By default only PE 0 writes to stdout; with a log file
+basename, each PE also writes all its records to <basename>.<PE>.log.
+
+configure_logging() sets the level, one of LOG_LEVELS, the PEs writing to
+stdout, '0' or 'all', and the log file basename; they default to the
+environment variables ADCIRC_NN_LOG_LEVEL, ADCIRC_NN_LOG_RANKS, and
+ADCIRC_NN_LOG_FILE. Until then, e.g., on the command line, the rank is taken
+from the environment of the MPI launcher.
+"""
+import logging
+import logging.handlers
+import os
+import sys
+
+################################################################################
+LOG_NAME = 'adcirc_nn'
+LOG_LEVELS = {'debug': logging.DEBUG, 'info': logging.INFO,
+        'warning': logging.WARNING, 'error': logging.ERROR}
+LOG_LEVEL_DEFAULT = 'info'
+LOG_RANKS_DEFAULT = '0' # PEs writing to stdout: '0' or 'all'
+LOG_BUFFER = 256        # Records buffered by each PE between writes
+LOG_RANK_VARIABLES = ('OMPI_COMM_WORLD_RANK', 'PMI_RANK', 'PMIX_RANK', 'SLURM_PROCID')
+
+log = logging.getLogger(LOG_NAME)
+log.propagate = False
+
+################################################################################
+class lazy():
+    """Argument of a log message computed only if the message is formatted."""
+
+    def __init__(self, func, *args):
+        self.func = func
+        self.args = args
+
+    def __str__(self):
+        return str(self.func(*self.args))
+
+################################################################################
+class RankBuffer(logging.handlers.MemoryHandler):
+    """Buffer of the records of a PE, formatted as they come in."""
+
+    def emit(self, record):
+        # The arguments, e.g., ESBIN arrays, change before the buffer is written.
+        record.msg = record.getMessage()
+        record.args = None
+        super().emit(record)
+
+################################################################################
+def launcher_rank():
+    """Return the MPI rank given by the launcher in the environment, or 0."""
+    for variable in LOG_RANK_VARIABLES:
+        if variable in os.environ:
+            return int(os.environ[variable])
+    return 0
+
+################################################################################
+def configure_logging(myid=None, level=None, ranks=None, filebase=None, buffer=LOG_BUFFER):
+    """Set up the coupler log of PE myid, replacing any earlier set up."""
+    myid = launcher_rank() if myid is None else myid
+    level = level or os.environ.get('ADCIRC_NN_LOG_LEVEL', LOG_LEVEL_DEFAULT)
+    ranks = ranks or os.environ.get('ADCIRC_NN_LOG_RANKS', LOG_RANKS_DEFAULT)
+    filebase = filebase or os.environ.get('ADCIRC_NN_LOG_FILE') or None
+    if level not in LOG_LEVELS:
+        raise ValueError('Unknown log level {}; use one of {}'.format(level, sorted(LOG_LEVELS)))
+    if ranks not in ('0', 'all'):
+        raise ValueError("Log ranks must be '0' or 'all', not {}".format(ranks))
+
+    for handler in list(log.handlers):
+        log.removeHandler(handler)
+        handler.close()
+    log.setLevel(LOG_LEVELS[level])
+
+    targets = []
+    if ranks == 'all' or myid == 0:
+        stream = logging.StreamHandler(sys.stdout)
+        stream.setFormatter(logging.Formatter(
+            '%(message)s' if ranks == '0' else 'PE[{}] %(message)s'.format(myid)))
+        targets.append(stream)
+    if filebase is not None:
+        targets.append(logging.FileHandler('{}.{:04d}.log'.format(filebase, myid), mode='w'))
+    for target in targets:
+        log.addHandler(RankBuffer(buffer, flushLevel=logging.WARNING, target=target))
+    if not targets:
+        log.addHandler(logging.NullHandler())
+
+################################################################################
+def flush_log():
+    """Write the records buffered so far, e.g., ahead of output printed directly."""
+    for handler in log.handlers:
+        handler.flush()
+
+configure_logging()
+
+################################################################################
+if __name__ == '__main__':
+    pass
@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+#------------------------------------------------------------------------------#
+# adcirc-nn - Software for physics-based machine learning with ADCIRC
+# LICENSE: BSD 3-Clause "New" or "Revised"
+#------------------------------------------------------------------------------#
+"""
+Per-phase timers of the coupling loop.
+
+Each PE times every start/stop pair of a phase, e.g., NN inference, MPI
+exchange, setting the ADCIRC boundary series, or ADCIRC time stepping. The
+count, total, min and max of the durations of a phase are kept as running
+aggregates, and a uniform sample of at most TIMING_SAMPLE of them, by reservoir
+sampling, gives the percentiles; memory does not grow with the run length.
+When disabled, start and stop are no-ops.
+"""
+import json
+import os
+import random
+import time
+
+import numpy as np
+
+from .coupler_log import log
+
+################################################################################
+TIMING_FILE_BASENAME = 'adcirc_nn_timing'
+TIMING_STATS = ('count', 'total', 'min', 'mean', 'p95', 'max')
+TIMING_SAMPLE = 1024 # Durations of each phase kept for the percentiles
+
+def _noop(phase):
+    """Do nothing; stands in for start/stop of disabled timers."""
+    pass
+
+################################################################################
+class PhaseTimes():
+    """Running aggregates, and a bounded uniform sample, of the durations of a phase."""
+
+    #--------------------------------------------------------------------------#
+    def __init__(self, nsample=TIMING_SAMPLE, seed=0):
+        """Construct the statistics of a phase, sampling at most nsample durations."""
+        self.count = 0
+        self.total = 0.0
+        self.min = float('inf')
+        self.max = 0.0
+        self.sample = np.empty(max(1, int(nsample)))
+        self._rng = random.Random(seed)
+
+    #--------------------------------------------------------------------------#
+    def add(self, duration):
+        """Add one duration, keeping the sample uniform over all durations so far."""
+        if self.count < len(self.sample):
+            self.sample[self.count] = duration
+        else:
+            k = self._rng.randrange(self.count + 1)
+            if k < len(self.sample):
+                self.sample[k] = duration
+        self.count += 1
+        self.total += duration
+        self.min = min(self.min, duration)
+        self.max = max(self.max, duration)
+
+    #--------------------------------------------------------------------------#
+    def stats(self):
+        """Return {stat: value} with the statistics of TIMING_STATS."""
+        return {
+            'count' : self.count,
+            'total' : self.total,
+            'min'   : self.min,
+            'mean'  : self.total/self.count,
+            'p95'   : float(np.percentile(self.sample[:min(self.count, len(self.sample))], 95)),
+            'max'   : self.max,
+            }
+
+################################################################################
+class CouplerTimers():
+    """Per-phase wall clock timers of one PE."""
+
+    #--------------------------------------------------------------------------#
+    def __init__(self, enabled=False):
+        """Construct the timers; disabled timers cost one no-op call."""
+        self.enabled = bool(enabled)
+        self.phases = {} # PhaseTimes of each phase timed
+        self._tstart = {}
+        if not self.enabled:
+            self.start = _noop
+            self.stop = _noop
+
+    #--------------------------------------------------------------------------#
+    def start(self, phase):
+        """Start timing one occurrence of phase."""
+        self._tstart[phase] = time.perf_counter()
+
+    #--------------------------------------------------------------------------#
+    def stop(self, phase):
+        """Stop timing phase and record the duration."""
+        duration = time.perf_counter() - self._tstart[phase]
+        times = self.phases.get(phase)
+        if times is None:
+            times = self.phases[phase] = PhaseTimes()
+        times.add(duration)
+
+    #--------------------------------------------------------------------------#
+    def summary(self):
+        """Return {phase: {stat: value}} with the statistics of TIMING_STATS."""
+        return {phase: times.stats() for phase, times in self.phases.items()}
+
+    #--------------------------------------------------------------------------#
+    def write(self, directory, myid, npes, basename=TIMING_FILE_BASENAME):
+        """Write the summary of this PE to <directory>/<basename>.<myid>.json and .csv."""
+        summary = self.summary()
+        filename = os.path.join(directory, '{}.{:04d}'.format(basename, myid))
+        with open(filename+'.json', 'w') as f:
+            json.dump({'myid': myid, 'npes': npes, 'phases': summary}, f, indent=2)
+        with open(filename+'.csv', 'w') as f:
+            f.write(','.join(('phase',)+TIMING_STATS)+'\n')
+            for phase, stats in summary.items():
+                f.write(','.join([phase]+[str(stats[s]) for s in TIMING_STATS])+'\n')
+        return summary
+
+    #--------------------------------------------------------------------------#
+    def print_summary(self, summary=None):
+        """Log a table of the phase statistics in milliseconds."""
+        if summary is None:
+            summary = self.summary()
+        log.info('{:<16}'.format('phase') + ''.join('{:>12}'.format(s) for s in TIMING_STATS))
+        for phase, stats in summary.items():
+            log.info('{:<16}{:>12d}'.format(phase, stats['count']) +
+                ''.join('{:>12.3f}'.format(stats[s]*1.0e3) for s in TIMING_STATS[1:]))
+
+################################################################################
+if __name__ == '__main__':
+    pass
@@ -0,0 +1,202 @@
+#!/usr/bin/env python
+#------------------------------------------------------------------------------#
+# adcirc-nn - Software for physics-based machine learning with ADCIRC
+# LICENSE: BSD 3-Clause "New" or "Revised"
+#------------------------------------------------------------------------------#
+"""
+Closed-form coupling scheduler.
+
+Computes the complete list of coupling intervals up front: the NN niter and
+number of NN steps, the number of ADCIRC time steps, and the boundary series
+time of each interval, with either the NN or ADCIRC going first. All times are handled as exact fractions of a second,
+so that the intervals do not drift against TIME_TOL however large the ratio of
+the NN and ADCIRC time steps.
+"""
+from collections import namedtuple
+from fractions import Fraction
+import math
+
+################################################################################
+TIME_DENOMINATOR = 10**6 # Times are rounded to the nearest microsecond
+
+CouplingInterval = namedtuple('CouplingInterval', ['index',
+    'nnrun', 'nniter', 'nnsteps', 'nntime',
+    'adcircrun', 'adcircntsteps', 'adcirctime',
+    'seriestime'])
+CouplingInterval.__doc__ = """One coupling interval; times in seconds at the end of the interval."""
+
+def _exact(t):
+    """Return time t in seconds as an exact fraction."""
+    return Fraction(t).limit_denominator(TIME_DENOMINATOR)
+
+def merge_intervals(intervals):
+    """Return one CouplingInterval running consecutive intervals of a plan in one go."""
+    first, last = intervals[0], intervals[-1]
+    return last._replace(index=first.index,
+            nnsteps=sum(iv.nnsteps for iv in intervals),
+            adcircntsteps=sum(iv.adcircntsteps for iv in intervals))
+
+################################################################################
+class CouplingSchedule():
+    """Precomputed plan of the coupling intervals of NN and ADCIRC."""
+
+    #--------------------------------------------------------------------------#
+    def __init__(self, nndt, nntstart, nntfinal, adcircdtdp, adcirctstart,
+            adcirctfinal, adcircntsteps, couplingdtfactor=1, nntimefact=1.0,
+            itime_bgn=1, adcircfirst=False):
+        """Construct the schedule.
+
+        nndt is the NN time step in seconds, and nntstart and nntfinal the NN
+        times in NN units (seconds/nntimefact). adcircdtdp is the ADCIRC time
+        step in seconds, adcircntsteps its final time step, and itime_bgn its
+        next time step. ADCIRC advances couplingdtfactor time steps at a time.
+        ADCIRC runs ahead of the NN in each interval if adcircfirst is set, as
+        in the Adn and AdndA couplings.
+        """
+        from .adcirc_nn_class import TIME_TOL
+        self.tol = _exact(TIME_TOL)
+        self.nntimefact = _exact(nntimefact)
+        self.nndt = _exact(nndt)
+        self.nntstart = _exact(nntstart)*self.nntimefact
+        self.nntfinal = _exact(nntfinal)*self.nntimefact
+        self.adcircdtdp = _exact(adcircdtdp)
+        self.couplingdtfactor = int(couplingdtfactor)
+        self.adcircdt = self.adcircdtdp*self.couplingdtfactor
+        self.adcirctstart = _exact(adcirctstart)
+        self.adcirctfinal = _exact(adcirctfinal)
+        self.adcircntsteps = int(adcircntsteps)
+        self.itime_bgn = int(itime_bgn)
+        self.adcircfirst = bool(adcircfirst)
+        self.intervals = None
+
+    #--------------------------------------------------------------------------#
+    def _span(self, t0, t1):
+        """Return adcirc_span of exact times as an exact time."""
+        return max(0, math.ceil((t1 - self.tol - t0)/self.adcircdt))*self.adcircdt
+
+    #--------------------------------------------------------------------------#
+    def adcirc_span(self, t0, t1):
+        """Return the least multiple of the coupled ADCIRC dt taking t0 to t1-TIME_TOL."""
+        return float(self._span(_exact(t0), _exact(t1)))
+
+    #--------------------------------------------------------------------------#
+    def plan(self):
+        """Return the list of CouplingInterval of the whole run."""
+        if self.intervals is None:
+            if self.adcircfirst:
+                self.intervals = self._plan_adcirc_first()
+            else:
+                self.intervals = self._plan_nn_first()
+        return self.intervals
+
+    #--------------------------------------------------------------------------#
+    def _plan_nn_first(self):
+        """Return the list of CouplingInterval of the whole run, NN going first."""
+        intervals = []
+        T = self.nntstart                           # NN time
+        j = self.itime_bgn - 1                      # ADCIRC time steps done
+        A = self.adcirctstart + j*self.adcircdtdp   # ADCIRC time
+        adcircrunflag = True
+        # ADCIRC also stops at its last time step, should RNDAY not be a multiple of DTDP.
+        while ((A < self.adcirctfinal and j < self.adcircntsteps) or T < self.nntfinal):
+            nnrun = T < self.nntfinal
+            nnsteps = 0
+            if nnrun:
+                if adcircrunflag:
+                    # The NN must take at least one step, and reach ADCIRC's next time.
+                    nnsteps = max(1, math.ceil((A + self.adcircdt - self.tol - T)/self.nndt))
+                else:
+                    # ADCIRC is done; let the NN finish off directly.
+                    nnsteps = max(0, math.ceil((self.nntfinal - T)/self.nndt))
+                T = T + nnsteps*self.nndt
+
+            adcircrun = A < self.adcirctfinal and j < self.adcircntsteps
+            ntsteps = 0
+            if adcircrun:
+                if nnrun:
+                    # ADCIRC catches up with the NN, within TIME_TOL.
+                    ntsteps = self.couplingdtfactor*max(0,
+                            math.ceil((T + self.tol - A)/self.adcircdt) - 1)
+                else:
+                    ntsteps = self.adcircntsteps - j
+                ntsteps = min(ntsteps, self.adcircntsteps - j)
+                j += ntsteps
+                A = self.adcirctstart + j*self.adcircdtdp
+            else:
+                adcircrunflag = False
+
+            intervals.append(CouplingInterval(index=len(intervals),
+                nnrun=nnrun, nniter=float(T/self.nntimefact), nnsteps=nnsteps,
+                nntime=float(T), adcircrun=adcircrun, adcircntsteps=ntsteps,
+                adcirctime=float(A), seriestime=float(T)))
+        return intervals
+
+    #--------------------------------------------------------------------------#
+    def _plan_adcirc_first(self):
+        """Return the list of CouplingInterval of the whole run, ADCIRC going first."""
+        intervals = []
+        T = self.nntstart                           # NN time
+        j = self.itime_bgn - 1                      # ADCIRC time steps done
+        A = self.adcirctstart + j*self.adcircdtdp   # ADCIRC time
+        while ((A < self.adcirctfinal and j < self.adcircntsteps) or T < self.nntfinal):
+            nnrun = T < self.nntfinal
+            adcircrun = A < self.adcirctfinal and j < self.adcircntsteps
+            ntsteps = 0
+            if adcircrun:
+                if nnrun:
+                    # ADCIRC must take at least one step, and reach the NN's next time.
+                    ntsteps = self.couplingdtfactor*max(1,
+                            math.ceil((T + self.nndt - self.tol - A)/self.adcircdt))
+                else:
+                    ntsteps = self.adcircntsteps - j
+                ntsteps = min(ntsteps, self.adcircntsteps - j)
+                j += ntsteps
+                A = self.adcirctstart + j*self.adcircdtdp
+
+            nnsteps = 0
+            if nnrun:
+                if adcircrun:
+                    # The NN catches up with ADCIRC, within TIME_TOL.
+                    nnsteps = max(1, math.ceil((A - self.tol - T)/self.nndt))
+                else:
+                    # ADCIRC is done; let the NN finish off directly.
+                    nnsteps = max(0, math.ceil((self.nntfinal - T)/self.nndt))
+                T = T + nnsteps*self.nndt
+
+            # The series is set up to the end of the next ADCIRC interval.
+            intervals.append(CouplingInterval(index=len(intervals),
+                nnrun=nnrun, nniter=float(T/self.nntimefact), nnsteps=nnsteps,
+                nntime=float(T), adcircrun=adcircrun, adcircntsteps=ntsteps,
+                adcirctime=float(A), seriestime=float(A + self._span(A, T + self.nndt))))
+        return intervals
+
+    #--------------------------------------------------------------------------#
+    def summary(self):
+        """Return a dict of the step counts of the plan."""
+        intervals = self.plan()
+        nnsteps = sum(iv.nnsteps for iv in intervals)
+        adcircsteps = sum(iv.adcircntsteps for iv in intervals)
+        return {
+            'intervals'        : len(intervals),
+            'nn_steps'         : nnsteps,
+            'adcirc_steps'     : adcircsteps,
+            'adcirc_steps_per_interval' : adcircsteps/max(1, len(intervals)),
+            }
+
+    #--------------------------------------------------------------------------#
+    def print_plan(self):
+        """Print the plan and its step counts."""
+        print('{:>8} {:>14} {:>8} {:>14} {:>14}'.format(
+            'interval', 'NN niter', 'NN steps', 'ADCIRC steps', 'ADCIRC time'))
+        for iv in self.plan():
+            print('{:>8d} {:>14.3f} {:>8d} {:>14d} {:>14.3f}'.format(
+                iv.index, iv.nniter, iv.nnsteps, iv.adcircntsteps, iv.adcirctime))
+        summary = self.summary()
+        print('Coupling intervals       = {}'.format(summary['intervals']))
+        print('NN steps                 = {}'.format(summary['nn_steps']))
+        print('ADCIRC steps             = {}'.format(summary['adcirc_steps']))
+        print('ADCIRC steps per interval= {:.2f}'.format(summary['adcirc_steps_per_interval']))
+
+################################################################################
+if __name__ == '__main__':
+    pass
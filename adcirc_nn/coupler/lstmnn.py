@@ -5,18 +5,128 @@
 #------------------------------------------------------------------------------#
 """
 The Long Short Term Memory Neural Network module.
+
+Trained weights are read from a .npz file with the following arrays, using the
+gate order (input, forget, cell, output) of PyTorch/Keras exports:
+    W      (4H, I) : Input weights of the four gates, stacked
+    U      (4H, H) : Recurrent weights of the four gates, stacked
+    b      (4H,)   : Gate biases (sum of input and recurrent biases, if two)
+    W_out  (O, H)  : Output layer weights; O is 1, or the number of nodes of
+                     the coupled edge string for a value per node
+    b_out  (O,)    : Output layer biases
+and, optionally:
+    x_mean, x_std  (I,) : Input normalization
+    y_mean, y_std  (O,) : Output de-normalization
+    forcing_t (T,), forcing_x (T, I) : Input forcing series, times in seconds
+    dt, niter      ()   : NN time step and final time in seconds
+Without a weights file, the NN falls back to an analytic hydrograph.
+
+An ensemble of NNs is run as one NN with a leading member dimension. Members
+differ by their weights, if the arrays of the weights file have a leading
+member axis, e.g., W (E, 4H, I), and by Monte Carlo dropout on the output layer
+input and Gaussian noise on the normalized inputs, if asked for. x_mean and
+x_std are shared by all members.
+
+Several coupled boundaries are run by BatchedLongShortTermMemoryNN_class, which
+stacks the weights of the NNs of the same shape and advances them together.
+
+Arrays stored uncompressed (np.savez) are memory-mapped, so that coupled runs
+sharing a node share one copy of the weights in the page cache. All gate, state
+and output buffers are allocated once in initialize() and updated in place.
+
+With precision 'float32', the weights, states, gates and inputs are single
+precision; the boundary values in elev are float64, as ADCIRC reads them. The
+weights are then converted into memory rather than mapped. The noise of
+ensemble members is drawn in float64 in either precision, so that a float64
+NN from the same state draws the same noise.
 """
+import copy
+import hashlib
+import json
+import zipfile
+
 import numpy as np
 
 NN_TIME_FACTOR = 1.0 # No conversion for now. Seconds to seconds
+NN_DT_DEFAULT = 60.0
+NN_NITER_DEFAULT = 21600
+NN_STEP_TOL = 1.0e-9 # Relative tolerance when counting NN steps in an interval
+NN_CHUNK = 1024 # Maximum number of NN steps whose inputs are processed at once
+NN_PRECISIONS = {'float64': np.float64, 'float32': np.float32}
+NN_WEIGHT_ARRAYS = ('W', 'U', 'b', 'W_out', 'b_out', 'x_mean', 'x_std', 'y_mean', 'y_std')
+
+#------------------------------------------------------------------------------#
+def random_lstm_weights(input_size, hidden_size, output_size=1, seed=0):
+    """Return a dict of random LSTM weights, e.g., for np.savez and benchmarks."""
+    rng = np.random.default_rng(seed)
+    scale = 1.0/np.sqrt(hidden_size)
+    return {
+        'W'     : rng.uniform(-scale, scale, (4*hidden_size, input_size)),
+        'U'     : rng.uniform(-scale, scale, (4*hidden_size, hidden_size)),
+        'b'     : rng.uniform(-scale, scale, (4*hidden_size,)),
+        'W_out' : rng.uniform(-scale, scale, (output_size, hidden_size)),
+        'b_out' : np.zeros(output_size),
+        }
+
+#------------------------------------------------------------------------------#
+def load_npz_mmap(filename):
+    """Return a dict of the arrays in a .npz file, memory-mapping stored ones.
+
+    Members compressed with np.savez_compressed cannot be mapped and are read
+    into memory instead.
+    """
+    arrays = {}
+    with zipfile.ZipFile(filename) as archive, open(filename, 'rb') as f:
+        for info in archive.infolist():
+            key = info.filename[:-4] if info.filename.endswith('.npy') else info.filename
+            if info.compress_type != zipfile.ZIP_STORED:
+                with archive.open(info) as member:
+                    arrays[key] = np.lib.format.read_array(member)
+                continue
+            # Skip the local file header to reach the .npy data.
+            f.seek(info.header_offset + 26)
+            namelen, extralen = np.frombuffer(f.read(4), dtype='<u2')
+            f.seek(info.header_offset + 30 + int(namelen) + int(extralen))
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+            if dtype.hasobject:
+                raise ValueError('Object arrays in {} cannot be memory-mapped'.format(filename))
+            if len(shape) == 0:
+                arrays[key] = np.frombuffer(f.read(dtype.itemsize), dtype=dtype)[0]
+            else:
+                arrays[key] = np.memmap(filename, dtype=dtype, mode='r', offset=f.tell(),
+                        shape=shape, order='F' if fortran_order else 'C')
+    return arrays
+
+#------------------------------------------------------------------------------#
+def _sigmoid_(x):
+    """Logistic function, in place."""
+    np.negative(x, out=x)
+    np.exp(x, out=x)
+    x += 1.0
+    np.reciprocal(x, out=x)
 
 #------------------------------------------------------------------------------#
 class LongShortTermMemoryNN_class():
     """The Long Short Term Memory Neural Network class."""
 
     #--------------------------------------------------------------------------#
-    def __init__(self):
-        """Construct LSTM NN object."""
+    def __init__(self, weightsfile=None, ensemblesize=1, dropout=0.0, forcingnoise=0.0, seed=0,
+            precision='float64'):
+        """Construct LSTM NN object, optionally from a .npz weights file.
+
+        With ensemblesize members, run() gives elev for each member along a
+        leading axis. dropout is the Monte Carlo dropout rate of the output
+        layer input, and forcingnoise the standard deviation of the noise
+        added to the normalized inputs of each member; seed seeds both.
+        precision, 'float64' or 'float32', is that of the NN arithmetic.
+        """
+        if precision not in NN_PRECISIONS:
+            raise ValueError('Unknown NN precision {}; use one of {}'.format(
+                precision, tuple(NN_PRECISIONS)))
 
         self._DEBUG = 0
 
@@ -40,14 +150,197 @@ class LongShortTermMemoryNN_class():
 
         self.runflag = 1 # Only for use in coupling with ADCIRC.
 
+        # LSTM data
+        self.weightsfile = weightsfile
+        self.weights = None
+        self.hiddensize = 0
+        self.inputsize = 0
+        self.outputsize = 0
+        self.h = None # Hidden state, kept across calls to run()
+        self.c = None # Cell state, kept across calls to run()
+        self.forcing_t = None
+        self.forcing_x = None
+        self.chunksize = NN_CHUNK
+        self.precision = precision
+        self.dtype = NN_PRECISIONS[precision]
+        self.cache = None # Optional NNRunCache in front of run()
+        self._digest = None
+
+        # Ensemble data
+        self.ensemblesize = int(ensemblesize)
+        self.memberweights = False # Weights per member, or shared
+        self.dropout = float(dropout)
+        self.forcingnoise = float(forcingnoise)
+        self._rng = np.random.default_rng(seed)
+        if not 0.0 <= self.dropout < 1.0:
+            raise ValueError('NN dropout rate must be in [0, 1); got {}'.format(dropout))
+
+    #--------------------------------------------------------------------------#
+    def load_weights(self, weightsfile):
+        """Load the LSTM weights and optional settings from a .npz file."""
+        weights = load_npz_mmap(weightsfile)
+        for key in ('W', 'U', 'b', 'W_out', 'b_out'):
+            if key not in weights:
+                raise KeyError('LSTM weights file {} has no array {}'.format(weightsfile, key))
+
+        # Weights of an ensemble have a leading member axis.
+        self.memberweights = weights['W'].ndim == 3
+        if self.memberweights:
+            if self.ensemblesize not in (1, weights['W'].shape[0]):
+                raise ValueError('LSTM weights file {} has {} members, not {}'.format(
+                    weightsfile, weights['W'].shape[0], self.ensemblesize))
+            self.ensemblesize = weights['W'].shape[0]
+        self.hiddensize = weights['U'].shape[-1]
+        self.inputsize = weights['W'].shape[-1]
+        self.outputsize = weights['W_out'].shape[-2]
+        if weights['W'].shape[-2] != 4*self.hiddensize or weights['U'].shape[-2] != 4*self.hiddensize:
+            raise ValueError('LSTM weights file {}: W and U must have 4H = {} rows; got {} and {}'.format(
+                weightsfile, 4*self.hiddensize, weights['W'].shape[-2], weights['U'].shape[-2]))
+        weights.setdefault('x_mean', np.zeros(self.inputsize))
+        weights.setdefault('x_std', np.ones(self.inputsize))
+        weights.setdefault('y_mean', np.zeros(self.outputsize))
+        weights.setdefault('y_std', np.ones(self.outputsize))
+        if self.dtype != np.float64:
+            for key in NN_WEIGHT_ARRAYS:
+                weights[key] = np.asarray(weights[key], dtype=self.dtype)
+        self.weights = weights
+
+        if 'forcing_t' in weights and 'forcing_x' in weights:
+            self.set_forcing(weights['forcing_t'], weights['forcing_x'])
+
+    #--------------------------------------------------------------------------#
+    def set_forcing(self, times, values):
+        """Set the input forcing series, interpolated in time at every NN step."""
+        if self.weights is None:
+            return # The analytic hydrograph has no inputs.
+        self.forcing_t = np.asarray(times, dtype=float)
+        self.forcing_x = np.asarray(values, dtype=float).reshape(len(self.forcing_t), -1)
+        if self.forcing_x.shape[1] != self.inputsize:
+            raise ValueError('NN forcing has {} inputs; the NN takes {}'.format(
+                self.forcing_x.shape[1], self.inputsize))
+
+    #--------------------------------------------------------------------------#
+    def copy_forcing(self, other):
+        """Take the input forcing series of other, an NN of the same weights."""
+        self.forcing_t, self.forcing_x = other.forcing_t, other.forcing_x
+
+    #--------------------------------------------------------------------------#
+    def allocate_workspace(self):
+        """Allocate the state, gate and chunk buffers used by run()."""
+        H = self.hiddensize
+        n = self.chunksize
+        dtype = self.dtype
+        self.h = np.zeros(H, dtype=dtype)
+        self.c = np.zeros(H, dtype=dtype)
+        self._z = np.empty(4*H, dtype=dtype)  # Gate pre-activations, then activations, of one step
+        self._tmp = np.empty(H, dtype=dtype)
+        self._times = np.empty(n)
+        self._x = np.empty((n, self.inputsize), dtype=dtype)
+        self._xg = np.empty((n, 4*H), dtype=dtype) # Input contribution to the gates
+        self._hs = np.empty((n, H), dtype=dtype)
+        self._y = np.empty((n, self.outputsize), dtype=dtype)
+        # Contiguous transposes, so that the chunk products can write in place.
+        self._WT = np.ascontiguousarray(np.swapaxes(self.weights['W'], -1, -2))
+        self._WoutT = np.ascontiguousarray(np.swapaxes(self.weights['W_out'], -1, -2))
+        if self.ensemblesize > 1:
+            self.allocate_ensemble_workspace()
+
+    #--------------------------------------------------------------------------#
+    def allocate_ensemble_workspace(self):
+        """Allocate the member-stacked state, gate and chunk buffers used by run()."""
+        E, H, n = self.ensemblesize, self.hiddensize, self.chunksize
+        w, dtype = self.weights, self.dtype
+        self.h = np.zeros((E, H), dtype=dtype)
+        self.c = np.zeros((E, H), dtype=dtype)
+        self._z = np.empty((E, 4*H), dtype=dtype)
+        self._tmp = np.empty((E, H), dtype=dtype)
+        self._xe = np.empty(E*n*self.inputsize) # Perturbed inputs of each member; contiguous for the RNG
+        # The perturbed inputs in the NN precision, and the dropout draws; filled in place.
+        self._xc = None if dtype == self._xe.dtype else np.empty(E*n*self.inputsize, dtype=dtype)
+        self._mask = np.empty(E*n*H) if self.dropout > 0.0 else None
+        self._xg = np.empty((E, n, 4*H), dtype=dtype)
+        self._hs = np.empty((E, n, H), dtype=dtype)
+        self._y = np.empty((E, n, self.outputsize), dtype=dtype)
+        if self.memberweights:
+            self._U = np.asarray(w['U'])
+        else:
+            self._UT = np.ascontiguousarray(w['U'].T)
+        # Biases and de-normalization broadcast over steps, per member or shared.
+        member = lambda a : np.asarray(a)[:,None,:] if np.ndim(a) == 2 else np.asarray(a)
+        self._b, self._b_out = member(w['b']), member(w['b_out'])
+        self._y_std, self._y_mean = member(w['y_std']), member(w['y_mean'])
+
+    #--------------------------------------------------------------------------#
+    def nelev(self):
+        """Return the number of boundary values given by each run."""
+        return 1 if self.weights is None else self.outputsize
+
+    #--------------------------------------------------------------------------#
+    def clone(self):
+        """Return a copy sharing the weights, with its own state and workspace."""
+        other = copy.copy(self)
+        other._rng = copy.deepcopy(self._rng)
+        if self.weights is not None:
+            other.allocate_workspace()
+            other.h[:] = self.h
+            other.c[:] = self.c
+        return other
+
+    #--------------------------------------------------------------------------#
+    def reset_state(self):
+        """Zero the hidden and cell states."""
+        self.h[:] = 0.0
+        self.c[:] = 0.0
+
+    #--------------------------------------------------------------------------#
+    def get_state(self):
+        """Return a dict of the arrays needed to continue the run, for checkpoints."""
+        state = {
+            'timer'      : self.timer,
+            'niter'      : self.niter,
+            'elev'       : self.elev,
+            'elevprev'   : self.elevprev,
+            'elevprev_t' : self.elevprev_t,
+            'runflag'    : self.runflag,
+            'go'         : self.go,
+            'rng'        : json.dumps(self._rng.bit_generator.state),
+            }
+        if self.h is not None:
+            state['h'] = self.h
+            state['c'] = self.c
+        return state
+
+    #--------------------------------------------------------------------------#
+    def set_state(self, state):
+        """Continue the run from a dict returned by get_state()."""
+        scalar = lambda v : float(v) if np.ndim(v) == 0 else np.array(v)
+        self.timer = float(state['timer'])
+        self.niter = float(state['niter'])
+        self.elev = scalar(state['elev'])
+        self.elevprev = scalar(state['elevprev'])
+        self.elevprev_t = float(state['elevprev_t'])
+        self.runflag = int(state['runflag'])
+        self.go = int(state['go'])
+        self._rng.bit_generator.state = json.loads(str(state['rng']))
+        if self.h is not None:
+            self.h[:] = state['h']
+            self.c[:] = state['c']
+
     #--------------------------------------------------------------------------#
     def initialize(self):
         """Initialize LSTM NN object."""
 
-        # Hard-coded values for now:
-        self.dt = 60.0
+        # Defaults, unless given by the weights file:
+        self.dt = NN_DT_DEFAULT
         self.timer = 0
-        self.niter = 21600
+        self.niter = NN_NITER_DEFAULT
+        if self.weightsfile is not None:
+            self.load_weights(self.weightsfile)
+            self.dt = float(self.weights.get('dt', self.dt))
+            self.niter = float(self.weights.get('niter', self.niter))
+            self.allocate_workspace()
+        elif self.ensemblesize > 1:
+            raise ValueError('An NN ensemble needs a weights file')
         self.elbcfunc = lambda t : 5.0e0*(1-np.cos(2.0*np.pi * t / self.tfinal))
         #self.dummytimes = np.arange(0.0, self.dt*5, self.tfinal)
         #self.dummyvalues = 1.0e3*(1-np.cos(4.0*np.pi/self.dummytimes))
@@ -56,15 +349,190 @@ class LongShortTermMemoryNN_class():
         self.tprev = self.timer
         self.tfinal = self.niter
 
+    #--------------------------------------------------------------------------#
+    def nsteps(self, niter=None, timer=None):
+        """Return the number of NN time steps needed to reach niter from timer."""
+        niter = self.niter if niter is None else niter
+        timer = self.timer if timer is None else timer
+        return max(0, int(np.ceil((niter-timer)/self.dt - NN_STEP_TOL)))
+
+    #--------------------------------------------------------------------------#
+    def timer_after(self, niter, timer):
+        """Return the NN time reached by running from timer to niter."""
+        return timer + self.nsteps(niter, timer)*self.dt
+
+    #--------------------------------------------------------------------------#
+    def inputs(self, times, out):
+        """Write the normalized NN inputs at the given times into out, shape (nt, I)."""
+        w = self.weights
+        if self.forcing_t is None:
+            out[:] = 0.0
+        else:
+            for j in range(self.inputsize):
+                out[:,j] = np.interp(times, self.forcing_t, self.forcing_x[:,j])
+        out -= w['x_mean']
+        out /= w['x_std']
+
+    #--------------------------------------------------------------------------#
+    def forward(self, n):
+        """Advance the LSTM over the first n inputs in the chunk buffers.
+
+        Writes the de-normalized outputs into the first n rows of self._y.
+        """
+        w = self.weights
+        H = self.hiddensize
+        U = w['U']
+        h, c, z, tmp = self.h, self.c, self._z, self._tmp
+        ifgate, ggate, ogate = z[:2*H], z[2*H:3*H], z[3*H:]
+        igate, fgate = z[:H], z[H:2*H]
+        xg, hs = self._xg[:n], self._hs[:n]
+
+        # Input contribution to all four gates, for all steps at once.
+        np.matmul(self._x[:n], self._WT, out=xg)
+        xg += w['b']
+        for k in range(n):
+            np.dot(U, h, out=z)
+            z += xg[k]
+            _sigmoid_(ifgate)
+            np.tanh(ggate, out=ggate)
+            _sigmoid_(ogate)
+            c *= fgate
+            np.multiply(igate, ggate, out=tmp)
+            c += tmp
+            np.tanh(c, out=tmp)
+            np.multiply(ogate, tmp, out=h)
+            hs[k] = h
+
+        y = self._y[:n]
+        np.matmul(hs, self._WoutT, out=y)
+        y += w['b_out']
+        y *= w['y_std']
+        y += w['y_mean']
+
+    #--------------------------------------------------------------------------#
+    def forward_ensemble(self, n):
+        """Advance all ensemble members over the first n inputs in the chunk buffers.
+
+        Writes the de-normalized outputs into self._y[:,:n].
+        """
+        H = self.hiddensize
+        h, c, z, tmp = self.h, self.c, self._z, self._tmp
+        ifgate, ggate, ogate = z[:,:2*H], z[:,2*H:3*H], z[:,3*H:]
+        igate, fgate = z[:,:H], z[:,H:2*H]
+        xg, hs = self._xg[:,:n], self._hs[:,:n]
+
+        # Input contribution to all four gates, for all steps and members at once.
+        if self.forcingnoise > 0.0:
+            xe = self._xe[:self.ensemblesize*n*self.inputsize].reshape(self.ensemblesize, n, -1)
+            self._rng.standard_normal(out=xe)
+            xe *= self.forcingnoise
+            xe += self._x[:n]
+            if self._xc is not None:
+                xc = self._xc[:xe.size].reshape(xe.shape)
+                np.copyto(xc, xe)
+                xe = xc
+            np.matmul(xe, self._WT, out=xg)
+        elif self.memberweights:
+            np.matmul(self._x[:n], self._WT, out=xg)
+        else:
+            np.matmul(self._x[:n], self._WT, out=xg[0])
+            xg[1:] = xg[0]
+        xg += self._b
+        for k in range(n):
+            if self.memberweights:
+                np.matmul(self._U, h[:,:,None], out=z[:,:,None])
+            else:
+                np.matmul(h, self._UT, out=z)
+            z += xg[:,k]
+            _sigmoid_(ifgate)
+            np.tanh(ggate, out=ggate)
+            _sigmoid_(ogate)
+            c *= fgate
+            np.multiply(igate, ggate, out=tmp)
+            c += tmp
+            np.tanh(c, out=tmp)
+            np.multiply(ogate, tmp, out=h)
+            hs[:,k] = h
+
+        if self.dropout > 0.0:
+            # Monte Carlo dropout of the output layer input, scaled to keep its mean.
+            mask = self._mask[:hs.size].reshape(hs.shape)
+            self._rng.random(out=mask)
+            np.greater_equal(mask, self.dropout, out=mask)
+            hs *= mask
+            hs *= 1.0/(1.0 - self.dropout)
+        y = self._y[:,:n]
+        np.matmul(hs, self._WoutT, out=y)
+        y += self._b_out
+        y *= self._y_std
+        y += self._y_mean
+
+    #--------------------------------------------------------------------------#
+    def weights_digest(self):
+        """Return a hash of the weights and of the ensemble settings."""
+        if self._digest is None:
+            digest = hashlib.blake2b(digest_size=16)
+            digest.update(repr((self.ensemblesize, self.dropout, self.forcingnoise)).encode())
+            if self.weights is None:
+                digest.update(b'analytic')
+            else:
+                for key in sorted(self.weights):
+                    array = np.ascontiguousarray(self.weights[key])
+                    digest.update(repr((key, array.dtype.str, array.shape)).encode())
+                    digest.update(array.data)
+            self._digest = digest.hexdigest()
+        return self._digest
+
+    #--------------------------------------------------------------------------#
+    def input_window(self, times):
+        """Return the normalized NN inputs at the given times, as read by run()."""
+        if self.weights is None:
+            return np.zeros((len(times), 0))
+        x = np.empty((len(times), self.inputsize))
+        self.inputs(times, x)
+        return x
+
     #--------------------------------------------------------------------------#
     def run(self):
-        """Run the LSTM NN object."""
+        """Run the LSTM NN object from timer to niter, or take its result from the cache."""
+        if self.cache is not None:
+            return self.cache.run(self)
+        return self.run_uncached()
+
+    #--------------------------------------------------------------------------#
+    def run_uncached(self):
+        """Run the LSTM NN object from timer to niter."""
+
+        nsteps = self.nsteps()
+        if nsteps == 0:
+            return 0
 
-        # Run the NN model. For now, just set the dummy value for next "t"
-        while (self.timer < self.niter):
-            self.elev = self.elbcfunc(self.timer + self.dt)
-            # Increment model time
-            self.timer += self.dt
+        if self.weights is None:
+            # No trained NN; just set the analytic value at the final "t"
+            self.timer = self.timer_after(self.niter, self.timer)
+            self.elev = self.elbcfunc(self.timer)
+            return 0
+
+        timer0 = self.timer
+        for first in range(0, nsteps, self.chunksize):
+            n = min(self.chunksize, nsteps-first)
+            times = self._times[:n]
+            np.multiply(np.arange(first+1, first+n+1), self.dt, out=times)
+            times += timer0
+            self.inputs(times, self._x[:n])
+            if self.ensemblesize > 1:
+                self.forward_ensemble(n)
+            else:
+                self.forward(n)
+        if self.ensemblesize > 1:
+            # One value, or row of values, per member.
+            self.elev = (self._y[:,n-1,0] if self.outputsize == 1 else self._y[:,n-1]).astype(float)
+        elif self.outputsize == 1:
+            self.elev = float(self._y[n-1,0])
+        else:
+            self.elev = self._y[n-1].astype(float)
+        # Increment model time
+        self.timer = self.timer_after(self.niter, timer0)
 
         return 0
 
@@ -74,3 +542,236 @@ class LongShortTermMemoryNN_class():
         # Do nothing for now
         pass
 
+#------------------------------------------------------------------------------#
+class BatchedLongShortTermMemoryNN_class(LongShortTermMemoryNN_class):
+    """LSTM NNs of several coupled boundaries, run as one NN.
+
+    Boundary k has nnodes[k] nodes, and elev holds the values of all boundary
+    nodes one boundary after the other. NNs with weights of the same shape are
+    stacked along a batch dimension and advanced with one matrix product per
+    time step for the whole batch; NNs without weights use their analytic
+    hydrograph. All NNs must share the time step and final time.
+    """
+
+    #--------------------------------------------------------------------------#
+    def __init__(self, weightsfiles, nnodes, precision='float64'):
+        """Construct the NNs of the boundaries from a list of .npz files, or None."""
+        super().__init__(precision=precision)
+        if len(weightsfiles) != len(nnodes):
+            raise ValueError('Got {} NN weights files for {} boundaries'.format(
+                len(weightsfiles), len(nnodes)))
+        self.members = [LongShortTermMemoryNN_class(weightsfile=f, precision=precision)
+                for f in weightsfiles]
+        self.nnodes = np.asarray(nnodes, dtype=int)
+        self.offsets = np.concatenate(([0], np.cumsum(self.nnodes)))
+        self.groups = []
+        self.analytic = []
+
+    #--------------------------------------------------------------------------#
+    def nelev(self):
+        """Return the number of boundary values given by each run."""
+        return int(self.offsets[-1])
+
+    #--------------------------------------------------------------------------#
+    def stack_weights(self):
+        """Group the NNs with weights by shape and stack the weights of each group."""
+        shapes = {}
+        for k, m in enumerate(self.members):
+            if m.weights is None:
+                continue
+            if m.ensemblesize > 1:
+                raise ValueError('NN of boundary {} is an ensemble; batched boundaries cannot be'.format(k+1))
+            if m.outputsize not in (1, self.nnodes[k]):
+                raise ValueError('NN of boundary {} gives {} values for {} nodes'.format(
+                    k+1, m.outputsize, self.nnodes[k]))
+            shapes.setdefault((m.inputsize, m.hiddensize, m.outputsize), []).append(k)
+        self.analytic = [k for k, m in enumerate(self.members) if m.weights is None]
+
+        self.groups = []
+        for (I, H, O), ks in shapes.items():
+            ws = [self.members[k].weights for k in ks]
+            stack = lambda key : np.stack([np.asarray(w[key], dtype=self.dtype) for w in ws])
+            # Where each output goes in elev; one output is repeated over the nodes.
+            dst = np.concatenate([np.arange(self.offsets[k], self.offsets[k+1]) for k in ks])
+            src = np.concatenate([g*O + (np.zeros(self.nnodes[k], dtype=int) if O == 1
+                else np.arange(O)) for g, k in enumerate(ks)])
+            self.groups.append({
+                'members' : ks,
+                'WT'      : np.ascontiguousarray(stack('W').transpose(0, 2, 1)),
+                'U'       : stack('U'),
+                'b'       : stack('b')[:,None,:],
+                'WoutT'   : np.ascontiguousarray(stack('W_out').transpose(0, 2, 1)),
+                'b_out'   : stack('b_out')[:,None,:],
+                'y_std'   : stack('y_std')[:,None,:],
+                'y_mean'  : stack('y_mean')[:,None,:],
+                'dst'     : dst,
+                'src'     : src,
+                })
+
+    #--------------------------------------------------------------------------#
+    def allocate_workspace(self):
+        """Allocate the stacked state, gate and chunk buffers of each group."""
+        n, dtype = self.chunksize, self.dtype
+        for group in self.groups:
+            G, I, H4 = group['WT'].shape
+            H, O = H4//4, group['WoutT'].shape[2]
+            group['h'] = np.zeros((G, H), dtype=dtype)
+            group['c'] = np.zeros((G, H), dtype=dtype)
+            group['z'] = np.empty((G, H4), dtype=dtype)
+            group['tmp'] = np.empty((G, H), dtype=dtype)
+            group['x'] = np.empty((G, n, I), dtype=dtype)
+            group['xg'] = np.empty((G, n, H4), dtype=dtype)
+            group['hs'] = np.empty((G, n, H), dtype=dtype)
+            group['y'] = np.empty((G, n, O), dtype=dtype)
+        self._times = np.empty(n)
+
+    #--------------------------------------------------------------------------#
+    def clone(self):
+        """Return a copy sharing the weights, with its own states and workspace."""
+        other = copy.copy(self)
+        other.members = [m.clone() for m in self.members]
+        other.elev = np.copy(self.elev)
+        other.groups = [dict(group) for group in self.groups]
+        other.allocate_workspace()
+        for group, mine in zip(other.groups, self.groups):
+            group['h'][:] = mine['h']
+            group['c'][:] = mine['c']
+        return other
+
+    #--------------------------------------------------------------------------#
+    def reset_state(self):
+        """Zero the hidden and cell states."""
+        for group in self.groups:
+            group['h'][:] = 0.0
+            group['c'][:] = 0.0
+
+    #--------------------------------------------------------------------------#
+    def get_state(self):
+        """Return a dict of the arrays needed to continue the run, for checkpoints."""
+        state = super().get_state()
+        for g, group in enumerate(self.groups):
+            state['h{}'.format(g)] = group['h']
+            state['c{}'.format(g)] = group['c']
+        return state
+
+    #--------------------------------------------------------------------------#
+    def set_state(self, state):
+        """Continue the run from a dict returned by get_state()."""
+        super().set_state(state)
+        for g, group in enumerate(self.groups):
+            group['h'][:] = state['h{}'.format(g)]
+            group['c'][:] = state['c{}'.format(g)]
+
+    #--------------------------------------------------------------------------#
+    def initialize(self):
+        """Initialize the NNs of all boundaries."""
+        for m in self.members:
+            m.initialize()
+        dts = set(m.dt for m in self.members)
+        niters = set(m.niter for m in self.members)
+        if len(dts) > 1 or len(niters) > 1:
+            raise ValueError('NNs of coupled boundaries must share dt and niter; got {} and {}'.format(
+                sorted(dts), sorted(niters)))
+        self.dt = self.members[0].dt
+        self.timer = 0
+        self.niter = self.members[0].niter
+        self.btime = 0.0
+        self.tprev = self.timer
+        self.tfinal = self.niter
+        self.elev = np.zeros(self.nelev())
+        self.stack_weights()
+        self.allocate_workspace()
+
+    #--------------------------------------------------------------------------#
+    def set_forcing(self, times, values):
+        """Set the input forcing series of each boundary from a column of values."""
+        values = np.asarray(values, dtype=float).reshape(len(times), -1)
+        for k, m in enumerate(self.members):
+            m.set_forcing(times, values[:,k:k+1])
+
+    #--------------------------------------------------------------------------#
+    def copy_forcing(self, other):
+        """Take the input forcing series of the boundaries of other."""
+        for m, o in zip(self.members, other.members):
+            m.copy_forcing(o)
+
+    #--------------------------------------------------------------------------#
+    def forward(self, group, n):
+        """Advance the LSTMs of group over the first n inputs in its chunk buffers."""
+        h, c, z, tmp = group['h'], group['c'], group['z'], group['tmp']
+        H = h.shape[1]
+        ifgate, ggate, ogate = z[:,:2*H], z[:,2*H:3*H], z[:,3*H:]
+        igate, fgate = z[:,:H], z[:,H:2*H]
+        xg, hs = group['xg'][:,:n], group['hs'][:,:n]
+        U, zc, hc = group['U'], z[:,:,None], h[:,:,None]
+
+        # Input contribution to all gates, for all steps and NNs at once.
+        np.matmul(group['x'][:,:n], group['WT'], out=xg)
+        xg += group['b']
+        for k in range(n):
+            np.matmul(U, hc, out=zc)
+            z += xg[:,k]
+            _sigmoid_(ifgate)
+            np.tanh(ggate, out=ggate)
+            _sigmoid_(ogate)
+            c *= fgate
+            np.multiply(igate, ggate, out=tmp)
+            c += tmp
+            np.tanh(c, out=tmp)
+            np.multiply(ogate, tmp, out=h)
+            hs[:,k] = h
+
+        y = group['y'][:,:n]
+        np.matmul(hs, group['WoutT'], out=y)
+        y += group['b_out']
+        y *= group['y_std']
+        y += group['y_mean']
+
+    #--------------------------------------------------------------------------#
+    def weights_digest(self):
+        """Return a hash of the weights of all boundaries."""
+        if self._digest is None:
+            digest = hashlib.blake2b(digest_size=16)
+            digest.update(repr(self.nnodes.tolist()).encode())
+            for m in self.members:
+                digest.update(m.weights_digest().encode())
+            self._digest = digest.hexdigest()
+        return self._digest
+
+    #--------------------------------------------------------------------------#
+    def input_window(self, times):
+        """Return the normalized inputs of the NNs of all boundaries at the given times."""
+        return np.concatenate([m.input_window(times) for m in self.members], axis=1)
+
+    #--------------------------------------------------------------------------#
+    def run_uncached(self):
+        """Run the NNs of all boundaries from timer to niter."""
+
+        nsteps = self.nsteps()
+        if nsteps == 0:
+            return 0
+
+        timer0 = self.timer
+        elev = np.empty(self.nelev()) # New every run, as it may be queued by a pipeline
+        for group in self.groups:
+            for first in range(0, nsteps, self.chunksize):
+                n = min(self.chunksize, nsteps-first)
+                times = self._times[:n]
+                np.multiply(np.arange(first+1, first+n+1), self.dt, out=times)
+                times += timer0
+                for g, k in enumerate(group['members']):
+                    self.members[k].inputs(times, group['x'][g,:n])
+                self.forward(group, n)
+            elev[group['dst']] = group['y'][:,n-1].ravel()[group['src']]
+
+        for k in self.analytic:
+            m = self.members[k]
+            m.timer, m.niter = timer0, self.niter
+            m.run()
+            elev[self.offsets[k]:self.offsets[k+1]] = m.elev
+        self.elev = elev
+
+        # Increment model time
+        self.timer = self.timer_after(self.niter, timer0)
+
+        return 0
@@ -0,0 +1,236 @@
+#!/usr/bin/env python
+#------------------------------------------------------------------------------#
+# adcirc-nn - Software for physics-based machine learning with ADCIRC
+# LICENSE: BSD 3-Clause "New" or "Revised"
+#------------------------------------------------------------------------------#
+"""
+A pure Python/NumPy stand-in for pyADCIRC.libadcpy.
+
+Implements the subset of pyADCIRC used by the coupler, on a synthetic mesh with
+a single serial PE, so that the coupling can be run, profiled, and regression
+tested without the ADCIRC shared libraries. ADCIRC's handling of the elevation
+specified boundary series is emulated: once the model time passes ETIME2, the
+series is shifted and the next NETA values are read from unit 19. Hot start
+files, holding the time step and elevations only, are written every NHSINC time
+steps to mock_hotstart.npz in the input directory, and read at init if IHOT is
+set.
+
+The mesh and cost are set by configure() before pyadcirc_init(), or by the
+environment variables ADCIRC_NN_MOCK_<KEY> for the keys of MOCK_CONFIG_DEFAULT.
+"""
+import os
+import time
+
+import numpy as np
+
+################################################################################
+MOCK_CONFIG_DEFAULT = {
+    'np'     : 10000,  # Number of mesh nodes
+    'nope'   : 1,      # Number of elevation specified boundary segments
+    'neta'   : 20,     # Total number of elevation specified boundary nodes
+    'dt'     : 2.0,    # ADCIRC time step in seconds
+    'statim' : 0.0,    # Starting time in days
+    'rnday'  : 0.25,   # Run length in days
+    'work'   : 1,      # Number of sweeps over the mesh per time step
+    'messg'  : 0,      # Pretend to run with MPI (on a single PE)
+    'nghost' : 0,      # Boundary nodes at the end of the mesh owned by another PE
+    'nhsinc' : 0,      # Time steps between hot start files; 0 for none
+    'ihot'   : 0,      # Start from the hot start file if nonzero
+    'inputdir' : '.',
+    }
+MOCK_CONFIG = dict(MOCK_CONFIG_DEFAULT)
+for _key, _value in MOCK_CONFIG_DEFAULT.items():
+    _env = os.environ.get('ADCIRC_NN_MOCK_'+_key.upper())
+    if _env is not None:
+        MOCK_CONFIG[_key] = type(_value)(_env)
+
+def configure(**kwargs):
+    """Update the mock configuration; takes effect at the next pyadcirc_init()."""
+    for key in kwargs:
+        if key not in MOCK_CONFIG_DEFAULT:
+            raise KeyError('Unknown mock ADCIRC setting {}'.format(key))
+    MOCK_CONFIG.update(kwargs)
+
+################################################################################
+class _Module():
+    """Namespace standing in for an f2py wrapped Fortran module."""
+    pass
+
+utilities = _Module()
+utilities.on = 1
+utilities.off = 0
+utilities.unset_int = -99999
+utilities.debug = utilities.off
+utilities.messg = utilities.off
+
+sizes = _Module()
+pyglobal = _Module()
+pymesh = _Module()
+pyboundaries = _Module()
+pymessenger = _Module()
+pyadcirc_mod = _Module()
+
+# Counters for regression tests of the coupling overhead.
+stats = {'steps': 0, 'fort19_opens': 0, 'fort19_reads': 0, 'run_time': 0.0}
+
+_fort19 = {'values': None, 'pos': 0}
+
+MOCK_HOTSTART_FILE = 'mock_hotstart.npz'
+
+################################################################################
+def pyfindelapsedtime(itime):
+    """Return the model time in seconds after time step itime."""
+    return pyglobal.statim*86400.0 + itime*pyglobal.dtdp
+
+def pycloseopenedfileforread(unit):
+    """Close a Fortran unit opened for reading."""
+    if unit == 19:
+        _fort19['values'] = None
+    return 0
+
+def pyopenfileforread(unit, filename):
+    """Open a Fortran unit for reading; unit 19 is read in full at once."""
+    if unit == 19:
+        text = open(filename).read().split()
+        _fort19['values'] = np.array(text, dtype=float)
+        _fort19['pos'] = 0
+        stats['fort19_opens'] += 1
+    return 0
+
+def pymsg_dbl_max(value, comm):
+    """Return the maximum of value over all PEs; there is only one here."""
+    return float(value)
+
+utilities.pyfindelapsedtime = pyfindelapsedtime
+utilities.pycloseopenedfileforread = pycloseopenedfileforread
+pyglobal.pyopenfileforread = pyopenfileforread
+pymessenger.pymsg_dbl_max = pymsg_dbl_max
+
+################################################################################
+def _read_fort19(n):
+    """Read the next n values of the elevation series from unit 19."""
+    values = _fort19['values']
+    if values is None:
+        # The original fort.19 of the synthetic mesh holds zeros only.
+        return np.zeros(n)
+    pos = _fort19['pos']
+    if pos+n > len(values):
+        raise EOFError('Mock ADCIRC: end of file reading unit 19 at time {}'.format(
+            pyfindelapsedtime(pyadcirc_mod.itime_bgn)))
+    _fort19['pos'] = pos+n
+    stats['fort19_reads'] += 1
+    return values[pos:pos+n]
+
+def _timestep(itime):
+    """Advance the synthetic model by one time step."""
+    pg, pb, pm = pyglobal, pyboundaries, pymesh
+    timeh = pyfindelapsedtime(itime)
+    if pb.nope > 0:
+        # Elevation specified boundary forcing, as in ADCIRC's timestep.F
+        if timeh > pg.etime2:
+            pg.etime1 = pg.etime2
+            pg.etime2 = pg.etime1 + pg.etiminc
+            pg.esbin1[:pb.neta] = pg.esbin2[:pb.neta]
+            pg.esbin2[:pb.neta] = _read_fort19(pb.neta)
+        etratio = (timeh - pg.etime1)/pg.etiminc
+        pg.eta2[pb.nbdvnodes] = pg.esbin1[:pb.neta] + etratio*(
+            pg.esbin2[:pb.neta] - pg.esbin1[:pb.neta])
+    # Stand-in for the solver: smooth the boundary signal into the domain.
+    eta = pg.eta2
+    for sweep in range(int(MOCK_CONFIG['work'])):
+        eta[1:-1] = 0.5*eta[1:-1] + 0.25*(eta[:-2] + eta[2:])
+    stats['steps'] += 1
+
+################################################################################
+def pyadcirc_init():
+    """Set up the synthetic mesh, boundaries, and time stepping."""
+    cfg = MOCK_CONFIG
+    nnodes, nope, neta = int(cfg['np']), int(cfg['nope']), int(cfg['neta'])
+    assert(neta >= nope and nnodes > neta)
+
+    sizes.mnproc = 1
+    sizes.myproc = 0
+    sizes.inputdir = np.array(cfg['inputdir'].encode(), dtype='S2048')
+    utilities.messg = utilities.on if cfg['messg'] else utilities.off
+    pymessenger.mpi_comm_adcirc = 0
+    # 1-based subdomain owning each node; the last nghost are ghosts of PE 1.
+    pymessenger.ibelongto = np.ones(nnodes, dtype=np.int32)
+    pymessenger.ibelongto[nnodes-int(cfg['nghost']):] = 2
+
+    pymesh.np = nnodes
+    pymesh.dp = np.linspace(10.0, 1.0, nnodes) # Depth decreasing towards the boundaries
+
+    # Elevation boundary segments of nearly equal length at the end of the mesh.
+    pb = pyboundaries
+    pb.nope = nope
+    pb.neta = neta
+    pb.nvdll = np.full(nope, neta//nope, dtype=np.int32)
+    pb.nvdll[:neta%nope] += 1
+    pb.nbdvnodes = np.arange(nnodes-neta, nnodes) # 0-based, in ESBIN order
+    pb.nbdv = np.zeros((nope, pb.nvdll.max()), dtype=np.int32)
+    pb.nbou = nope
+    pb.nvell = pb.nvdll.copy()
+    pb.nbvv = np.zeros((nope, pb.nvdll.max()+1), dtype=np.int32)
+    start = 0
+    for k in range(nope):
+        nodes = pb.nbdvnodes[start:start+pb.nvdll[k]] + 1
+        pb.nbdv[k,:pb.nvdll[k]] = nodes
+        pb.nbvv[k,1:pb.nvdll[k]+1] = nodes
+        start += pb.nvdll[k]
+
+    pg = pyglobal
+    pg.comm = 0
+    pg.dt = float(cfg['dt'])
+    pg.dtdp = pg.dt
+    pg.statim = float(cfg['statim'])
+    pg.rnday = float(cfg['rnday'])
+    pg.nt = int(round(pg.rnday*86400.0/pg.dtdp))
+    pg.eta2 = np.zeros(nnodes)
+    pg.esbin1 = np.zeros(neta)
+    pg.esbin2 = np.zeros(neta)
+    pg.etiminc = 3600.0
+    pg.etime1 = pg.statim*86400.0
+    pg.etime2 = pg.etime1 + pg.etiminc
+
+    pg.nhsinc = int(cfg['nhsinc'])
+    pg.nhstar = 1 if pg.nhsinc > 0 else 0
+
+    pyadcirc_mod.itime_bgn = 1
+    pyadcirc_mod.itime_end = pg.nt
+    if cfg['ihot']:
+        hotstart = np.load(os.path.join(cfg['inputdir'], MOCK_HOTSTART_FILE))
+        pyadcirc_mod.itime_bgn = int(hotstart['itime']) + 1
+        pg.eta2[:] = hotstart['eta2']
+    _fort19['values'] = None
+    for key in stats:
+        stats[key] = 0
+
+def _write_hotstart(itime):
+    """Write the hot start file of time step itime."""
+    np.savez(os.path.join(MOCK_CONFIG['inputdir'], MOCK_HOTSTART_FILE),
+            itime=itime, eta2=pyglobal.eta2)
+
+def pyadcirc_run(ntsteps):
+    """Run ntsteps time steps from itime_bgn."""
+    t0 = time.perf_counter()
+    pmain = pyadcirc_mod
+    ntsteps = min(int(ntsteps), pyglobal.nt - pmain.itime_bgn + 1)
+    for itime in range(pmain.itime_bgn, pmain.itime_bgn + ntsteps):
+        _timestep(itime)
+        if pyglobal.nhsinc > 0 and itime % pyglobal.nhsinc == 0:
+            _write_hotstart(itime)
+    pmain.itime_end = pmain.itime_bgn + ntsteps - 1
+    pmain.itime_bgn += ntsteps
+    stats['run_time'] += time.perf_counter() - t0
+
+def pyadcirc_finalize():
+    """Finalize the synthetic model."""
+    return 0
+
+pyadcirc_mod.pyadcirc_init = pyadcirc_init
+pyadcirc_mod.pyadcirc_run = pyadcirc_run
+pyadcirc_mod.pyadcirc_finalize = pyadcirc_finalize
+
+################################################################################
+if __name__ == '__main__':
+    pass
@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+#------------------------------------------------------------------------------#
+# adcirc-nn - Software for physics-based machine learning with ADCIRC
+# LICENSE: BSD 3-Clause "New" or "Revised"
+#------------------------------------------------------------------------------#
+"""
+Memoizing cache of NN runs, for scenario runs repeating the same NN forcing.
+
+In sensitivity studies the NN boundary model is often rerun over the same
+forcing while only ADCIRC changes. A run of the NN from timer to niter is
+determined by the weights, the hidden and cell states (and random generator)
+at timer, the interval times, and the inputs read at its steps; the cache key
+is a hash of all of these. The result, i.e., the NN state after the run, is
+kept in an LRU of NN_CACHE_SIZE runs in memory, and optionally in a directory
+of <key>.npz files shared by several runs. A hit restores the state without
+any inference.
+"""
+from collections import OrderedDict
+import hashlib
+import os
+
+import numpy as np
+
+from .coupler_log import log
+
+################################################################################
+NN_CACHE_SIZE = 4096 # Number of NN runs kept in memory
+# Parts of the NN state that neither determine nor result from a run
+NN_CACHE_EXCLUDED = ('elevprev', 'elevprev_t', 'runflag', 'go', 'niter')
+
+################################################################################
+class NNRunCache():
+    """LRU cache of NN runs, in memory and optionally on disk."""
+
+    #--------------------------------------------------------------------------#
+    def __init__(self, maxsize=NN_CACHE_SIZE, directory=None):
+        """Construct an empty cache of maxsize runs, stored also in directory if given."""
+        self.maxsize = max(1, int(maxsize))
+        self.directory = directory
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.diskhits = 0
+        self.misses = 0
+
+    #--------------------------------------------------------------------------#
+    def key(self, nn):
+        """Return the hex key of the run of nn from its timer to its niter."""
+        times = nn.timer + nn.dt*np.arange(1, nn.nsteps()+1)
+        digest = hashlib.blake2b(digest_size=20)
+        digest.update(nn.weights_digest().encode())
+        digest.update(np.array([nn.dt, nn.timer, nn.niter], dtype=float).tobytes())
+        state = nn.get_state()
+        for name in sorted(state):
+            if name in NN_CACHE_EXCLUDED or name == 'elev':
+                continue
+            digest.update(name.encode())
+            digest.update(np.ascontiguousarray(state[name]).tobytes())
+        digest.update(np.ascontiguousarray(nn.input_window(times)).tobytes())
+        return digest.hexdigest()
+
+    #--------------------------------------------------------------------------#
+    def _filename(self, key):
+        """Return the file of a cached run in the directory."""
+        return os.path.join(self.directory, key + '.npz')
+
+    #--------------------------------------------------------------------------#
+    def get(self, key):
+        """Return the state dict after the run of key, or None if it is not cached."""
+        value = self.entries.get(key)
+        if value is not None:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return value
+        if self.directory is not None and os.path.exists(self._filename(key)):
+            with np.load(self._filename(key)) as data:
+                value = {name: data[name] for name in data.files}
+            self._remember(key, value)
+            self.diskhits += 1
+            return value
+        self.misses += 1
+        return None
+
+    #--------------------------------------------------------------------------#
+    def _remember(self, key, value):
+        """Put a run in the LRU, dropping the least recently used one if full."""
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    #--------------------------------------------------------------------------#
+    def put(self, key, state):
+        """Cache the state dict after the run of key."""
+        value = {name: np.array(state[name]) for name in state
+                if name not in NN_CACHE_EXCLUDED}
+        self._remember(key, value)
+        if self.directory is not None:
+            # Written under a temporary name, so that concurrent runs never read half a file.
+            tmpname = '{}.{}.tmp.npz'.format(self._filename(key)[:-len('.npz')], os.getpid())
+            np.savez(tmpname, **value)
+            os.replace(tmpname, self._filename(key))
+
+    #--------------------------------------------------------------------------#
+    def run(self, nn):
+        """Run nn from its timer to its niter, unless the run is cached."""
+        if nn.nsteps() == 0:
+            return nn.run_uncached()
+        key = self.key(nn)
+        value = self.get(key)
+        if value is None:
+            ierr_code = nn.run_uncached()
+            if ierr_code == 0:
+                self.put(key, nn.get_state())
+            return ierr_code
+        state = nn.get_state()
+        state.update(value)
+        nn.set_state(state)
+        return 0
+
+    #--------------------------------------------------------------------------#
+    def print_summary(self):
+        """Log the hit and miss counts."""
+        lookups = self.hits + self.diskhits + self.misses
+        log.info('NN run cache: %d hits, %d from disk, %d misses (%.1f%% hit rate), %d runs in memory',
+            self.hits, self.diskhits, self.misses,
+            100.0*(self.hits + self.diskhits)/max(1, lookups), len(self.entries))
+
+################################################################################
+if __name__ == '__main__':
+    pass
@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+#------------------------------------------------------------------------------#
+# adcirc-nn - Software for physics-based machine learning with ADCIRC
+# LICENSE: BSD 3-Clause "New" or "Revised"
+#------------------------------------------------------------------------------#
+"""
+Aggregation and recording of the members of an NN ensemble.
+
+Each coupling interval, the boundary values of all members are recorded, and
+one statistic of them is handed to ADCIRC:
+    mean, median : Mean or median over the members
+    p<q>         : q-th percentile over the members, e.g., p90
+    member<k>    : Member k, counting from 0
+The trajectory of all members is written by PE 0 to
+    <basename>_times.npy, <basename>_values.npy
+memory-mapped from the start, so that it takes no memory however long the run;
+the coupler puts them in the ADCIRC input directory, next to its checkpoints.
+"""
+import numpy as np
+
+################################################################################
+ENSEMBLE_FILE_BASENAME = 'adcirc_nn_ensemble'
+ENSEMBLE_STATISTIC_DEFAULT = 'mean'
+
+################################################################################
+def ensemble_statistic(statistic):
+    """Return the function of the member values, shape (E, ...), for statistic."""
+    if statistic == 'mean':
+        return lambda values : np.mean(values, axis=0)
+    if statistic == 'median':
+        return lambda values : np.median(values, axis=0)
+    try:
+        if statistic.startswith('p'):
+            q = float(statistic[1:])
+            if 0.0 <= q <= 100.0:
+                return lambda values : np.percentile(values, q, axis=0)
+        elif statistic.startswith('member'):
+            k = int(statistic[6:])
+            return lambda values : values[k]
+    except ValueError:
+        pass
+    raise ValueError('Unknown NN ensemble statistic {}; use mean, median, p<q>, or member<k>'.format(
+        statistic))
+
+################################################################################
+class NNEnsemble():
+    """Records the members of an NN ensemble and reduces them to one statistic."""
+
+    #--------------------------------------------------------------------------#
+    def __init__(self, ensemblesize, nelev, statistic=ENSEMBLE_STATISTIC_DEFAULT):
+        """Construct the aggregator of ensemblesize members of nelev values each."""
+        self.ensemblesize = ensemblesize
+        self.nelev = nelev
+        self.statistic = statistic
+        self.function = ensemble_statistic(statistic)
+        if statistic.startswith('member') and not 0 <= int(statistic[6:]) < ensemblesize:
+            raise ValueError('NN ensemble has no member {}'.format(statistic[6:]))
+        self.times = None
+        self.values = None
+        self.nrecords = 0
+
+    #--------------------------------------------------------------------------#
+    def open(self, nrecords, basename=ENSEMBLE_FILE_BASENAME, resume=0):
+        """Create the trajectory files <basename>_times.npy and _values.npy for nrecords intervals.
+
+        If resume is nonzero, the files are reopened and recording continues
+        after their first resume intervals.
+        """
+        if resume:
+            self.times = np.lib.format.open_memmap(basename+'_times.npy', mode='r+')
+            self.values = np.lib.format.open_memmap(basename+'_values.npy', mode='r+')
+            if self.values.shape != (nrecords, self.ensemblesize, self.nelev):
+                raise ValueError('NN ensemble trajectory {}_values.npy does not match the run'.format(
+                    basename))
+        else:
+            self.times = np.lib.format.open_memmap(basename+'_times.npy', mode='w+',
+                    shape=(nrecords,))
+            self.values = np.lib.format.open_memmap(basename+'_values.npy', mode='w+',
+                    shape=(nrecords, self.ensemblesize, self.nelev))
+        self.nrecords = int(resume)
+
+    #--------------------------------------------------------------------------#
+    def collect(self, timer, elev):
+        """Record the member values elev at NN time timer, and return their statistic."""
+        values = np.asarray(elev, dtype=float).reshape(self.ensemblesize, self.nelev)
+        if self.values is not None and self.nrecords < len(self.times):
+            self.times[self.nrecords] = timer
+            self.values[self.nrecords] = values
+            self.nrecords += 1
+        result = self.function(values)
+        return float(result[0]) if self.nelev == 1 else result
+
+    #--------------------------------------------------------------------------#
+    def close(self):
+        """Flush and close the trajectory files."""
+        if self.values is not None:
+            self.times.flush()
+            self.values.flush()
+            self.times = None
+            self.values = None
+
+################################################################################
+if __name__ == '__main__':
+    pass
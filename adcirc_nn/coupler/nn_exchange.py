@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+#------------------------------------------------------------------------------#
+# adcirc-nn - Software for physics-based machine learning with ADCIRC
+# LICENSE: BSD 3-Clause "New" or "Revised"
+#------------------------------------------------------------------------------#
+"""
+Exchange of the NN state between PE 0, which runs the NN, and all ADCIRC PEs.
+
+The NN time and run flag of a coupling interval follow from the coupling plan,
+which every PE holds, so that only the boundary values of the NN,
+    [elev_1, ..., elev_n],
+are broadcast from PE 0, in a single collective on ADCIRC's communicator; so
+is a sum over the mesh, e.g., of the depths at the coupled edge strings.
+
+The collectives take mpi4py, which parallel runs need: require_mpi4py() stops
+a run on more than one PE without it. On a single PE they do nothing.
+"""
+import time
+
+import numpy as np
+
+from .coupler_log import log
+
+_MPI = False # mpi4py.MPI, imported on first use as it initializes MPI
+
+################################################################################
+def mpi4py_mpi():
+    """Return the MPI module of mpi4py, imported on first use, or None without mpi4py."""
+    global _MPI
+    if _MPI is False:
+        try:
+            from mpi4py import MPI as _MPI
+        except ImportError:
+            _MPI = None
+    return _MPI
+
+################################################################################
+def require_mpi4py(anns):
+    """Raise an ImportError if ADCIRC runs on more than one PE without mpi4py."""
+    if anns.npes > 1 and mpi4py_mpi() is None:
+        raise ImportError('adcirc-nn needs mpi4py to run on {} PEs; install it, e.g., with '
+            'pip install adcirc_nn[mpi]'.format(anns.npes))
+
+################################################################################
+def messg_dbl_bcast(anns, buf):
+    """Broadcast buf in place from PE 0 to all PEs of ADCIRC."""
+    MPI = mpi4py_mpi()
+    if MPI is not None:
+        comm = MPI.Comm.f2py(anns.adcirc_comm_comp)
+        comm.Bcast(buf, root=0)
+    return buf
+
+################################################################################
+def messg_dbl_sum(anns, buf):
+    """Sum buf in place over all PEs of ADCIRC."""
+    MPI = mpi4py_mpi()
+    if MPI is not None:
+        comm = MPI.Comm.f2py(anns.adcirc_comm_comp)
+        comm.Allreduce(MPI.IN_PLACE, buf, op=MPI.SUM)
+    return buf
+
+################################################################################
+class NNStateExchange():
+    """Broadcasts the NN boundary values of each coupling interval from PE 0 in one buffer."""
+
+    #--------------------------------------------------------------------------#
+    def __init__(self, nelev=1):
+        """Construct the exchange for nelev elevation values per interval."""
+        self.nelev = nelev
+        self.buf = np.empty(nelev)
+        self.nexchanges = 0 # Number of exchanges, one collective each
+        self.nvalues = 0    # Number of values exchanged
+        self.time = 0.0     # Seconds spent in the collectives
+
+    #--------------------------------------------------------------------------#
+    def exchange(self, anns):
+        """Give all PEs the NN elevations held by PE 0, and the NN time nn.niter takes them to.
+
+        nn.runflag is set by every PE from the plan, and nn.go is left alone,
+        since it marks the PE that ran the NN.
+        """
+        buf = self.buf
+        if anns.myid == 0:
+            buf[:] = anns.nn.elev
+        else:
+            # The PEs that did not run the NN are where PE 0 started the run.
+            anns.nn.timer = anns.nn.timer_after(anns.nn.niter, anns.nn.timer)
+
+        t0 = time.perf_counter()
+        messg_dbl_bcast(anns, buf)
+        self.time += time.perf_counter() - t0
+        self.nexchanges += 1
+        self.nvalues += len(buf)
+
+        if self.nelev == 1:
+            anns.nn.elev = float(buf[0])
+        else:
+            anns.nn.elev = buf.copy()
+
+    #--------------------------------------------------------------------------#
+    def print_summary(self):
+        """Log the number and cost of the exchanges."""
+        log.info('NN state exchanges: %d, %d values, %.6f s',
+            self.nexchanges, self.nvalues, self.time)
+
+################################################################################
+if __name__ == '__main__':
+    pass
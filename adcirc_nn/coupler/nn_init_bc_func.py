@@ -0,0 +1,41 @@
+#!/usr/bin/env python
+#------------------------------------------------------------------------------#
+# adcirc-nn - Software for physics-based machine learning with ADCIRC
+# LICENSE: BSD 3-Clause "New" or "Revised"
+#------------------------------------------------------------------------------#
+from .boundary_history import BoundaryHistory
+from .coupler_log import log
+from .nn_set_bc_func import adcirc_edgestring_mean, allocate_edgestring_mean
+
+################################################################################
+def nn_init_bc_from_adcirc_depths(anns): # anns is an AdcircNN_class object
+
+    ######################################################
+    #SET UP NN input from the ADCIRC edgestring.
+    ######################################################
+    nodes = anns.adcircedgestringnodes
+    nstrings = len(anns.adcircedgestringids)
+    allocate_edgestring_mean(anns)
+
+    ##################################################
+    # NN input at the ADCIRC starting time.
+    anns.adcirc_hprev, anns.adcirc_hprev_len = adcirc_edgestring_mean(anns)
+    anns.adcirc_hprev_t = anns.adcirctprev
+
+    # The NN input is interpolated in the history of the ADCIRC values, and held
+    # at the last value beyond it.
+    # There is one column per edge string.
+    anns.adcirchistory = BoundaryHistory(anns.adcirchistorylength, nstrings)
+    anns.adcirchistory.append(anns.adcirc_hprev_t/anns.nn.timefact, anns.adcirc_hprev)
+    anns.nn.set_forcing(*anns.adcirchistory.window())
+
+    log.debug('NN input: ADCIRC %s at edge strings %s'
+            '\nNodes on this PE   = %d, %d resident'
+            '\nNodes on all PEs   = %d'
+            '\nMean %-14s= %s', anns.nninput, [i+1 for i in anns.adcircedgestringids],
+            len(nodes), len(anns.adcircedgestringowned), anns.adcirc_hprev_len, anns.nninput,
+            anns.adcirc_hprev)
+
+################################################################################
+if __name__ == '__main__':
+    pass
@@ -0,0 +1,160 @@
+#!/usr/bin/env python
+#------------------------------------------------------------------------------#
+# adcirc-nn - Software for physics-based machine learning with ADCIRC
+# LICENSE: BSD 3-Clause "New" or "Revised"
+#------------------------------------------------------------------------------#
+"""
+Pipelined NN execution for one-way coupling.
+
+When the NN drives ADCIRC one way (ndA), no NN interval depends on ADCIRC, so
+the NN can run on a worker while ADCIRC advances. The worker runs the NN to
+each of the niter values of the coupling intervals, known in advance, and puts
+(niter, timer, elev) in a bounded queue read by the boundary setter.
+
+The 'thread' worker suits NumPy inference, which releases the GIL in its matrix
+products; the 'process' worker forks the coupler and also overlaps the Python
+parts of the NN, but should not be used with MPI implementations that do not
+support fork(). The 'sidecar' worker is a forked process dedicated to the NN that
+publishes its results in a shared memory ring instead of pickling them through
+a pipe.
+"""
+import multiprocessing
+from multiprocessing import shared_memory
+import queue
+import threading
+import traceback
+
+import numpy as np
+
+################################################################################
+NN_PIPELINE_MODES = ('thread', 'process', 'sidecar')
+NN_PIPELINE_DEPTH = 2 # Number of NN intervals computed ahead of ADCIRC
+NN_RING_HEADER = 3    # status, niter, timer; followed by the elevations of all members
+
+################################################################################
+def _nn_pipeline_worker(nn, niters, results):
+    """Run nn to every niter in niters, putting the results in the queue."""
+    try:
+        for niter in niters:
+            nn.niter = niter
+            ierr_code = nn.run()
+            if ierr_code != 0:
+                raise RuntimeError('NN run returned error code {}'.format(ierr_code))
+            results.put((niter, nn.timer, nn.elev))
+    except Exception as err:
+        results.put(err)
+
+################################################################################
+def _nn_sidecar_worker(nn, niters, shmname, depth, free, filled):
+    """Run nn to every niter in niters, publishing the results in shared memory.
+
+    Each slot of the ring holds (status, niter, timer, elev...); status is
+    nonzero if the NN failed.
+    """
+    shm = shared_memory.SharedMemory(name=shmname)
+    ring = np.ndarray((depth, NN_RING_HEADER+nn.ensemblesize*nn.nelev()), dtype=float, buffer=shm.buf)
+    try:
+        for k, niter in enumerate(niters):
+            free.acquire()
+            nn.niter = niter
+            ierr_code = nn.run()
+            ring[k%depth, :NN_RING_HEADER] = (ierr_code, niter, nn.timer)
+            ring[k%depth, NN_RING_HEADER:] = np.ravel(nn.elev)
+            filled.release()
+            if ierr_code != 0:
+                break
+    except Exception:
+        traceback.print_exc()
+        ring[k%depth, 0] = -1
+        filled.release()
+    finally:
+        del ring
+        shm.close()
+
+################################################################################
+class NNPipeline():
+    """Runs the NN ahead of ADCIRC on a worker thread or process."""
+
+    #--------------------------------------------------------------------------#
+    def __init__(self, nn, niters, mode='thread', depth=NN_PIPELINE_DEPTH):
+        """Construct the pipeline for nn over the list of interval niters.
+
+        In 'thread' mode nn must not be used by the caller while the pipeline
+        runs; pass a clone of the coupler's NN.
+        """
+        if mode not in NN_PIPELINE_MODES:
+            raise ValueError('Unknown NN pipeline mode {}; use one of {}'.format(
+                mode, NN_PIPELINE_MODES))
+        self.mode = mode
+        self.niters = list(niters)
+        self.nresults = 0
+        self.depth = depth
+        self.nelev = nn.nelev()
+        self.ensemblesize = nn.ensemblesize
+        if mode == 'sidecar':
+            context = multiprocessing.get_context('fork')
+            width = NN_RING_HEADER + self.ensemblesize*self.nelev
+            self.shm = shared_memory.SharedMemory(create=True, size=depth*width*8)
+            self.ring = np.ndarray((depth, width), dtype=float, buffer=self.shm.buf)
+            self.free = context.Semaphore(depth)
+            self.filled = context.Semaphore(0)
+            self.worker = context.Process(target=_nn_sidecar_worker,
+                    args=(nn, self.niters, self.shm.name, depth, self.free, self.filled),
+                    daemon=True)
+        elif mode == 'thread':
+            self.results = queue.Queue(maxsize=depth)
+            self.worker = threading.Thread(target=_nn_pipeline_worker,
+                    args=(nn, self.niters, self.results), daemon=True)
+        else:
+            context = multiprocessing.get_context('fork')
+            self.results = context.Queue(maxsize=depth)
+            self.worker = context.Process(target=_nn_pipeline_worker,
+                    args=(nn, self.niters, self.results), daemon=True)
+
+    #--------------------------------------------------------------------------#
+    def start(self):
+        """Start the worker."""
+        self.worker.start()
+
+    #--------------------------------------------------------------------------#
+    def get(self):
+        """Return (niter, timer, elev) of the next interval, waiting if needed."""
+        if self.nresults >= len(self.niters):
+            raise RuntimeError('NN pipeline has no interval left')
+        if self.mode == 'sidecar':
+            self.filled.acquire()
+            slot = self.ring[self.nresults%self.depth]
+            status, niter, timer = slot[:NN_RING_HEADER]
+            if self.ensemblesize == 1 and self.nelev == 1:
+                elev = float(slot[NN_RING_HEADER])
+            elif self.ensemblesize == 1 or self.nelev == 1:
+                elev = slot[NN_RING_HEADER:].copy()
+            else:
+                elev = slot[NN_RING_HEADER:].reshape(self.ensemblesize, self.nelev).copy()
+            self.free.release()
+            if status != 0:
+                raise RuntimeError('NN sidecar failed with status {}'.format(status))
+            result = (niter, timer, elev)
+        else:
+            result = self.results.get()
+            if isinstance(result, Exception):
+                raise result
+        self.nresults += 1
+        return result
+
+    #--------------------------------------------------------------------------#
+    def stop(self):
+        """Wait for the worker to finish all intervals."""
+        if self.worker.is_alive() and self.nresults < len(self.niters):
+            # Drain the queue so that a blocked worker can finish.
+            while self.nresults < len(self.niters):
+                self.get()
+        self.worker.join()
+        if self.mode == 'sidecar':
+            del self.ring
+            self.shm.close()
+            self.shm.unlink()
+
+################################################################################
+if __name__ == '__main__':
+    pass
@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+#------------------------------------------------------------------------------#
+# adcirc-nn - Software for physics-based machine learning with ADCIRC
+# LICENSE: BSD 3-Clause "New" or "Revised"
+#------------------------------------------------------------------------------#
+import numpy as np
+
+from .coupler_log import log, lazy
+from .nn_exchange import messg_dbl_sum
+
+################################################################################
+def edgestring_ownership(anns): # anns is an AdcircNN_class object
+    """Return the mask of the edge string nodes resident on this PE.
+
+    Ghost nodes are also on the PEs that own them; only resident nodes count
+    in the mesh-wide sums. IBELONGTO of the ADCIRC messenger holds the 1-based
+    subdomain owning each node; without it, in serial runs, all are resident.
+    """
+    nodes = anns.adcircedgestringnodes
+    ibelongto = getattr(anns.pmsg, 'ibelongto', None)
+    if ibelongto is None or np.size(ibelongto) == 0:
+        if anns.pu.messg == anns.pu.on:
+            raise ValueError('ADCIRC gives no subdomains of the nodes (IBELONGTO); edge string '
+                'nodes shared by PEs would be counted more than once')
+        return np.ones(len(nodes), dtype=bool)
+    return np.take(ibelongto, nodes) - 1 == anns.myid
+
+################################################################################
+def allocate_edgestring_mean(anns): # anns is an AdcircNN_class object
+    """Allocate the buffers of adcirc_edgestring_mean once for the whole run."""
+    nstrings = len(anns.adcircedgestringids)
+    owned = edgestring_ownership(anns)
+    anns.adcircedgestringowned = anns.adcircedgestringnodes[owned] # Resident nodes only
+    anns.adcircedgestringownedboundary = anns.adcircedgestringboundary[owned]
+    # Summed over PEs, these count each node of the mesh once.
+    anns.adcircedgestringownedcounts = np.bincount(anns.adcircedgestringownedboundary,
+            minlength=nstrings)
+    anns.adcircedgestringvalues = np.empty(len(anns.adcircedgestringowned))
+    anns.adcircedgestringsum = np.zeros(2*nstrings) # Sums, then counts, per edge string
+    anns.adcirc_hprev = np.zeros(nstrings)
+    # Bathymetric depth does not change during the run; gather it once.
+    anns.adcircedgestringdp = np.take(anns.pm.dp, anns.adcircedgestringowned)
+
+################################################################################
+def adcirc_edgestring_mean(anns): # anns is an AdcircNN_class object
+    """Return the mean ADCIRC depth, or elevation, at each coupled edge string
+    over all PEs, and the total number of their unique nodes."""
+
+    # One gather of the elevations at the resident edge string nodes of this PE.
+    values = anns.adcircedgestringvalues
+    np.take(anns.pg.eta2, anns.adcircedgestringowned, out=values)
+    if anns.nninput == 'depth':
+        values += anns.adcircedgestringdp
+
+    # Mesh-wide sums and counts of all edge strings in one reduction.
+    buf = anns.adcircedgestringsum
+    nstrings = len(buf)//2
+    buf[:nstrings] = np.bincount(anns.adcircedgestringownedboundary, weights=values,
+            minlength=nstrings)
+    buf[nstrings:] = anns.adcircedgestringownedcounts
+    if anns.pu.messg == anns.pu.on:
+        messg_dbl_sum(anns, buf)
+    # Edge strings without nodes anywhere keep their previous value.
+    np.divide(buf[:nstrings], buf[nstrings:], out=anns.adcirc_hprev, where=buf[nstrings:] > 0)
+    return anns.adcirc_hprev, int(buf[nstrings:].sum())
+
+################################################################################
+def nn_set_bc_from_adcirc_depths(anns): # anns is an AdcircNN_class object
+
+    ########## Set NN input ###########
+    h, hlen = adcirc_edgestring_mean(anns)
+    t = anns.adcirctprev # Last time at which ADCIRC was paused & solution known
+
+    # Append to the history, unless ADCIRC did not advance.
+    history = anns.adcirchistory
+    if t/anns.nn.timefact > history.last_time():
+        history.append(t/anns.nn.timefact, h)
+    else:
+        history.replace_last(t/anns.nn.timefact, h)
+    # Views of the history; nothing is copied.
+    anns.nn.set_forcing(*history.window())
+
+    anns.adcirc_hprev_len = hlen
+    anns.adcirc_hprev_t = t
+
+    log.debug('NN input times    = %s\nNN input values   = %s',
+            lazy(lambda: history.window(2)[0]), lazy(lambda: history.window(2)[1].T))
+
+################################################################################
+if __name__ == '__main__':
+    pass
@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+#------------------------------------------------------------------------------#
+# adcirc-nn - Software for physics-based machine learning with ADCIRC
+# LICENSE: BSD 3-Clause "New" or "Revised"
+#------------------------------------------------------------------------------#
+"""
+Accuracy check of an NN run in reduced precision against a float64 shadow.
+
+Every NN_SHADOW_EVERY runs of the NN, a float64 copy of it, the shadow, takes
+the state of the NN and runs alongside it, on the same forcing but with its
+own state, for a window of NN_SHADOW_WINDOW runs. The largest difference of
+their boundary values over the window is the deviation of the check, which thus
+includes the drift the reduced precision accumulates over that many runs. The
+runs outside the windows cost nothing extra, so that the check costs a float64
+run in every NN_SHADOW_EVERY/NN_SHADOW_WINDOW. Deviations above NN_SHADOW_TOL
+are logged as warnings, and the largest one is reported at the end of the run.
+In the two-way couplings, ADCIRC is forced by the NN alone, so that the
+deviation leaves out the feedback of the drift on the ADCIRC solution.
+"""
+import numpy as np
+
+from .coupler_log import log
+from .lstmnn import NN_STEP_TOL
+
+################################################################################
+NN_SHADOW_EVERY = 100 # NN runs between the starts of the checks
+NN_SHADOW_WINDOW = 10 # NN runs the shadow runs alongside the NN in each check
+NN_SHADOW_TOL = 1.0e-3  # Boundary value deviation logged as a warning
+
+################################################################################
+class NNShadowCheck():
+    """Runs a float64 shadow of the NN over a window every few runs and tracks the deviation."""
+
+    #--------------------------------------------------------------------------#
+    def __init__(self, shadow, every=NN_SHADOW_EVERY, window=NN_SHADOW_WINDOW, tol=NN_SHADOW_TOL):
+        """Construct the check of the initialized float64 NN shadow, over window runs every every runs."""
+        self.shadow = shadow
+        self.every = max(1, int(every))
+        self.window = min(max(1, int(window)), self.every)
+        self.tol = tol
+        self.nruns = 0
+        self.nshadowruns = 0
+        self.nchecks = 0
+        self.nexceeded = 0
+        self.deviation = 0.0 # Largest deviation of the current check
+        self.maxdeviation = 0.0
+        self.maxdeviationtime = None
+
+    #--------------------------------------------------------------------------#
+    def run(self, nn):
+        """Run nn, and within the check windows its shadow from the state of nn at the window start."""
+        position = self.nruns % self.every
+        self.nruns += 1
+        if position >= self.window:
+            return nn.run()
+
+        # A restart within a window starts the window afresh.
+        if position == 0 or abs(self.shadow.timer - nn.timer) > NN_STEP_TOL*nn.dt:
+            self.shadow.set_state(nn.get_state())
+            self.deviation = 0.0
+        self.shadow.niter = nn.niter
+        self.shadow.copy_forcing(nn)
+        ierr_code = nn.run()
+        self.shadow.run_uncached()
+        self.nshadowruns += 1
+        deviation = float(np.max(np.abs(np.subtract(nn.elev, self.shadow.elev))))
+        log.debug('NN shadow check at NN time %s: deviation %s', nn.timer, deviation)
+        self.deviation = max(self.deviation, deviation)
+        if deviation >= self.maxdeviation:
+            self.maxdeviation = deviation
+            self.maxdeviationtime = nn.timer*nn.timefact
+        if position == self.window-1:
+            self.nchecks += 1
+            if self.deviation > self.tol:
+                self.nexceeded += 1
+                log.warning('NN %s boundary values deviate by %s from float64 over %d runs '
+                    'up to NN time %s', nn.precision, self.deviation, self.window, nn.timer)
+        return ierr_code
+
+    #--------------------------------------------------------------------------#
+    def print_summary(self):
+        """Log the checks and the largest deviation."""
+        log.info("NN shadow check: %d checks of %d runs each, %d of %d runs shadowed in float64, "
+                 "max boundary deviation %.3e at NN time %s s, %d checks above %.1e",
+            self.nchecks, self.window, self.nshadowruns, self.nruns, self.maxdeviation,
+            self.maxdeviationtime, self.nexceeded, self.tol)
+
+################################################################################
+if __name__ == '__main__':
+    pass
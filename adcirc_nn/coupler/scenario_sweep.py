@@ -0,0 +1,271 @@
+#!/usr/bin/env python
+#------------------------------------------------------------------------------#
+# adcirc-nn - Software for physics-based machine learning with ADCIRC
+# LICENSE: BSD 3-Clause "New" or "Revised"
+#------------------------------------------------------------------------------#
+"""
+Sweeps of independent coupled runs, e.g., of storms or NN settings.
+
+ADCIRC keeps its state in global Fortran modules, so that a process can host one
+AdcircNN run only. A sweep runs each scenario of a table in a fresh process of
+a bounded pool, in a private run directory
+    <sweepdir>/<name>/
+staged with the fort.* inputs of the scenario; the coupler writes its
+fort.19.new, checkpoints, and other output there, and ADCIRC and the coupler
+print to <name>/adcirc_nn.log.
+
+The scenario table is a CSV file with a header. The columns
+    name         : Unique name of the scenario, and of its run directory
+    couplingtype : One of Adn, ndA, AdndA, ndAdn
+    edgestrings  : ADCIRC edge string ID, or a list of them separated by ';'
+    inputdir     : Directory of the fort.* inputs, relative to the table
+are required; any other column is a keyword argument of AdcircNN, e.g.,
+nnweights or couplingtol, left at its default where the cell is empty. Like
+inputdir, the paths of SWEEP_PATH_OPTIONS are relative to the table; nnweights
+may also list one file per edge string separated by ';', empty for none.
+
+Each finished scenario leaves <name>/summary.json with its status, settings,
+timings, and outputs, and the sweep gathers them in <sweepdir>/sweep_index.json
+as they come in. Rerunning the sweep skips the scenarios whose summary records
+a completed run of the same settings, and restages and reruns the others, so
+that an interrupted sweep resumes where it left off.
+"""
+import csv
+import glob
+import inspect
+import json
+import multiprocessing
+import os
+import shutil
+import signal
+import sys
+import time
+import traceback
+
+import numpy as np
+
+################################################################################
+SWEEP_INDEX_FILE = 'sweep_index.json'
+SWEEP_SUMMARY_FILE = 'summary.json'
+SWEEP_LOG_FILE = 'adcirc_nn.log'
+SWEEP_REQUIRED = ('name', 'couplingtype', 'edgestrings', 'inputdir')
+# Options naming files or directories, resolved against the directory of the table
+SWEEP_PATH_OPTIONS = ('nnweights', 'nncachedir', 'harvest', 'logfile')
+# Files rewritten by ADCIRC, which are never shared between run directories
+SWEEP_PRIVATE_INPUTS = ('fort.67', 'fort.68')
+# Thread pools of the numerical libraries, one thread each in a full pool
+SWEEP_THREAD_VARIABLES = ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS')
+
+################################################################################
+def available_cores():
+    """Return the number of cores this process may run on."""
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+################################################################################
+def scenario_value(text):
+    """Return a cell of the scenario table as an int, float, bool, or str."""
+    for kind in (int, float):
+        try:
+            return kind(text)
+        except ValueError:
+            pass
+    if text.lower() in ('true', 'false'):
+        return text.lower() == 'true'
+    return text
+
+################################################################################
+def scenario_path(directory, text):
+    """Return a path of the scenario table, or a ';' separated list of them, against directory."""
+    paths = [os.path.join(directory, path.strip()) if path.strip() else None
+            for path in text.split(';')]
+    return paths[0] if len(paths) == 1 else paths
+
+################################################################################
+def read_scenarios(filename):
+    """Return the list of scenarios, dicts of settings, of a scenario table."""
+    from .adcirc_nn_class import AdcircNN, COUPLING_TYPES
+    options = set(inspect.signature(AdcircNN.__init__).parameters) - {'self'}
+    with open(filename, newline='') as f:
+        rows = list(csv.DictReader(f))
+    if not rows:
+        raise ValueError('Scenario table {} is empty'.format(filename))
+    unknown = set(rows[0]) - set(SWEEP_REQUIRED) - options
+    missing = set(SWEEP_REQUIRED) - set(rows[0])
+    if unknown or missing:
+        raise ValueError('Scenario table {}: unknown columns {}, missing columns {}'.format(
+            filename, sorted(unknown), sorted(missing)))
+
+    scenarios = []
+    for row in rows:
+        scenario = {key: row[key].strip() for key in SWEEP_REQUIRED}
+        if scenario['couplingtype'] not in COUPLING_TYPES:
+            raise ValueError('Scenario {}: unknown coupling type {}'.format(
+                scenario['name'], scenario['couplingtype']))
+        scenario['edgestrings'] = scenario['edgestrings'].replace(';', ',')
+        tabledir = os.path.dirname(os.path.abspath(filename))
+        scenario['inputdir'] = os.path.join(tabledir, scenario['inputdir'])
+        scenario['options'] = {key: scenario_path(tabledir, value) if key in SWEEP_PATH_OPTIONS
+                else scenario_value(value.strip()) for key, value in row.items()
+                if key not in SWEEP_REQUIRED and value is not None and value.strip() != ''}
+        scenarios.append(scenario)
+    names = [scenario['name'] for scenario in scenarios]
+    if len(set(names)) != len(names) or not all(names):
+        raise ValueError('Scenario names in {} must be unique and not empty'.format(filename))
+    return scenarios
+
+################################################################################
+def stage_run_directory(scenario, rundir, link=False):
+    """Create the run directory of a scenario afresh, with its fort.* inputs.
+
+    With link, the inputs are symbolic links, except those ADCIRC rewrites.
+    """
+    if os.path.exists(rundir):
+        shutil.rmtree(rundir)
+    os.makedirs(rundir)
+    inputs = [name for name in sorted(glob.glob(os.path.join(scenario['inputdir'], 'fort.*')))
+            if os.path.basename(name) != 'fort.19.new']
+    if not inputs:
+        raise FileNotFoundError('Scenario {}: no fort.* inputs in {}'.format(
+            scenario['name'], scenario['inputdir']))
+    for name in inputs:
+        target = os.path.join(rundir, os.path.basename(name))
+        if link and os.path.basename(name) not in SWEEP_PRIVATE_INPUTS:
+            os.symlink(os.path.abspath(name), target)
+        else:
+            shutil.copy2(name, target)
+
+################################################################################
+def write_json(filename, data):
+    """Write data to a JSON file, atomically."""
+    with open(filename + '.tmp', 'w') as f:
+        json.dump(data, f, indent=1)
+    os.replace(filename + '.tmp', filename)
+
+################################################################################
+def read_summary(rundir):
+    """Return the summary of a run directory, or None if there is none."""
+    try:
+        with open(os.path.join(rundir, SWEEP_SUMMARY_FILE)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+################################################################################
+def _ignore_interrupt():
+    """Leave interrupts to the sweep, which terminates the pool; in each pool process."""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+################################################################################
+def run_scenario(task):
+    """Run one scenario in its staged run directory; in a fresh pool process.
+
+    Returns the summary, which is also written to the run directory.
+    """
+    scenario, rundir = task
+    os.chdir(rundir)
+    # ADCIRC writes to the file descriptors directly; send them to the log.
+    logfile = open(SWEEP_LOG_FILE, 'w')
+    sys.stdout.flush()
+    sys.stderr.flush()
+    os.dup2(logfile.fileno(), 1)
+    os.dup2(logfile.fileno(), 2)
+
+    summary = {'name': scenario['name'], 'scenario': scenario, 'rundir': rundir,
+            'status': 'failed', 'pid': os.getpid()}
+    t0 = time.perf_counter()
+    try:
+        from . import adcirc_backend
+        from .adcirc_nn_class import AdcircNN
+        adcnn = AdcircNN(**scenario['options'])
+        adcnn.coupler_initialize(scenario['couplingtype'], scenario['edgestrings'])
+        t1 = time.perf_counter()
+        adcnn.coupler_run()
+        t2 = time.perf_counter()
+        adcnn.coupler_finalize()
+        t3 = time.perf_counter()
+        summary['status'] = 'done'
+        summary['timing'] = {
+            'import'   : adcirc_backend.backend_load_time,
+            'startup'  : t1 - t0 - adcirc_backend.backend_load_time,
+            'run'      : t2 - t1,
+            'finalize' : t3 - t2,
+            'total'    : t3 - t0,
+            }
+        if adcnn.timers.enabled:
+            summary['timing']['phases'] = adcnn.timers.summary()
+        eta2 = adcnn.pg.eta2
+        summary['outputs'] = {
+            'adcirc_time'        : float(adcnn.adcirctprev),
+            'nn_time'            : float(adcnn.nn.timer*adcnn.nn.timefact),
+            'nn_elev'            : np.atleast_1d(adcnn.nn.elev).tolist(),
+            'coupling_intervals' : adcnn.ncouplingintervals,
+            'eta2_min'           : float(eta2.min()),
+            'eta2_max'           : float(eta2.max()),
+            'checkpoints'        : adcnn.checkpoint.nwritten,
+            'bc_records'         : None if adcnn.bcwriter is None else adcnn.bcwriter.nrecords,
+            'harvest_records'    : None if adcnn.harvest is None else adcnn.harvest.nrecords,
+            }
+    except Exception as err:
+        summary['error'] = repr(err)
+        traceback.print_exc()
+        summary.setdefault('timing', {'total': time.perf_counter() - t0})
+    sys.stdout.flush()
+    sys.stderr.flush()
+    write_json(os.path.join(rundir, SWEEP_SUMMARY_FILE), summary)
+    return summary
+
+################################################################################
+def run_sweep(scenarios, sweepdir, jobs=None, link=False, retry=True, progress=print):
+    """Run the scenarios in a pool of jobs processes, by default one per available core.
+
+    Scenarios done with the same settings by an earlier sweep in sweepdir are
+    skipped; failed ones are rerun if retry is set. progress is called with a
+    line on each scenario. Returns the index, a dict of the summaries by name.
+    """
+    os.makedirs(sweepdir, exist_ok=True)
+    sweepdir = os.path.abspath(sweepdir)
+    indexname = os.path.join(sweepdir, SWEEP_INDEX_FILE)
+    index = {'scenarios': {}}
+
+    pending = []
+    for scenario in scenarios:
+        rundir = os.path.join(sweepdir, scenario['name'])
+        summary = read_summary(rundir)
+        if (summary is not None and summary['scenario'] == scenario
+                and (summary['status'] == 'done' or not retry)):
+            index['scenarios'][scenario['name']] = summary
+            progress('{:<24} {} earlier'.format(scenario['name'], summary['status']))
+            continue
+        stage_run_directory(scenario, rundir, link)
+        pending.append((scenario, rundir))
+    write_json(indexname, index)
+    if not pending:
+        return index
+
+    # A fresh process per scenario, started clean rather than forked from this one.
+    jobs = max(1, min(jobs or available_cores(), len(pending)))
+    context = multiprocessing.get_context('spawn')
+    # The pool processes inherit the thread limits when they start, before
+    # they import NumPy; the environment of the caller is restored after.
+    unset = [variable for variable in SWEEP_THREAD_VARIABLES if variable not in os.environ]
+    for variable in unset:
+        os.environ[variable] = '1'
+    try:
+        # Leaving the pool terminates the workers, also on an interrupt; the
+        # scenarios they were running have no summary, and rerun on resume.
+        with context.Pool(jobs, _ignore_interrupt, maxtasksperchild=1) as pool:
+            for summary in pool.imap_unordered(run_scenario, pending):
+                index['scenarios'][summary['name']] = summary
+                write_json(indexname, index)
+                progress('{:<24} {} in {:.3f} s'.format(summary['name'], summary['status'],
+                    summary['timing']['total']))
+    finally:
+        for variable in unset:
+            del os.environ[variable]
+    return index
+
+################################################################################
+if __name__ == '__main__':
+    pass
@@ -0,0 +1,176 @@
+#!/usr/bin/env python
+#------------------------------------------------------------------------------#
+# adcirc-nn - Software for physics-based machine learning with ADCIRC
+# LICENSE: BSD 3-Clause "New" or "Revised"
+#------------------------------------------------------------------------------#
+"""
+Monotone cubic interpolation of the NN output within a coupling interval.
+
+ADCIRC interpolates the boundary series linearly between ETIME1 and ETIME2,
+which flattens the peaks of a hydrograph unless the NN takes small steps. The
+last SERIES_HISTORY_LENGTH NN outputs are kept instead, and a piecewise cubic
+Hermite interpolant with the slopes of Fritsch and Carlson (as in PCHIP) is
+fitted through them. In the NN-first couplings, ADCIRC then runs each
+interval in SERIES_PIECES pieces, each with a linear series between two values
+of the interpolant; the interpolant does not overshoot the NN outputs. The
+series set by the NN is put back at the end of the interval.
+
+The slope at the last output is one-sided, since the NN has not run any
+further; with fewer than three outputs the interpolant is linear.
+
+The interpolant lowers the error of the series between the NN outputs, but not
+the error of the peak: a monotone interpolant does not exceed the NN outputs
+either side of the peak, so that the peak is clipped by as much as with linear
+interpolation, e.g., 6.532e-02 for both with NN steps of 3600 s in
+benchmarks/bench_series_interp.py. In that benchmark, PCHIP matches the max
+error of linear interpolation with NN steps of 60 s at NN steps of 80 s, and
+its RMS error at 170 s.
+"""
+import math
+
+import numpy as np
+
+from .boundary_history import BoundaryHistory
+
+################################################################################
+SERIES_INTERPOLATIONS = ('linear', 'pchip')
+SERIES_HISTORY_LENGTH = 3 # NN outputs the interpolant is fitted through
+SERIES_PIECES = 4         # Linear pieces of the series per coupling interval
+
+################################################################################
+def pchip_slopes(t, y):
+    """Return the slopes at the last two of three points (t, y), y of shape (3, n).
+
+    The slope at the middle point is the weighted harmonic mean of the secants
+    of PCHIP, and zero at a local extremum; the slope at the end point is the
+    one-sided three point estimate, limited so as to keep the cubic monotone.
+    """
+    h0, h1 = t[1] - t[0], t[2] - t[1]
+    d0 = (y[1] - y[0])/h0
+    d1 = (y[2] - y[1])/h1
+
+    w1, w2 = 2.0*h1 + h0, h1 + 2.0*h0
+    same = d0*d1 > 0.0
+    m1 = np.zeros_like(d1)
+    np.divide(w1 + w2, w1/np.where(same, d0, 1.0) + w2/np.where(same, d1, 1.0),
+            out=m1, where=same)
+
+    m2 = ((2.0*h1 + h0)*d1 - h1*d0)/(h0 + h1)
+    m2[np.sign(m2) != np.sign(d1)] = 0.0
+    limit = (np.sign(d0) != np.sign(d1)) & (np.abs(m2) > 3.0*np.abs(d1))
+    m2[limit] = 3.0*d1[limit]
+    return m1, m2
+
+################################################################################
+class SeriesInterpolator():
+    """Monotone cubic interpolant of the last NN outputs, fed to ADCIRC in pieces."""
+
+    #--------------------------------------------------------------------------#
+    def __init__(self, nelev=1, npieces=SERIES_PIECES):
+        """Construct the interpolant of nelev values per NN output."""
+        self.nelev = int(nelev)
+        self.npieces = max(1, int(npieces))
+        self.history = BoundaryHistory(SERIES_HISTORY_LENGTH, self.nelev)
+        # Hermite form of the last segment
+        self.t0 = 0.0
+        self.h = 0.0
+        self.y0 = np.zeros(self.nelev)
+        self.y1 = np.zeros(self.nelev)
+        self.m0 = np.zeros(self.nelev)
+        self.m1 = np.zeros(self.nelev)
+        self.active = False # The series of the current interval is interpolated
+        # The series set by the NN: ETIME1, ETIME2, ETIMINC, edge string ESBIN1, ESBIN2
+        self.series = [0.0, 0.0, 0.0, np.zeros(0), np.zeros(0)]
+        self.npiecesrun = 0
+
+    #--------------------------------------------------------------------------#
+    def append(self, t, elev):
+        """Add the NN output elev at time t in seconds, and refit the last segment."""
+        if t > self.history.last_time():
+            self.history.append(t, elev)
+        else:
+            self.history.replace_last(t, elev)
+        self.fit()
+
+    #--------------------------------------------------------------------------#
+    def fit(self):
+        """Fit the Hermite form of the segment between the last two outputs."""
+        times, values = self.history.window()
+        if len(times) < 2:
+            return False
+        self.t0 = times[-2]
+        self.h = times[-1] - times[-2]
+        self.y0[:] = values[-2]
+        self.y1[:] = values[-1]
+        if len(times) < 3:
+            self.m0[:] = (self.y1 - self.y0)/self.h
+            self.m1[:] = self.m0
+        else:
+            self.m0[:], self.m1[:] = pchip_slopes(times, values)
+        return True
+
+    #--------------------------------------------------------------------------#
+    def __call__(self, t):
+        """Return the values of the interpolant at time t, held beyond the last segment."""
+        s = min(max((t - self.t0)/self.h, 0.0), 1.0)
+        return ((1.0 + 2.0*s)*(1.0 - s)**2*self.y0 + s*(1.0 - s)**2*self.h*self.m0
+                + s*s*(3.0 - 2.0*s)*self.y1 + s*s*(s - 1.0)*self.h*self.m1)
+
+    #--------------------------------------------------------------------------#
+    def piece(self, ntsteps):
+        """Return the number of ADCIRC time steps per piece of an interval of ntsteps."""
+        return max(1, math.ceil(ntsteps/self.npieces))
+
+    #--------------------------------------------------------------------------#
+    def record(self, anns):
+        """Take the NN output just set as the series, and interpolate the coming interval."""
+        self.active = anns.nn.runflag != anns.pu.off
+        if not self.active:
+            return
+        self.append(anns.nn.timer*anns.nn.timefact, anns.nn.elev)
+        self.active = len(self.history) >= 2
+        pg, esbin = anns.pg, anns.adcircedgestringesbin
+        self.series = [pg.etime1, pg.etime2, pg.etiminc,
+                pg.esbin1[esbin].copy(), pg.esbin2[esbin].copy()]
+
+    #--------------------------------------------------------------------------#
+    def set_piece(self, anns, t1, t2):
+        """Hand ADCIRC the linear series between the interpolant at times t1 and t2."""
+        pg, esbin = anns.pg, anns.adcircedgestringesbin
+        pg.etime1 = t1
+        pg.etime2 = t2
+        pg.etiminc = t2 - t1
+        pg.esbin1[esbin] = self(t1)
+        pg.esbin2[esbin] = self(t2)
+        anns.adcircbcsink.update(anns)
+        self.npiecesrun += 1
+
+    #--------------------------------------------------------------------------#
+    def restore(self, anns):
+        """Put back the series set by the NN, as the next interval shifts it."""
+        pg, esbin = anns.pg, anns.adcircedgestringesbin
+        pg.etime1, pg.etime2, pg.etiminc = self.series[:3]
+        pg.esbin1[esbin] = self.series[3]
+        pg.esbin2[esbin] = self.series[4]
+
+    #--------------------------------------------------------------------------#
+    def get_state(self):
+        """Return a dict of the arrays of the interpolant, for checkpoints."""
+        state = {'history_'+key: value for key, value in self.history.get_state().items()}
+        state.update({'active': self.active, 'series_times': np.array(self.series[:3]),
+            'series_esbin1': self.series[3], 'series_esbin2': self.series[4]})
+        return state
+
+    #--------------------------------------------------------------------------#
+    def set_state(self, state):
+        """Restore the interpolant from a dict returned by get_state()."""
+        self.history.set_state({key[8:]: state[key] for key in state
+            if key.startswith('history_')})
+        self.fit()
+        self.active = bool(state['active'])
+        self.series = [float(x) for x in state['series_times']] + [
+                np.array(state['series_esbin1']), np.array(state['series_esbin2'])]
+
+################################################################################
+if __name__ == '__main__':
+    pass
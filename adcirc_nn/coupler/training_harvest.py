@@ -0,0 +1,231 @@
+#!/usr/bin/env python
+#------------------------------------------------------------------------------#
+# adcirc-nn - Software for physics-based machine learning with ADCIRC
+# LICENSE: BSD 3-Clause "New" or "Revised"
+#------------------------------------------------------------------------------#
+"""
+Harvest of training data for the NN from coupled runs.
+
+At the end of every coupling interval PE 0 records
+    interval          : Index of the interval in the coupling plan
+    nntime            : NN time in seconds
+    adcirctime        : ADCIRC time in seconds
+    nnrun             : 1 if the NN ran in the interval
+    nnsteps           : Number n of NN steps run in the interval
+    nn_input_offset   : First row of the NN inputs of the interval in nn_input
+    nn_output (O,)    : NN boundary values handed to ADCIRC
+    response  (S,)    : ADCIRC depth, or elevation, as nninput, averaged over
+                        each coupled edge string at the end of the interval
+The NN inputs are ragged: the n normalized inputs of the steps of an interval,
+as the LSTM read them, are rows nn_input_offset to nn_input_offset+n of one
+(R, I) array nn_input per shard, R being the steps of all its records; step k
+of an interval is at nntime - (n-1-k)*nndt, with nndt in the metadata of the
+index. split_inputs() returns the inputs of each record of a shard.
+The response is the edge string mean the coupler computes as the NN input.
+The records are collected in shards of HARVEST_SHARD_SIZE records, one array
+per field, which a background thread writes as compressed .npz files
+    <directory>/<basename>.<shard>.npz
+so that time stepping never waits on compression or the file system. After
+each shard the thread rewrites the index <directory>/<basename>.json with the
+fields, their dtypes and shapes, and the file, record count, and interval and
+time ranges of every shard; iter_harvest() streams the shards of one or more
+harvests one at a time from it.
+
+Shards are full except the last, and those written at coupler checkpoints, so
+that a resumed run continues with the shards of the checkpoint.
+"""
+import json
+import os
+import queue
+import threading
+
+import numpy as np
+
+################################################################################
+HARVEST_FILE_BASENAME = 'adcirc_nn_harvest'
+HARVEST_VERSION = 3
+HARVEST_SHARD_SIZE = 1024 # Records per shard
+HARVEST_QUEUE_DEPTH = 4   # Shards waiting for the writer thread
+
+################################################################################
+def harvest_fields(noutput, nstrings):
+    """Return the dtype and shape of each field of the records."""
+    return {
+        'interval'        : ('<i8', ()),
+        'nntime'          : ('<f8', ()),
+        'adcirctime'      : ('<f8', ()),
+        'nnrun'           : ('u1', ()),
+        'nnsteps'         : ('<i8', ()),
+        'nn_input_offset' : ('<i8', ()),
+        'nn_output'       : ('<f8', (noutput,)),
+        'response'        : ('<f8', (nstrings,)),
+        }
+
+################################################################################
+def split_inputs(shard):
+    """Return the list of the NN inputs of each record of a shard, views of its nn_input."""
+    return [shard['nn_input'][offset:offset+n]
+            for offset, n in zip(shard['nn_input_offset'], shard['nnsteps'])]
+
+################################################################################
+def read_harvest_index(directory, basename=HARVEST_FILE_BASENAME):
+    """Return the index of a harvest."""
+    with open(os.path.join(directory, basename + '.json')) as f:
+        return json.load(f)
+
+################################################################################
+def iter_harvest(directories, basename=HARVEST_FILE_BASENAME, fields=None):
+    """Yield the shards of the harvests in directories, one dict of arrays at a time.
+
+    Only the given fields are read, all of them by default; a shard is read
+    only when the previous one has been consumed.
+    """
+    if isinstance(directories, str):
+        directories = [directories]
+    for directory in directories:
+        index = read_harvest_index(directory, basename)
+        for shard in index['shards']:
+            with np.load(os.path.join(directory, shard['file'])) as data:
+                yield {name: data[name] for name in (fields or index['fields'])}
+
+################################################################################
+def _harvest_writer(shards, harvest):
+    """Write the shards put in the queue, and the index after each, until None."""
+    while True:
+        item = shards.get()
+        if item is None:
+            shards.task_done()
+            return
+        try:
+            if harvest.error is None:
+                harvest.write_shard(*item)
+        except Exception as err:
+            harvest.error = err
+        shards.task_done()
+
+################################################################################
+class TrainingHarvest():
+    """Records the NN inputs and outputs and the ADCIRC response of every coupling interval."""
+
+    #--------------------------------------------------------------------------#
+    def __init__(self, directory, ninput, noutput, nstrings, metadata=None,
+            shardsize=HARVEST_SHARD_SIZE, basename=HARVEST_FILE_BASENAME, resume=None):
+        """Construct the harvest of records of the given sizes into directory.
+
+        metadata is a dict of run settings kept in the index. If resume is not
+        None, the first resume shards of the index are kept, and later ones
+        are dropped.
+        """
+        self.directory = directory
+        self.basename = basename
+        self.shardsize = max(1, int(shardsize))
+        self.ninput = int(ninput)
+        self.fields = harvest_fields(noutput, nstrings)
+        os.makedirs(directory, exist_ok=True)
+        fields = {name: {'dtype': dtype, 'shape': list(shape)}
+                for name, (dtype, shape) in self.fields.items()}
+        fields['nn_input'] = {'dtype': '<f8', 'shape': [self.ninput], 'ragged': True}
+        self.index = {'version': HARVEST_VERSION, 'shardsize': self.shardsize,
+                'metadata': metadata or {}, 'fields': fields, 'shards': []}
+        if resume is not None and os.path.exists(os.path.join(directory, basename + '.json')):
+            shards = read_harvest_index(directory, basename)['shards']
+            self.index['shards'] = shards[:int(resume)]
+            for shard in shards[int(resume):]:
+                path = os.path.join(directory, shard['file'])
+                if os.path.exists(path):
+                    os.remove(path)
+        self.nshards = len(self.index['shards'])
+        self.nrecords = sum(shard['nrecords'] for shard in self.index['shards'])
+        self.buffer = self._new_buffer()
+        self.n = 0 # Records in the buffer
+        self.m = 0 # NN input rows in the buffer
+        self.error = None
+        self.shards = queue.Queue(maxsize=HARVEST_QUEUE_DEPTH)
+        self.writer = threading.Thread(target=_harvest_writer, args=(self.shards, self), daemon=True)
+        self.writer.start()
+
+    #--------------------------------------------------------------------------#
+    def _new_buffer(self):
+        """Return empty arrays for one shard, with room for one NN step per record."""
+        buffer = {name: np.zeros((self.shardsize,) + shape, dtype=dtype)
+                for name, (dtype, shape) in self.fields.items()}
+        buffer['nn_input'] = np.zeros((self.shardsize, self.ninput))
+        return buffer
+
+    #--------------------------------------------------------------------------#
+    def record(self, anns, interval, nnrun, response, inputs):
+        """Add the record of coupling interval index interval.
+
+        inputs are the NN inputs of the steps run in the interval, shape (n, I).
+        """
+        buf, k, m, n = self.buffer, self.n, self.m, len(inputs)
+        if m + n > len(buf['nn_input']):
+            # Doubled, so that the rows of a shard are copied O(1) times each.
+            grown = np.zeros((max(2*len(buf['nn_input']), m + n), self.ninput))
+            grown[:m] = buf['nn_input'][:m]
+            buf['nn_input'] = grown
+        buf['interval'][k] = interval
+        buf['nntime'][k] = anns.nn.timer*anns.nn.timefact
+        buf['adcirctime'][k] = anns.adcirctprev
+        buf['nnrun'][k] = nnrun
+        buf['nnsteps'][k] = n
+        buf['nn_input_offset'][k] = m
+        buf['nn_input'][m:m+n] = inputs
+        buf['nn_output'][k] = anns.nn.elev
+        buf['response'][k] = response
+        self.n += 1
+        self.m += n
+        self.nrecords += 1
+        if self.n == self.shardsize:
+            self.flush()
+
+    #--------------------------------------------------------------------------#
+    def flush(self, wait=False):
+        """Hand the records so far to the writer as a shard; wait until it is written if asked."""
+        if self.error is not None:
+            raise RuntimeError('Training harvest writer failed') from self.error
+        if self.n > 0:
+            # The buffer goes to the writer as is; recording continues in a new one.
+            self.shards.put((self.nshards, self.buffer, self.n, self.m))
+            self.nshards += 1
+            self.buffer = self._new_buffer()
+            self.n = 0
+            self.m = 0
+        if wait:
+            self.shards.join()
+            if self.error is not None:
+                raise RuntimeError('Training harvest writer failed') from self.error
+
+    #--------------------------------------------------------------------------#
+    def write_shard(self, number, buffer, n, m):
+        """Write shard number of the first n records, and m NN input rows, of buffer,
+        then the index; on the writer."""
+        name = '{}.{:05d}.npz'.format(self.basename, number)
+        path = os.path.join(self.directory, name)
+        arrays = {field: values[:n] for field, values in buffer.items()}
+        arrays['nn_input'] = buffer['nn_input'][:m]
+        # Written under a temporary name, so that readers never see half a shard.
+        tmpname = path[:-len('.npz')] + '.tmp.npz'
+        np.savez_compressed(tmpname, **arrays)
+        os.replace(tmpname, path)
+        self.index['shards'].append({'file': name, 'nrecords': int(n), 'ninputrows': int(m),
+            'intervals': [int(arrays['interval'][0]), int(arrays['interval'][-1])],
+            'nntime': [float(arrays['nntime'][0]), float(arrays['nntime'][-1])],
+            'adcirctime': [float(arrays['adcirctime'][0]), float(arrays['adcirctime'][-1])]})
+        indexname = os.path.join(self.directory, self.basename + '.json')
+        with open(indexname + '.tmp', 'w') as f:
+            json.dump(self.index, f, indent=1)
+        os.replace(indexname + '.tmp', indexname)
+
+    #--------------------------------------------------------------------------#
+    def close(self):
+        """Write the last shard, and stop the writer."""
+        self.flush()
+        self.shards.put(None)
+        self.writer.join()
+        if self.error is not None:
+            raise RuntimeError('Training harvest writer failed') from self.error
+
+################################################################################
+if __name__ == '__main__':
+    pass
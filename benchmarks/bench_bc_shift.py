@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+#------------------------------------------------------------------------------#
+# adcirc-nn - Software for physics-based machine learning with ADCIRC
+# LICENSE: BSD 3-Clause "New" or "Revised"
+#------------------------------------------------------------------------------#
+"""
+Micro-benchmark of the per-interval ESBIN shift and edge string assignment.
+
+Compares the former element-by-element loops with the slice operations used by
+adcirc_set_bc_from_nn_hydrograph, for a range of NETA values. Plain NumPy arrays
+stand in for the ESBIN1/ESBIN2 arrays of pyADCIRC.
+
+Usage: python benchmarks/bench_bc_shift.py [neta ...]
+"""
+import sys
+import timeit
+
+import numpy as np
+
+NETA_DEFAULT = [100, 1000, 10000, 100000]
+NNODES_FRACTION = 0.1 # Fraction of NETA on the coupled edge string
+
+################################################################################
+def shift_loop(esbin1, esbin2, nvdll, edgestringid, nnodes, value):
+    """Per-interval work as done before caching the edge string slice."""
+    start = sum(nvdll[:edgestringid])
+    for i in range(len(esbin1)):
+        esbin1[i] = esbin2[i]
+    esbin2[start : start+nnodes] = value
+
+def shift_slice(esbin1, esbin2, edgestringslice, value):
+    """Per-interval work with the cached edge string slice."""
+    esbin1[:] = esbin2
+    esbin2[edgestringslice] = value
+
+################################################################################
+def main():
+    """Time both variants for each NETA and print the cost per interval."""
+    netas = [int(arg) for arg in sys.argv[1:]] or NETA_DEFAULT
+    print('{:>10} {:>14} {:>14} {:>10}'.format('neta', 'loop [us]', 'slice [us]', 'speedup'))
+    for neta in netas:
+        esbin1 = np.zeros(neta)
+        esbin2 = np.random.rand(neta)
+        nnodes = max(1, int(neta*NNODES_FRACTION))
+        nvdll = np.array([neta-nnodes, nnodes])
+        edgestringid = 1
+        start = int(np.sum(nvdll[:edgestringid]))
+        edgestringslice = slice(start, start+nnodes)
+
+        number = max(1, 100000//neta)
+        tloop = min(timeit.repeat(lambda: shift_loop(esbin1, esbin2, nvdll,
+            edgestringid, nnodes, 1.0), number=number, repeat=3))/number
+        tslice = min(timeit.repeat(lambda: shift_slice(esbin1, esbin2,
+            edgestringslice, 1.0), number=number*100, repeat=3))/(number*100)
+        print('{:>10d} {:>14.2f} {:>14.2f} {:>10.1f}'.format(
+            neta, tloop*1.0e6, tslice*1.0e6, tloop/tslice))
+
+################################################################################
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+#------------------------------------------------------------------------------#
+# adcirc-nn - Software for physics-based machine learning with ADCIRC
+# LICENSE: BSD 3-Clause "New" or "Revised"
+#------------------------------------------------------------------------------#
+"""
+Benchmark of the coupling overhead on the mock ADCIRC backend.
+
+Runs the ndA coupling with each boundary sink on the synthetic mesh of
+mock_libadcpy and reports the total run time, the time spent in ADCIRC time
+stepping, and the unit 19 activity. The difference between the first two is the
+coupling overhead, NN included.
+
+Usage: python benchmarks/bench_coupler_mock.py [np [neta [work]]]
+"""
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+os.environ['ADCIRC_NN_BACKEND'] = 'mock'
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from adcirc_nn.coupler import mock_libadcpy
+from adcirc_nn.coupler.adcirc_bc_sink import BC_SINKS
+from adcirc_nn.coupler.adcirc_nn_class import AdcircNN
+
+################################################################################
+def main():
+    """Run the coupler once per boundary sink and print the timings."""
+    args = [int(arg) for arg in sys.argv[1:]]
+    keys = ('np', 'neta', 'work')
+    config = dict(zip(keys, args))
+
+    print('{:>8} {:>10} {:>12} {:>12} {:>10} {:>10}'.format(
+        'sink', 'steps', 'run [s]', 'ADCIRC [s]', 'opens', 'reads'))
+    with tempfile.TemporaryDirectory() as tmpdir:
+        mock_libadcpy.configure(inputdir=tmpdir, **config)
+        for sink in BC_SINKS:
+            adcnn = AdcircNN(bcsink=sink)
+            with contextlib.redirect_stdout(io.StringIO()):
+                adcnn.coupler_initialize('ndA', '1')
+                t0 = time.perf_counter()
+                adcnn.coupler_run()
+                t1 = time.perf_counter()
+                adcnn.coupler_finalize()
+            stats = mock_libadcpy.stats
+            print('{:>8} {:>10d} {:>12.3f} {:>12.3f} {:>10d} {:>10d}'.format(
+                sink, stats['steps'], t1-t0, stats['run_time'],
+                stats['fort19_opens'], stats['fort19_reads']))
+
+################################################################################
+if __name__ == '__main__':
+    main()
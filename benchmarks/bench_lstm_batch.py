@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+#------------------------------------------------------------------------------#
+# adcirc-nn - Software for physics-based machine learning with ADCIRC
+# LICENSE: BSD 3-Clause "New" or "Revised"
+#------------------------------------------------------------------------------#
+"""
+Benchmark of the LSTM NNs of several coupled boundaries: one NN per boundary
+run one after the other, against all of them in one batched NN.
+
+Writes random weights of the same shape for each boundary, then runs the NNs
+over NSTEPS steps in coupling intervals of one step, the way the coupler does.
+
+Usage: python benchmarks/bench_lstm_batch.py [hidden_size [max_boundaries]]
+"""
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+# Import the NN module on its own, so that pyADCIRC is not needed.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+    '..', 'adcirc_nn', 'coupler'))
+from lstmnn import (BatchedLongShortTermMemoryNN_class, LongShortTermMemoryNN_class,
+        random_lstm_weights)
+
+HIDDEN_SIZE_DEFAULT = 64
+MAX_BOUNDARIES_DEFAULT = 64
+NSTEPS = 2000
+
+################################################################################
+def run_intervals(nns):
+    """Run every NN of nns over NSTEPS one-step intervals; return the run time."""
+    t0 = time.perf_counter()
+    for k in range(1, NSTEPS+1):
+        for nn in nns:
+            nn.niter = k*nn.dt
+            nn.run()
+    return time.perf_counter() - t0
+
+################################################################################
+def main():
+    """Time the separate and the batched NNs for growing numbers of boundaries."""
+    args = [int(arg) for arg in sys.argv[1:]]
+    hiddensize, maxboundaries = (args + [HIDDEN_SIZE_DEFAULT,
+        MAX_BOUNDARIES_DEFAULT][len(args):])[:2]
+
+    print('{:>10} {:>14} {:>14} {:>10}'.format(
+        'boundaries', 'separate [s]', 'batched [s]', 'speedup'))
+    with tempfile.TemporaryDirectory() as tmpdir:
+        files = []
+        for k in range(maxboundaries):
+            weights = random_lstm_weights(1, hiddensize, seed=k)
+            weights['dt'] = np.float64(60.0)
+            weights['niter'] = np.float64(NSTEPS*60.0)
+            files.append(os.path.join(tmpdir, 'lstm{}.npz'.format(k)))
+            np.savez(files[-1], **weights)
+
+        nboundaries = 1
+        while nboundaries <= maxboundaries:
+            separate = [LongShortTermMemoryNN_class(f) for f in files[:nboundaries]]
+            for nn in separate:
+                nn.initialize()
+            batch = BatchedLongShortTermMemoryNN_class(files[:nboundaries], [1]*nboundaries)
+            batch.initialize()
+            tseparate = run_intervals(separate)
+            tbatch = run_intervals([batch])
+            print('{:>10d} {:>14.3f} {:>14.3f} {:>10.1f}'.format(
+                nboundaries, tseparate, tbatch, tseparate/tbatch))
+            nboundaries *= 2
+
+################################################################################
+if __name__ == '__main__':
+    main()
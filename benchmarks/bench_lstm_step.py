@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+#------------------------------------------------------------------------------#
+# adcirc-nn - Software for physics-based machine learning with ADCIRC
+# LICENSE: BSD 3-Clause "New" or "Revised"
+#------------------------------------------------------------------------------#
+"""
+Benchmark of the LSTM NN: steps per second and peak resident memory.
+
+Writes random weights of the requested size to a temporary .npz file, then runs
+the NN over the full horizon in coupling intervals of a given number of steps,
+the way the coupler does.
+
+Usage: python benchmarks/bench_lstm_step.py [hidden_size [input_size [steps_per_interval [precision]]]]
+
+precision is float64 (default) or float32.
+"""
+import os
+import resource
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+# Import the NN module on its own, so that pyADCIRC is not needed.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+    '..', 'adcirc_nn', 'coupler'))
+from lstmnn import LongShortTermMemoryNN_class, random_lstm_weights
+
+HIDDEN_SIZE_DEFAULT = 64
+INPUT_SIZE_DEFAULT = 4
+STEPS_PER_INTERVAL_DEFAULT = 1
+NITER = 21600*60.0 # 21600 NN steps of 60 s
+
+################################################################################
+def main():
+    """Run the NN over NITER and report the throughput and peak RSS."""
+    precision = sys.argv[4] if len(sys.argv) > 4 else 'float64'
+    args = [int(arg) for arg in sys.argv[1:4]]
+    hiddensize, inputsize, interval = (args + [HIDDEN_SIZE_DEFAULT, INPUT_SIZE_DEFAULT,
+        STEPS_PER_INTERVAL_DEFAULT][len(args):])[:3]
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        weightsfile = os.path.join(tmpdir, 'lstm.npz')
+        weights = random_lstm_weights(inputsize, hiddensize)
+        weights['forcing_t'] = np.linspace(0.0, NITER, 1001)
+        weights['forcing_x'] = np.random.default_rng(1).random((1001, inputsize))
+        weights['dt'] = np.float64(60.0)
+        weights['niter'] = np.float64(NITER)
+        np.savez(weightsfile, **weights)
+
+        nn = LongShortTermMemoryNN_class(weightsfile, precision=precision)
+        nn.initialize()
+        rss0 = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        nsteps = nn.nsteps()
+        nn.niter = 0
+        t0 = time.perf_counter()
+        while nn.timer < nn.tfinal:
+            nn.niter = min(nn.tfinal, nn.timer + interval*nn.dt)
+            nn.run()
+        t1 = time.perf_counter()
+        rss1 = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    print('hidden size         = {}'.format(hiddensize))
+    print('input size          = {}'.format(inputsize))
+    print('steps per interval  = {}'.format(interval))
+    print('precision           = {}'.format(precision))
+    print('steps               = {}'.format(nsteps))
+    print('run time      [s]   = {:.3f}'.format(t1-t0))
+    print('steps per second    = {:.0f}'.format(nsteps/(t1-t0)))
+    print('peak RSS      [MiB] = {:.1f} (after initialize: {:.1f})'.format(
+        rss1/1024.0, rss0/1024.0))
+
+################################################################################
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+#------------------------------------------------------------------------------#
+# adcirc-nn - Software for physics-based machine learning with ADCIRC
+# LICENSE: BSD 3-Clause "New" or "Revised"
+#------------------------------------------------------------------------------#
+"""
+Benchmark of the boundary series error of linear and monotone cubic interpolation.
+
+An NN stand-in returns a flood hydrograph with a sharp peak at its time steps.
+ADCIRC time steps within each coupling interval see, as in the ndA coupling,
+either the linear series between the last two NN outputs, or the pieces of the
+SeriesInterpolator of the coupler. For a range of NN time steps, the number of
+NN evaluations and the maximum and RMS error of the series at the ADCIRC time
+steps are reported, along with the error of the peak value. Both schemes pass
+through the NN outputs, and the monotone interpolant does not exceed them, so
+that the peak error, set by how close an NN time step falls to the peak, is the
+same for both. Last, the NN time step is increased from the first one, in
+MATCH_DT_STEP increments, until the max and RMS errors of PCHIP exceed those of
+linear interpolation at the first NN time step.
+
+Usage: python benchmarks/bench_series_interp.py [nn dt ...]
+"""
+import os
+import sys
+
+import numpy as np
+
+os.environ['ADCIRC_NN_BACKEND'] = 'mock'
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from adcirc_nn.coupler.series_interpolation import SeriesInterpolator, SERIES_PIECES
+
+NN_DT_DEFAULT = [60.0, 300.0, 900.0, 1800.0, 3600.0]
+ADCIRC_DT = 2.0      # ADCIRC time step in seconds
+RUN_LENGTH = 86400.0 # Seconds
+PEAK_TIME = 43650.0  # Seconds; between the NN time steps
+PEAK_WIDTH = 5400.0  # Seconds
+MATCH_DT_STEP = 10.0 # Seconds
+
+################################################################################
+def hydrograph(t):
+    """Return the boundary value at times t: a tide and a flood peak."""
+    return (0.5*np.sin(2.0*np.pi*t/44712.0)
+            + 3.0*np.exp(-0.5*((t - PEAK_TIME)/PEAK_WIDTH)**2))
+
+################################################################################
+def series(nndt, interp):
+    """Return the series seen at the ADCIRC time steps, and the NN evaluations."""
+    # NN time steps up to, or past, the end of the run
+    nnt = nndt*np.arange(np.ceil(RUN_LENGTH/nndt - 1.0e-9) + 1)
+    nny = hydrograph(nnt)
+    adcirct = np.arange(ADCIRC_DT, RUN_LENGTH + 0.5*ADCIRC_DT, ADCIRC_DT)
+    values = np.empty_like(adcirct)
+
+    interpolator = SeriesInterpolator(1, SERIES_PIECES)
+    interpolator.append(nnt[0], nny[0])
+    for k in range(1, len(nnt)):
+        interpolator.append(nnt[k], nny[k])
+        steps = np.nonzero((adcirct > nnt[k-1]) & (adcirct <= nnt[k]))[0]
+        if len(steps) == 0:
+            continue
+        t = adcirct[steps]
+        if interp == 'linear':
+            values[steps] = nny[k-1] + (t - nnt[k-1])*(nny[k] - nny[k-1])/nndt
+            continue
+        # Linear pieces between values of the interpolant, as ADCIRC runs them.
+        piece = interpolator.piece(len(steps))
+        for first in range(0, len(steps), piece):
+            tp = t[first:first+piece]
+            t1, t2 = tp[0] - ADCIRC_DT, tp[-1]
+            v1, v2 = interpolator(t1)[0], interpolator(t2)[0]
+            values[steps[first:first+piece]] = v1 + (tp - t1)*(v2 - v1)/(t2 - t1)
+    return adcirct, values, len(nnt)
+
+################################################################################
+def errors(nndt, interp):
+    """Return the max and RMS error of the series of a scheme at an NN time step."""
+    t, values, _ = series(nndt, interp)
+    error = values - hydrograph(t)
+    return np.abs(error).max(), np.sqrt(np.mean(error**2))
+
+################################################################################
+def matching_dt(nndt):
+    """Return the largest NN time steps, by max and RMS error, at which PCHIP is
+    as accurate as linear interpolation at nndt, before it first falls behind."""
+    target = errors(nndt, 'linear')
+    matched = [None, None]
+    dt = nndt
+    while None in matched:
+        error = errors(dt, 'pchip')
+        for k in range(2):
+            if matched[k] is None and error[k] > target[k]:
+                matched[k] = dt - MATCH_DT_STEP
+        dt += MATCH_DT_STEP
+    return target, matched
+
+################################################################################
+def main():
+    """Print the NN evaluations and series errors of both schemes per NN time step."""
+    nndts = [float(arg) for arg in sys.argv[1:]] or NN_DT_DEFAULT
+    print('{:>8} {:>8} {:>8} {:>12} {:>12} {:>12}'.format(
+        'NN dt', 'interp', 'NN evals', 'max error', 'RMS error', 'peak error'))
+    for nndt in nndts:
+        for interp in ('linear', 'pchip'):
+            t, values, nevals = series(nndt, interp)
+            error = values - hydrograph(t)
+            print('{:>8.0f} {:>8} {:>8d} {:>12.3e} {:>12.3e} {:>12.3e}'.format(nndt, interp,
+                nevals, np.abs(error).max(), np.sqrt(np.mean(error**2)), abs(values.max() - hydrograph(t).max())))
+
+    target, matched = matching_dt(nndts[0])
+    print('PCHIP matches linear interpolation at NN dt {:.0f}: max error {:.3e} up to NN dt '
+          '{:.0f}, RMS error {:.3e} up to NN dt {:.0f}'.format(nndts[0], target[0], matched[0],
+          target[1], matched[1]))
+
+################################################################################
+if __name__ == '__main__':
+    main()
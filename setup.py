@@ -9,7 +9,8 @@ with open(os.path.join('LICENSE')) as f:
     license = f.read()
 
 
-adcirc_nn_cmds = ['adcirc_nn = adcirc_nn.__main__:main']
+adcirc_nn_cmds = ['adcirc_nn = adcirc_nn.__main__:main',
+                  'adcirc_nn_sweep = adcirc_nn.adcirc_nn_sweep:main']
 
 setup(
     name='adcirc_nn',
@@ -22,5 +23,6 @@ setup(
     url='https://github.com/gajanan-choudhary/adcirc_nn',
     license=license,
     packages=find_packages(exclude=('tests', 'doc')),
+    extras_require={'mpi': ['mpi4py']},
     entry_points={'console_scripts': adcirc_nn_cmds},
 )
@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+#------------------------------------------------------------------------------#
+# adcirc-nn - Software for physics-based machine learning with ADCIRC
+# LICENSE: BSD 3-Clause "New" or "Revised"
+#------------------------------------------------------------------------------#
+"""
+Fixtures running adcirc-nn on the mock ADCIRC backend.
+
+The mock mesh is small and the run short, so that a coupled run takes a fraction
+of a second; each test runs in its own input directory.
+"""
+import contextlib
+import io
+import os
+
+import numpy as np
+import pytest
+
+os.environ['ADCIRC_NN_BACKEND'] = 'mock'
+
+from adcirc_nn.coupler import mock_libadcpy
+from adcirc_nn.coupler.adcirc_nn_class import AdcircNN
+from adcirc_nn.coupler.lstmnn import random_lstm_weights
+
+################################################################################
+MOCK_TEST_CONFIG = {'np': 200, 'dt': 45.0, 'rnday': 0.25}
+
+################################################################################
+@pytest.fixture
+def inputdir(tmp_path):
+    """Return the input directory of a test, with the mock ADCIRC set up for it."""
+    mock_libadcpy.configure(**dict(mock_libadcpy.MOCK_CONFIG_DEFAULT, inputdir=str(tmp_path),
+        **MOCK_TEST_CONFIG))
+    yield tmp_path
+    mock_libadcpy.configure(**mock_libadcpy.MOCK_CONFIG_DEFAULT)
+
+################################################################################
+@pytest.fixture
+def weights(tmp_path):
+    """Return a file of random LSTM weights of one input, with dt and niter."""
+    filename = str(tmp_path / 'weights.npz')
+    np.savez(filename, dt=60.0, niter=21600.0, **random_lstm_weights(1, 16))
+    return filename
+
+################################################################################
+class StopCoupling(Exception):
+    """Stops a coupled run as if it had been killed."""
+
+################################################################################
+def run_coupler(couplingtype, edgestrings='1', stop=None, **settings):
+    """Run adcirc-nn on the mock backend, stopping before ADCIRC time step stop if given.
+
+    Returns the ADCIRC elevations and boundary series, and the NN time and
+    values, at the end of the run, along with the AdcircNN object.
+    """
+    adcnn = AdcircNN(**settings)
+    run = mock_libadcpy.pyadcirc_mod.pyadcirc_run
+    if stop is not None:
+        def run_until_stop(ntsteps):
+            if mock_libadcpy.pyadcirc_mod.itime_bgn - 1 >= stop:
+                raise StopCoupling()
+            run(ntsteps)
+        mock_libadcpy.pyadcirc_mod.pyadcirc_run = run_until_stop
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            adcnn.coupler_initialize(couplingtype, edgestrings)
+            adcnn.coupler_run()
+            adcnn.coupler_finalize()
+    except StopCoupling:
+        pass
+    finally:
+        mock_libadcpy.pyadcirc_mod.pyadcirc_run = run
+    pg = mock_libadcpy.pyglobal
+    return (pg.eta2.copy(), pg.esbin2.copy(), adcnn.nn.timer, np.copy(adcnn.nn.elev)), adcnn
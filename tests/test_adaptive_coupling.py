@@ -0,0 +1,54 @@
+#!/usr/bin/env python
+#------------------------------------------------------------------------------#
+# adcirc-nn - Software for physics-based machine learning with ADCIRC
+# LICENSE: BSD 3-Clause "New" or "Revised"
+#------------------------------------------------------------------------------#
+"""Adaptive coupling merges intervals while the series changes by less than couplingtol."""
+import pytest
+
+from conftest import run_coupler
+from adcirc_nn.coupler.adaptive_coupling import AdaptiveCoupling
+
+DT = 60.0 # Duration of one plan interval [s]
+
+################################################################################
+def test_span_grows_to_the_most_on_a_flat_series():
+    adaptive = AdaptiveCoupling(1.0e-3, maxspan=16, growth=2)
+    assert [adaptive.choose(i, 0.0, DT) for i in range(6)] == [2, 4, 8, 16, 16, 16]
+
+################################################################################
+@pytest.mark.parametrize('maxslope', [1.0e-8, 1.0e-7, 3.0e-7, 1.0e-6])
+def test_span_keeps_the_change_within_the_tolerance(maxslope):
+    tolerance = 1.0e-4
+    adaptive = AdaptiveCoupling(tolerance, maxspan=64, growth=64)
+    span = adaptive.choose(0, maxslope, DT)
+    assert span*maxslope*DT <= tolerance < (span+1)*maxslope*DT or span == 64
+
+################################################################################
+def test_span_splits_at_once_when_the_series_rises():
+    adaptive = AdaptiveCoupling(1.0e-3, maxspan=16)
+    for i in range(8):
+        adaptive.choose(i, 0.0, DT)
+    assert adaptive.span == 16
+    assert adaptive.choose(8, 1.0, DT) == 1
+    assert adaptive.log[-1] == (8, 1, 1.0)
+
+################################################################################
+def test_tolerance_must_be_positive():
+    with pytest.raises(ValueError, match='tolerance'):
+        AdaptiveCoupling(0.0)
+
+################################################################################
+@pytest.mark.parametrize('couplingtype', ['ndA', 'AdndA'])
+def test_coupled_run_merges_by_tolerance(inputdir, weights, couplingtype):
+    _, plain = run_coupler(couplingtype, nnweights=weights)
+    nplan = len(plain.schedule.plan())
+    assert plain.ncouplingintervals == nplan
+    _, loose = run_coupler(couplingtype, nnweights=weights, couplingtol=1.0e3, couplingmaxspan=4)
+    assert loose.ncouplingintervals < nplan/2
+    assert max(span for _, span, _ in loose.adaptivecoupling.log) == 4
+    # The NN settles to a steady state, so intervals merge only once it has.
+    _, tight = run_coupler(couplingtype, nnweights=weights, couplingtol=1.0e-12)
+    assert tight.adaptivecoupling.log[0][1] == 1
+    for _, span, maxslope in tight.adaptivecoupling.log:
+        assert span == 1 or span*maxslope*DT <= 1.0e-12
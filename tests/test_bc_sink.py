@@ -0,0 +1,25 @@
+#!/usr/bin/env python
+#------------------------------------------------------------------------------#
+# adcirc-nn - Software for physics-based machine learning with ADCIRC
+# LICENSE: BSD 3-Clause "New" or "Revised"
+#------------------------------------------------------------------------------#
+"""The memory and fort.19 file boundary sinks give ADCIRC the same series."""
+import numpy as np
+import pytest
+
+from conftest import run_coupler
+from adcirc_nn.coupler import mock_libadcpy
+from adcirc_nn.coupler.adcirc_nn_class import COUPLING_TYPES
+
+# fort.19 holds the series in FORT19_FORMAT, to 6 decimals.
+FORT19_TOL = 1.0e-6
+
+################################################################################
+@pytest.mark.parametrize('couplingtype', COUPLING_TYPES)
+def test_memory_and_file_sinks_agree(inputdir, weights, couplingtype):
+    memory, _ = run_coupler(couplingtype, nnweights=weights, bcsink='memory')
+    # fort.19 is replaced once, at initialize, if at all.
+    assert mock_libadcpy.stats['fort19_opens'] <= 1
+    file, _ = run_coupler(couplingtype, nnweights=weights, bcsink='file')
+    for x, y in zip(memory, file):
+        np.testing.assert_allclose(x, y, rtol=0.0, atol=FORT19_TOL)
@@ -0,0 +1,45 @@
+#!/usr/bin/env python
+#------------------------------------------------------------------------------#
+# adcirc-nn - Software for physics-based machine learning with ADCIRC
+# LICENSE: BSD 3-Clause "New" or "Revised"
+#------------------------------------------------------------------------------#
+"""The boundary history keeps the last samples in order, as views, after wraparound."""
+import numpy as np
+import pytest
+
+from adcirc_nn.coupler.boundary_history import BoundaryHistory
+
+################################################################################
+@pytest.mark.parametrize('nappends', (3, 5, 12, 13))
+def test_window_after_wraparound(nappends):
+    history = BoundaryHistory(5, width=2)
+    for k in range(nappends):
+        history.append(10.0*k, [k, -k])
+    n = min(nappends, 5)
+    times, values = history.window()
+    expected = np.arange(nappends - n, nappends)
+    np.testing.assert_array_equal(times, 10.0*expected)
+    np.testing.assert_array_equal(values, np.column_stack((expected, -expected)))
+    assert len(history) == n and history.nappends == nappends
+    assert history.last_time() == 10.0*(nappends - 1)
+    # The window is a view of the buffer, not a copy.
+    assert np.shares_memory(values, history.values)
+
+    times, values = history.window(2)
+    np.testing.assert_array_equal(times, 10.0*expected[-2:])
+
+################################################################################
+def test_replace_last_and_restore():
+    history = BoundaryHistory(3)
+    history.replace_last(0.0, 1.0)
+    for k in range(1, 5):
+        history.append(float(k), float(k))
+    history.replace_last(4.0, 40.0)
+    np.testing.assert_array_equal(history.window()[1][:,0], [2.0, 3.0, 40.0])
+
+    restored = BoundaryHistory(3)
+    restored.set_state(history.get_state())
+    restored.append(5.0, 5.0)
+    np.testing.assert_array_equal(restored.window()[1][:,0], [3.0, 40.0, 5.0])
+    with pytest.raises(ValueError):
+        BoundaryHistory(4).set_state(history.get_state())
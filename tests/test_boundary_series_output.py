@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+#------------------------------------------------------------------------------#
+# adcirc-nn - Software for physics-based machine learning with ADCIRC
+# LICENSE: BSD 3-Clause "New" or "Revised"
+#------------------------------------------------------------------------------#
+"""The boundary series file reads back with the header, nodes and records written."""
+import os
+import types
+
+import numpy as np
+import pytest
+
+from conftest import run_coupler
+from adcirc_nn.coupler.boundary_series_output import (BOUNDARY_SERIES_FILE_BASENAME,
+    BOUNDARY_SERIES_HEADER, BOUNDARY_SERIES_MAGIC, BOUNDARY_SERIES_VERSION,
+    BoundarySeriesWriter, boundary_series_record, read_boundary_series)
+
+NODES = np.array([7, 3, 11]) # 1-based nodes, in ESBIN order
+
+################################################################################
+def fake_coupler(index):
+    """Return the fields of an AdcircNN object that a record is written from."""
+    values = np.arange(3) + 10.0*index
+    return types.SimpleNamespace(adcirctprev=60.0*index,
+        nn=types.SimpleNamespace(timer=float(index), timefact=60.0),
+        pg=types.SimpleNamespace(etime1=60.0*(index-1), etime2=60.0*index, esbin2=values),
+        adcircedgestringesbin=slice(0, 3), adcircseriesslope=values/60.0,
+        adcircseriesarea=values*30.0)
+
+################################################################################
+def assert_records(records, indices):
+    """Assert that the records are those of fake_coupler at the coupling intervals indices."""
+    np.testing.assert_array_equal(records['interval'], indices)
+    for record, index in zip(records, indices):
+        anns = fake_coupler(index)
+        assert record['adcirctime'] == anns.adcirctprev
+        assert record['nntime'] == 60.0*index
+        assert (record['etime1'], record['etime2']) == (anns.pg.etime1, anns.pg.etime2)
+        np.testing.assert_array_equal(record['value'], anns.pg.esbin2)
+        np.testing.assert_array_equal(record['slope'], anns.adcircseriesslope)
+        np.testing.assert_array_equal(record['area'], anns.adcircseriesarea)
+
+################################################################################
+def test_header_and_records_read_back(tmp_path):
+    filename = str(tmp_path / 'series.bin')
+    writer = BoundarySeriesWriter(filename, NODES, 10, flushevery=4)
+    for index in range(6):
+        writer.write(fake_coupler(index), index)
+    # Only the flushed records are counted in the header.
+    nodes, records = read_boundary_series(filename)
+    assert len(records) == 4
+    writer.close()
+    header = np.fromfile(filename, dtype=BOUNDARY_SERIES_HEADER, count=1)[0]
+    assert header['magic'] == BOUNDARY_SERIES_MAGIC
+    assert header['version'] == BOUNDARY_SERIES_VERSION
+    assert (header['nnodes'], header['capacity'], header['nrecords']) == (3, 10, 6)
+    assert header['recordsize'] == boundary_series_record(3).itemsize
+    assert os.path.getsize(filename) == (BOUNDARY_SERIES_HEADER.itemsize + 8*3
+        + 10*boundary_series_record(3).itemsize)
+    nodes, records = read_boundary_series(filename)
+    np.testing.assert_array_equal(nodes, NODES)
+    assert_records(records, range(6))
+
+################################################################################
+def test_resume_writes_after_the_records_kept(tmp_path):
+    filename = str(tmp_path / 'series.bin')
+    writer = BoundarySeriesWriter(filename, NODES, 10)
+    for index in range(5):
+        writer.write(fake_coupler(index), index)
+    writer.close()
+    # The run is resumed from a checkpoint taken after 3 records.
+    writer = BoundarySeriesWriter(filename, NODES, 10, resume=3)
+    for index in range(3, 8):
+        writer.write(fake_coupler(index), index)
+    writer.close()
+    nodes, records = read_boundary_series(filename)
+    np.testing.assert_array_equal(nodes, NODES)
+    assert_records(records, range(8))
+    with pytest.raises(ValueError, match='does not match'):
+        BoundarySeriesWriter(filename, NODES[:2], 10, resume=3)
+
+################################################################################
+def test_full_and_foreign_files_are_rejected(tmp_path):
+    filename = str(tmp_path / 'series.bin')
+    writer = BoundarySeriesWriter(filename, NODES, 2)
+    writer.write(fake_coupler(0), 0)
+    writer.write(fake_coupler(1), 1)
+    with pytest.raises(IndexError, match='full'):
+        writer.write(fake_coupler(2), 2)
+    writer.close()
+    foreign = tmp_path / 'foreign.bin'
+    foreign.write_bytes(bytes(BOUNDARY_SERIES_HEADER.itemsize))
+    with pytest.raises(ValueError, match='not an adcirc-nn boundary series'):
+        read_boundary_series(str(foreign))
+
+################################################################################
+@pytest.mark.parametrize('couplingtype', ['ndA', 'AdndA'])
+def test_coupled_run_writes_every_interval(inputdir, weights, couplingtype):
+    (_, esbin2, _, _), adcnn = run_coupler(couplingtype, nnweights=weights, bcoutput=True)
+    nodes, records = read_boundary_series(str(inputdir /
+        '{}.0000.bin'.format(BOUNDARY_SERIES_FILE_BASENAME)))
+    np.testing.assert_array_equal(nodes, adcnn.adcircedgestringnodes + 1)
+    assert len(records) == len(adcnn.schedule.plan())
+    assert np.all(np.diff(records['interval']) == 1)
+    assert np.all(np.diff(records['etime2']) > 0.0)
+    np.testing.assert_array_equal(records[-1]['value'], esbin2[adcnn.adcircedgestringesbin])
@@ -0,0 +1,44 @@
+#!/usr/bin/env python
+#------------------------------------------------------------------------------#
+# adcirc-nn - Software for physics-based machine learning with ADCIRC
+# LICENSE: BSD 3-Clause "New" or "Revised"
+#------------------------------------------------------------------------------#
+"""An NN sets one boundary value, or one per edge string node, in ESBIN2."""
+import numpy as np
+import pytest
+
+from conftest import run_coupler
+from adcirc_nn.coupler import mock_libadcpy
+from adcirc_nn.coupler.lstmnn import random_lstm_weights
+
+STOP = 200 # ADCIRC time step at which the runs are stopped, while the NN is on
+
+################################################################################
+def vector_weights(inputdir, output_size):
+    """Return a file of random LSTM weights of output_size values."""
+    filename = str(inputdir / 'weights-{}.npz'.format(output_size))
+    np.savez(filename, dt=60.0, niter=21600.0, **random_lstm_weights(1, 16, output_size))
+    return filename
+
+################################################################################
+@pytest.mark.parametrize('couplingtype', ['ndA', 'AdndA'])
+def test_vector_nn_sets_each_node(inputdir, couplingtype):
+    neta = mock_libadcpy.MOCK_CONFIG['neta']
+    (_, esbin2, _, elev), adcnn = run_coupler(couplingtype, stop=STOP,
+        nnweights=vector_weights(inputdir, neta))
+    assert elev.shape == (neta,)
+    assert len(np.unique(elev)) == neta
+    np.testing.assert_array_equal(esbin2[adcnn.adcircedgestringesbin], elev)
+
+################################################################################
+@pytest.mark.parametrize('couplingtype', ['ndA', 'AdndA'])
+def test_scalar_nn_sets_all_nodes(inputdir, weights, couplingtype):
+    (_, esbin2, _, elev), adcnn = run_coupler(couplingtype, stop=STOP, nnweights=weights)
+    values = esbin2[adcnn.adcircedgestringesbin]
+    assert values.size == mock_libadcpy.MOCK_CONFIG['neta']
+    np.testing.assert_array_equal(values, np.full(values.size, elev))
+
+################################################################################
+def test_wrong_output_size_is_rejected(inputdir):
+    with pytest.raises(ValueError, match='boundary values'):
+        run_coupler('ndA', nnweights=vector_weights(inputdir, 3))
@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+#------------------------------------------------------------------------------#
+# adcirc-nn - Software for physics-based machine learning with ADCIRC
+# LICENSE: BSD 3-Clause "New" or "Revised"
+#------------------------------------------------------------------------------#
+"""A run stopped and resumed from a checkpoint ends as the run without a stop."""
+import glob
+import os
+
+import numpy as np
+import pytest
+
+from conftest import run_coupler
+from adcirc_nn.coupler import mock_libadcpy
+from adcirc_nn.coupler.adcirc_nn_class import COUPLING_TYPES
+from adcirc_nn.coupler.coupler_checkpoint import CHECKPOINT_FILE_BASENAME
+
+HOTSTART_INTERVAL = 37 # ADCIRC time steps; not a multiple of the coupling interval
+STOP = 100             # ADCIRC time step the stopped run is killed at
+
+################################################################################
+def run_resumed(couplingtype, **settings):
+    """Return the end state of a run stopped at STOP, and of its resumed run."""
+    # Start afresh, without the checkpoints and hot start of an earlier run.
+    inputdir = mock_libadcpy.MOCK_CONFIG['inputdir']
+    for name in (glob.glob(os.path.join(inputdir, CHECKPOINT_FILE_BASENAME + '.*'))
+            + glob.glob(os.path.join(inputdir, mock_libadcpy.MOCK_HOTSTART_FILE))):
+        os.remove(name)
+    mock_libadcpy.configure(nhsinc=HOTSTART_INTERVAL, ihot=0)
+    stopped, adcnn = run_coupler(couplingtype, stop=STOP, **settings)
+    assert adcnn.checkpoint.nwritten > 0
+    mock_libadcpy.configure(ihot=1)
+    resumed, _ = run_coupler(couplingtype, resume=True, **settings)
+    return stopped, resumed
+
+################################################################################
+@pytest.mark.parametrize('bcsink', ('memory', 'file'))
+@pytest.mark.parametrize('couplingtype', COUPLING_TYPES)
+def test_resume_equals_full_run(inputdir, weights, couplingtype, bcsink):
+    mock_libadcpy.configure(nhsinc=HOTSTART_INTERVAL)
+    full, _ = run_coupler(couplingtype, nnweights=weights, bcsink=bcsink)
+    stopped, resumed = run_resumed(couplingtype, nnweights=weights, bcsink=bcsink)
+    assert stopped[2] < full[2]
+    for x, y in zip(full, resumed):
+        np.testing.assert_array_equal(x, y)
+
+################################################################################
+@pytest.mark.parametrize('couplingtype', ('ndA', 'AdndA'))
+def test_resume_ensemble_equals_full_run(inputdir, weights, couplingtype):
+    settings = dict(nnweights=weights, nnensemble=3, nndropout=0.1, nnforcingnoise=0.1)
+    mock_libadcpy.configure(nhsinc=HOTSTART_INTERVAL)
+    full, _ = run_coupler(couplingtype, **settings)
+    _, resumed = run_resumed(couplingtype, **settings)
+    for x, y in zip(full, resumed):
+        np.testing.assert_array_equal(x, y)
@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+#------------------------------------------------------------------------------#
+# adcirc-nn - Software for physics-based machine learning with ADCIRC
+# LICENSE: BSD 3-Clause "New" or "Revised"
+#------------------------------------------------------------------------------#
+"""PEs write the coupler log to stdout and their files as configured, and buffered."""
+import pytest
+
+from adcirc_nn.coupler.coupler_log import log, lazy, configure_logging, flush_log
+
+################################################################################
+@pytest.fixture
+def relog():
+    """Set the log up again after a test, once its stdout is no longer captured."""
+    yield
+    configure_logging(myid=0)
+
+################################################################################
+def log_messages():
+    """Log one message at each level, and write them out."""
+    log.debug('debug message')
+    log.info('info message')
+    log.warning('warning message')
+    flush_log()
+
+################################################################################
+@pytest.mark.parametrize('myid, ranks, expected', [
+    (0, '0', ['info message', 'warning message']),
+    (3, '0', []),
+    (0, 'all', ['PE[0] info message', 'PE[0] warning message']),
+    (3, 'all', ['PE[3] info message', 'PE[3] warning message'])])
+def test_ranks_write_to_stdout(relog, capsys, myid, ranks, expected):
+    configure_logging(myid=myid, level='info', ranks=ranks)
+    log_messages()
+    assert capsys.readouterr().out.splitlines() == expected
+
+################################################################################
+@pytest.mark.parametrize('myid', [0, 3])
+def test_every_pe_writes_its_file(relog, capsys, tmp_path, myid):
+    filebase = str(tmp_path / 'coupler')
+    configure_logging(myid=myid, level='debug', ranks='0', filebase=filebase)
+    log_messages()
+    with open('{}.{:04d}.log'.format(filebase, myid)) as f:
+        assert f.read().splitlines() == ['debug message', 'info message', 'warning message']
+    assert len(capsys.readouterr().out.splitlines()) == (3 if myid == 0 else 0)
+
+################################################################################
+def test_messages_below_the_level_are_not_formatted(relog, capsys):
+    configure_logging(myid=0, level='warning', ranks='0')
+    calls = []
+    log.info('value %s', lazy(calls.append, 1))
+    log.warning('value %s', lazy(lambda: 2))
+    flush_log()
+    assert calls == []
+    assert capsys.readouterr().out == 'value 2\n'
+
+################################################################################
+def test_records_are_buffered_until_a_warning(relog, capsys):
+    configure_logging(myid=0, level='info', ranks='0', buffer=4)
+    values = [1]
+    log.info('value %s', lazy(lambda: values[0]))
+    values[0] = 2 # Records are formatted as they come in.
+    log.info('value %s', lazy(lambda: values[0]))
+    assert capsys.readouterr().out == ''
+    log.warning('warning message')
+    assert capsys.readouterr().out.splitlines() == ['value 1', 'value 2', 'warning message']
+
+################################################################################
+@pytest.mark.parametrize('settings', [{'level': 'verbose'}, {'ranks': '1'}])
+def test_unknown_settings_are_rejected(relog, settings):
+    with pytest.raises(ValueError):
+        configure_logging(myid=0, **settings)
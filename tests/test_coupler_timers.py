@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+#------------------------------------------------------------------------------#
+# adcirc-nn - Software for physics-based machine learning with ADCIRC
+# LICENSE: BSD 3-Clause "New" or "Revised"
+#------------------------------------------------------------------------------#
+"""Phase timers keep exact aggregates in bounded memory, and write to the run directory."""
+import json
+
+import numpy as np
+import pytest
+
+from conftest import run_coupler
+from adcirc_nn.coupler.coupler_timers import (TIMING_FILE_BASENAME, TIMING_STATS,
+    CouplerTimers, PhaseTimes)
+
+################################################################################
+@pytest.mark.parametrize('n', [1, 100, 5000])
+def test_aggregates_are_exact_and_the_sample_bounded(n):
+    durations = np.random.default_rng(1).lognormal(-7.0, 1.0, n)
+    times = PhaseTimes(nsample=256)
+    for d in durations:
+        times.add(d)
+    stats = times.stats()
+    assert stats['count'] == n and len(times.sample) == 256
+    assert stats['total'] == pytest.approx(durations.sum(), rel=1e-12)
+    assert stats['mean'] == pytest.approx(durations.mean(), rel=1e-12)
+    assert (stats['min'], stats['max']) == (durations.min(), durations.max())
+    p95 = np.percentile(durations, 95)
+    if n <= 256:
+        assert stats['p95'] == p95
+    else:
+        # The sample p95 is within a few percentiles of the true one.
+        assert np.percentile(durations, 90) < stats['p95'] < np.percentile(durations, 99)
+
+################################################################################
+def test_write_goes_to_the_directory(tmp_path):
+    timers = CouplerTimers(True)
+    for phase in ('nn_run', 'adcirc_run', 'nn_run'):
+        timers.start(phase)
+        timers.stop(phase)
+    summary = timers.write(str(tmp_path), 2, 4)
+    with open(tmp_path / '{}.0002.json'.format(TIMING_FILE_BASENAME)) as f:
+        written = json.load(f)
+    assert (written['myid'], written['npes']) == (2, 4)
+    assert written['phases'] == summary and summary['nn_run']['count'] == 2
+    lines = (tmp_path / '{}.0002.csv'.format(TIMING_FILE_BASENAME)).read_text().splitlines()
+    assert lines[0] == ','.join(('phase',) + TIMING_STATS)
+    assert sorted(line.split(',')[0] for line in lines[1:]) == ['adcirc_run', 'nn_run']
+
+################################################################################
+def test_coupled_run_writes_to_the_input_directory(inputdir, weights, tmp_path_factory,
+        monkeypatch):
+    monkeypatch.chdir(tmp_path_factory.mktemp('cwd'))
+    _, adcnn = run_coupler('AdndA', nnweights=weights, timing=True)
+    with open(inputdir / '{}.0000.json'.format(TIMING_FILE_BASENAME)) as f:
+        phases = json.load(f)['phases']
+    assert phases['nn_run']['count'] == adcnn.ncouplingintervals
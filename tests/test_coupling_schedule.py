@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+#------------------------------------------------------------------------------#
+# adcirc-nn - Software for physics-based machine learning with ADCIRC
+# LICENSE: BSD 3-Clause "New" or "Revised"
+#------------------------------------------------------------------------------#
+"""The exact coupling schedule against the float loops it replaced."""
+import math
+
+import pytest
+
+from adcirc_nn.coupler.adcirc_nn_class import TIME_TOL
+from adcirc_nn.coupler.coupling_schedule import CouplingSchedule
+from adcirc_nn.coupler.lstmnn import NN_STEP_TOL
+
+################################################################################
+def float_loop_plan(nndt, nntfinal, dtdp, statim, rnday):
+    """Return the (NN niter, ADCIRC time steps) of each coupling interval, NN first.
+
+    Replays the while loops of the coupler before CouplingSchedule: the NN runs
+    on by whole NN steps past ADCIRC's next time, ADCIRC catches up within
+    TIME_TOL, and either finishes off once the other is done. NN times are in
+    seconds; niter is None for intervals without an NN run.
+    """
+    adcirctstart = statim*86400.0
+    adcirctfinal = (statim + rnday)*86400.0
+    adcircntsteps = int(round(rnday*86400.0/dtdp))
+    nntimer = nniter = 0.0
+    adcirctprev = adcirctnext = adcirctstart
+    itime_bgn = 1
+    adcircrun = nnrun = True
+    plan = []
+    while adcirctprev < adcirctfinal or nntimer < nntfinal:
+        niter = None
+        if nntimer < nntfinal:
+            superdt = nndt
+            while nntimer + superdt < adcirctprev + dtdp - TIME_TOL:
+                superdt += nndt
+            nniter += int(max(1.0, superdt + TIME_TOL))
+            if not adcircrun:
+                nniter = nntfinal
+            nntimer += max(0, math.ceil((nniter - nntimer)/nndt - NN_STEP_TOL))*nndt
+            niter = nniter
+        else:
+            nnrun = False
+        ntsteps = 0
+        if adcirctprev < adcirctfinal:
+            while adcirctnext < nntimer - dtdp + TIME_TOL:
+                ntsteps += 1
+                adcirctnext += dtdp
+            if not nnrun:
+                ntsteps = adcircntsteps - itime_bgn + 1
+                adcirctnext = adcirctfinal
+            ntsteps = min(ntsteps, adcircntsteps - itime_bgn + 1)
+            itime_bgn += ntsteps
+            adcirctprev = (itime_bgn - 1)*dtdp + adcirctstart
+        else:
+            adcircrun = False
+        plan.append((niter, ntsteps))
+    return plan
+
+################################################################################
+@pytest.mark.parametrize('nndt, nntfinal, dtdp, rnday', [
+    (60.0, 21600.0, 2.0, 0.25),
+    (60.0, 21600.0, 45.0, 0.25),
+    (300.0, 21600.0, 45.0, 0.25),
+    (45.0, 21600.0, 60.0, 0.25),
+    (60.0, 21600.0, 2.0, 0.1),   # ADCIRC done first
+    (60.0, 7200.0, 45.0, 0.25),  # NN done first
+    ])
+def test_schedule_matches_float_loops(nndt, nntfinal, dtdp, rnday):
+    schedule = CouplingSchedule(nndt, 0.0, nntfinal, dtdp, 0.0, rnday*86400.0,
+            int(round(rnday*86400.0/dtdp)))
+    plan = [(iv.nniter if iv.nnrun else None, iv.adcircntsteps) for iv in schedule.plan()]
+    assert plan == float_loop_plan(nndt, nntfinal, dtdp, 0.0, rnday)
+
+################################################################################
+def test_schedule_does_not_drift():
+    # Time steps that are not binary fractions, over many intervals.
+    nndt, dtdp, nsteps = 0.3, 0.1, 2*10**4
+    schedule = CouplingSchedule(nndt, 0.0, nndt*nsteps, dtdp, 0.0, nndt*nsteps, 3*nsteps)
+    summary = schedule.summary()
+    assert summary['intervals'] == nsteps
+    assert summary['nn_steps'] == nsteps
+    assert summary['adcirc_steps'] == 3*nsteps
+    assert all(iv.adcircntsteps == 3 for iv in schedule.plan())
@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+#------------------------------------------------------------------------------#
+# adcirc-nn - Software for physics-based machine learning with ADCIRC
+# LICENSE: BSD 3-Clause "New" or "Revised"
+#------------------------------------------------------------------------------#
+"""Several, and non-contiguous, edge strings are coupled as each one alone."""
+import numpy as np
+import pytest
+
+from conftest import run_coupler
+from adcirc_nn.coupler import mock_libadcpy
+from adcirc_nn.coupler.lstmnn import random_lstm_weights
+
+MOCK_EDGE_STRINGS = {'nope': 3, 'neta': 21} # Three edge strings of 7 nodes
+STOP = 200 # ADCIRC time step at which the runs are stopped, while the NN is on
+
+################################################################################
+@pytest.fixture
+def strings(inputdir):
+    """Return files of random LSTM weights, one per edge string of the mock mesh."""
+    mock_libadcpy.configure(**MOCK_EDGE_STRINGS)
+    filenames = []
+    for seed in range(MOCK_EDGE_STRINGS['nope']):
+        filenames.append(str(inputdir / 'weights-{}.npz'.format(seed)))
+        np.savez(filenames[-1], dt=60.0, niter=21600.0, **random_lstm_weights(1, 16, seed=seed))
+    return filenames
+
+################################################################################
+def test_non_contiguous_strings_take_their_own_values(strings):
+    (_, esbin2, _, elev), adcnn = run_coupler('ndA', '1,3', stop=STOP,
+        nnweights=[strings[0], strings[2]])
+    np.testing.assert_array_equal(adcnn.adcircedgestringesbin,
+        np.concatenate([np.arange(0, 7), np.arange(14, 21)]))
+    np.testing.assert_array_equal(esbin2[7:14], 0.0) # Edge string 2 is not coupled
+    assert elev[0] != elev[7]
+    # Each edge string has the values it has when coupled alone.
+    for i, first in [(0, 0), (2, 14)]:
+        (_, alone, _, _), single = run_coupler('ndA', str(i+1), stop=STOP, nnweights=strings[i])
+        assert single.adcircedgestringesbin == slice(first, first+7)
+        np.testing.assert_array_equal(esbin2[first:first+7], alone[first:first+7])
+        np.testing.assert_array_equal(esbin2[first:first+7], np.full(7, esbin2[first]))
+
+################################################################################
+@pytest.mark.parametrize('couplingtype', ['Adn', 'AdndA'])
+@pytest.mark.parametrize('edgestrings', ['1,3', '3,1,2'])
+def test_nn_inputs_are_the_mean_of_each_string(strings, couplingtype, edgestrings):
+    ids = [int(i)-1 for i in edgestrings.split(',')]
+    (eta2, _, _, _), adcnn = run_coupler(couplingtype, edgestrings, stop=STOP,
+        nnweights=[strings[i] for i in ids])
+    pb, dp = mock_libadcpy.pyboundaries, mock_libadcpy.pymesh.dp
+    assert adcnn.adcirc_hprev.shape == (len(ids),)
+    for mean, i in zip(adcnn.adcirc_hprev, ids):
+        nodes = pb.nbvv[i, 1:pb.nvell[i]+1] - 1
+        assert mean == pytest.approx(np.mean(eta2[nodes] + dp[nodes]), rel=1e-12)
+
+################################################################################
+@pytest.mark.parametrize('couplingtype', ['Adn', 'AdndA'])
+def test_ghost_nodes_are_not_counted(strings, couplingtype):
+    mock_libadcpy.configure(nghost=4) # The last 4 nodes of edge string 3 are owned by PE 1
+    (eta2, _, _, _), adcnn = run_coupler(couplingtype, '1,3', stop=STOP,
+        nnweights=[strings[0], strings[2]])
+    pb, dp = mock_libadcpy.pyboundaries, mock_libadcpy.pymesh.dp
+    assert adcnn.adcirc_hprev_len == 7 + 3
+    nodes = pb.nbvv[2, 1:4] - 1
+    assert adcnn.adcirc_hprev[1] == pytest.approx(np.mean(eta2[nodes] + dp[nodes]), rel=1e-12)
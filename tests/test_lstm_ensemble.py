@@ -0,0 +1,50 @@
+#!/usr/bin/env python
+#------------------------------------------------------------------------------#
+# adcirc-nn - Software for physics-based machine learning with ADCIRC
+# LICENSE: BSD 3-Clause "New" or "Revised"
+#------------------------------------------------------------------------------#
+"""The ensemble LSTM draws its dropout masks and input noise into its preallocated buffers."""
+import tracemalloc
+
+import numpy as np
+import pytest
+
+from adcirc_nn.coupler.lstmnn import LongShortTermMemoryNN_class, random_lstm_weights
+
+ENSEMBLE_SIZE = 8
+
+################################################################################
+def ensemble(tmp_path, precision, dropout=0.2, forcingnoise=0.1):
+    """Return an initialized LSTM ensemble, forced by a sine wave."""
+    filename = str(tmp_path / 'weights.npz')
+    np.savez(filename, dt=60.0, niter=21600.0, **random_lstm_weights(1, 32))
+    nn = LongShortTermMemoryNN_class(weightsfile=filename, ensemblesize=ENSEMBLE_SIZE,
+        dropout=dropout, forcingnoise=forcingnoise, precision=precision)
+    nn.initialize()
+    times = np.linspace(0.0, 21600.0, 100)
+    nn.set_forcing(times, np.sin(times/3000.0)[:,None])
+    return nn
+
+################################################################################
+@pytest.mark.parametrize('precision', ['float64', 'float32'])
+def test_chunks_do_not_allocate_member_arrays(tmp_path, precision):
+    nn = ensemble(tmp_path, precision)
+    nn.niter = nn.timer + 60.0*nn.chunksize
+    nn.run() # Warm up
+    tracemalloc.start()
+    nn.niter = nn.timer + 60.0*4*nn.chunksize
+    nn.run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert peak < ENSEMBLE_SIZE*nn.chunksize*nn.hiddensize*8/4 # A fraction of a mask
+
+################################################################################
+@pytest.mark.parametrize('precision', ['float64', 'float32'])
+def test_ensemble_runs_repeat(tmp_path, precision):
+    elevs = []
+    for _ in range(2):
+        nn = ensemble(tmp_path, precision)
+        nn.niter = nn.timer + 60.0*(nn.chunksize + 7)
+        nn.run()
+        elevs.append(np.copy(nn.elev))
+    np.testing.assert_array_equal(elevs[0], elevs[1])
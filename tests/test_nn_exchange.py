@@ -0,0 +1,30 @@
+#!/usr/bin/env python
+#------------------------------------------------------------------------------#
+# adcirc-nn - Software for physics-based machine learning with ADCIRC
+# LICENSE: BSD 3-Clause "New" or "Revised"
+#------------------------------------------------------------------------------#
+"""The NN state exchange sends the elevations only, and needs mpi4py in parallel."""
+from types import SimpleNamespace
+
+import pytest
+
+from adcirc_nn.coupler import nn_exchange
+from adcirc_nn.coupler.lstmnn import LongShortTermMemoryNN_class
+
+################################################################################
+def test_exchange_sends_elevations_only():
+    nn = LongShortTermMemoryNN_class()
+    nn.initialize()
+    nn.timer, nn.niter = 120.0, 300.0
+    exchange = nn_exchange.NNStateExchange(nelev=3)
+    # A PE other than PE 0 takes the NN time from the plan.
+    exchange.exchange(SimpleNamespace(myid=1, nn=nn))
+    assert nn.timer == nn.timer_after(300.0, 120.0) == 300.0
+    assert exchange.nvalues == 3 and exchange.nexchanges == 1
+
+################################################################################
+def test_parallel_run_needs_mpi4py(monkeypatch):
+    monkeypatch.setattr(nn_exchange, '_MPI', None)
+    nn_exchange.require_mpi4py(SimpleNamespace(npes=1))
+    with pytest.raises(ImportError, match='mpi4py'):
+        nn_exchange.require_mpi4py(SimpleNamespace(npes=4))
@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+#------------------------------------------------------------------------------#
+# adcirc-nn - Software for physics-based machine learning with ADCIRC
+# LICENSE: BSD 3-Clause "New" or "Revised"
+#------------------------------------------------------------------------------#
+"""The NN cache, the NN pipeline, and float32 inference leave the results as they are."""
+import numpy as np
+import pytest
+
+from conftest import run_coupler
+from adcirc_nn.coupler.adcirc_nn_class import COUPLING_TYPES
+from adcirc_nn.coupler.nn_pipeline import NN_PIPELINE_MODES
+from adcirc_nn.coupler.nn_shadow_check import NN_SHADOW_WINDOW
+
+FLOAT32_TOL = 1.0e-5 # Boundary values of the float32 NN against float64
+
+################################################################################
+def assert_same_results(x, y):
+    """Assert that the end states of two runs are the same, bit for bit."""
+    for a, b in zip(x, y):
+        np.testing.assert_array_equal(a, b)
+
+################################################################################
+@pytest.mark.parametrize('couplingtype', COUPLING_TYPES)
+def test_cache_gives_same_results(inputdir, weights, couplingtype):
+    plain, _ = run_coupler(couplingtype, nnweights=weights)
+    cachedir = str(inputdir / 'nn-cache')
+    cached, adcnn = run_coupler(couplingtype, nnweights=weights, nncachesize=4, nncachedir=cachedir)
+    assert adcnn.nn.cache.misses > 0
+    assert_same_results(plain, cached)
+    # A rerun takes every NN run from the directory.
+    rerun, adcnn = run_coupler(couplingtype, nnweights=weights, nncachesize=4, nncachedir=cachedir)
+    assert adcnn.nn.cache.misses == 0 and adcnn.nn.cache.diskhits > 0
+    assert_same_results(plain, rerun)
+
+################################################################################
+@pytest.mark.parametrize('mode', NN_PIPELINE_MODES)
+def test_pipeline_gives_same_results(inputdir, weights, mode):
+    inline, _ = run_coupler('ndA', nnweights=weights)
+    pipelined, adcnn = run_coupler('ndA', nnweights=weights, nnpipeline=mode, nnpipelinedepth=3)
+    # The NN ran on the worker only; the coupler's copy never left its initial state.
+    assert not np.any(adcnn.nn.h)
+    assert_same_results(inline, pipelined)
+
+################################################################################
+@pytest.mark.parametrize('couplingtype', COUPLING_TYPES)
+def test_float32_close_to_float64(inputdir, weights, couplingtype):
+    double, _ = run_coupler(couplingtype, nnweights=weights)
+    single, adcnn = run_coupler(couplingtype, nnweights=weights, nnprecision='float32',
+            nnshadowcheck=1)
+    for a, b in zip(double, single):
+        np.testing.assert_allclose(a, b, rtol=0.0, atol=FLOAT32_TOL)
+    shadow = adcnn.nnshadowcheck
+    assert shadow.nchecks == shadow.nshadowruns == shadow.nruns > 0
+    assert shadow.maxdeviation < FLOAT32_TOL
+
+################################################################################
+def test_shadow_runs_in_check_windows_only(inputdir, weights):
+    _, adcnn = run_coupler('ndA', nnweights=weights, nnprecision='float32', nnshadowcheck=25)
+    shadow = adcnn.nnshadowcheck
+    nwindows, rest = divmod(shadow.nruns, shadow.every)
+    assert shadow.window == NN_SHADOW_WINDOW
+    assert shadow.nshadowruns == nwindows*shadow.window + min(rest, shadow.window)
+    assert shadow.nshadowruns < shadow.nruns
@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+#------------------------------------------------------------------------------#
+# adcirc-nn - Software for physics-based machine learning with ADCIRC
+# LICENSE: BSD 3-Clause "New" or "Revised"
+#------------------------------------------------------------------------------#
+"""A rerun sweep skips the scenarios it has done, and reruns the changed ones;
+the paths of the scenario table are relative to it."""
+import os
+
+from conftest import MOCK_TEST_CONFIG
+from adcirc_nn.coupler.scenario_sweep import read_scenarios, run_sweep
+
+SCENARIO_TABLE = """name,couplingtype,edgestrings,inputdir,couplingtol
+one-way,ndA,1,inputs,
+two-way,AdndA,1,inputs,{}
+"""
+
+################################################################################
+def write_table(directory, couplingtol):
+    """Write the scenario table, and the fort.* inputs it points to, to directory."""
+    (directory / 'inputs').mkdir(exist_ok=True)
+    (directory / 'inputs' / 'fort.15').write_text('mock ADCIRC input\n')
+    table = directory / 'scenarios.csv'
+    table.write_text(SCENARIO_TABLE.format(couplingtol))
+    return str(table)
+
+################################################################################
+def test_rerun_skips_done_scenarios(tmp_path, monkeypatch):
+    # The pool processes start afresh, and take the mock ADCIRC setup from the environment.
+    for key, value in MOCK_TEST_CONFIG.items():
+        monkeypatch.setenv('ADCIRC_NN_MOCK_' + key.upper(), str(value))
+    sweepdir = str(tmp_path / 'sweep')
+    lines = []
+
+    index = run_sweep(read_scenarios(write_table(tmp_path, 0.01)), sweepdir, jobs=2,
+            progress=lines.append)
+    assert all(summary['status'] == 'done' for summary in index['scenarios'].values())
+    pids = {name: summary['pid'] for name, summary in index['scenarios'].items()}
+
+    del lines[:]
+    index = run_sweep(read_scenarios(write_table(tmp_path, 0.01)), sweepdir, jobs=2,
+            progress=lines.append)
+    assert len(lines) == 2 and all(line.endswith('done earlier') for line in lines)
+    assert {name: summary['pid'] for name, summary in index['scenarios'].items()} == pids
+
+    # A changed setting reruns its scenario only.
+    del lines[:]
+    index = run_sweep(read_scenarios(write_table(tmp_path, 0.02)), sweepdir, jobs=2,
+            progress=lines.append)
+    lines = sorted(lines)
+    assert lines[0] == '{:<24} done earlier'.format('one-way')
+    assert lines[1].startswith('{:<24} done in '.format('two-way'))
+    assert index['scenarios']['one-way']['pid'] == pids['one-way']
+    assert index['scenarios']['two-way']['scenario']['options']['couplingtol'] == 0.02
+
+################################################################################
+def test_paths_are_relative_to_the_table(tmp_path, monkeypatch, weights):
+    for key, value in MOCK_TEST_CONFIG.items():
+        monkeypatch.setenv('ADCIRC_NN_MOCK_' + key.upper(), str(value))
+    (tmp_path / 'inputs').mkdir()
+    (tmp_path / 'inputs' / 'fort.15').write_text('mock ADCIRC input\n')
+    table = tmp_path / 'scenarios.csv'
+    table.write_text('name,couplingtype,edgestrings,inputdir,nnweights,harvest\n'
+            'weighted,ndA,1,inputs,{},harvest\n'.format(os.path.basename(weights)))
+
+    scenarios = read_scenarios(str(table))
+    assert scenarios[0]['options'] == {'nnweights': weights,
+            'harvest': str(tmp_path / 'harvest')}
+    index = run_sweep(scenarios, str(tmp_path / 'sweep'), jobs=1, progress=lambda line: None)
+    summary = index['scenarios']['weighted']
+    assert summary['status'] == 'done', summary.get('error')
+    assert summary['outputs']['harvest_records'] > 0
+    assert os.path.isdir(tmp_path / 'harvest')
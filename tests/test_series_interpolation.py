@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+#------------------------------------------------------------------------------#
+# adcirc-nn - Software for physics-based machine learning with ADCIRC
+# LICENSE: BSD 3-Clause "New" or "Revised"
+#------------------------------------------------------------------------------#
+"""The PCHIP series passes through the NN outputs, without overshoot, in npieces pieces."""
+import math
+
+import numpy as np
+import pytest
+
+from conftest import run_coupler
+from adcirc_nn.coupler import mock_libadcpy
+from adcirc_nn.coupler.series_interpolation import SeriesInterpolator
+
+################################################################################
+def interpolator(times, values, npieces=4):
+    """Return an interpolator fed with the outputs values at times."""
+    values = np.asarray(values, dtype=float).reshape(len(times), -1)
+    interp = SeriesInterpolator(values.shape[1], npieces)
+    for t, y in zip(times, values):
+        interp.append(t, y)
+    return interp
+
+################################################################################
+@pytest.mark.parametrize('values', [[0.0, 1.0, 3.0], [0.0, 2.0, 1.0], [[1.0, 0.0], [2.0, 0.5], [2.5, -1.0]]])
+def test_segment_ends_at_the_last_outputs(values):
+    interp = interpolator([0.0, 60.0, 120.0], values)
+    y = np.asarray(values, dtype=float).reshape(3, -1)
+    np.testing.assert_allclose(interp(60.0), y[1], rtol=0.0, atol=1e-15)
+    np.testing.assert_allclose(interp(120.0), y[2], rtol=0.0, atol=1e-15)
+    np.testing.assert_allclose(interp(600.0), y[2], rtol=0.0, atol=1e-15) # Held beyond
+
+################################################################################
+@pytest.mark.parametrize('values', [[0.0, 1.0, 3.0], [0.0, 2.0, 1.0], [3.0, 1.0, 0.9]])
+def test_segment_does_not_overshoot(values):
+    interp = interpolator([0.0, 60.0, 120.0], values)
+    inside = np.array([interp(t)[0] for t in np.linspace(60.0, 120.0, 61)])
+    assert inside.min() >= min(values[1:]) - 1e-15
+    assert inside.max() <= max(values[1:]) + 1e-15
+
+################################################################################
+def test_two_outputs_are_linear():
+    interp = interpolator([0.0, 60.0], [1.0, 2.0])
+    assert interp(15.0)[0] == pytest.approx(1.25)
+    assert interp(30.0)[0] == pytest.approx(1.5)
+
+################################################################################
+@pytest.mark.parametrize('ntsteps, steps', [(1, 1), (3, 1), (4, 1), (8, 2), (9, 3), (16, 4)])
+def test_piece_splits_into_at_most_npieces(ntsteps, steps):
+    interp = SeriesInterpolator(1, 4)
+    assert interp.piece(ntsteps) == steps
+    assert math.ceil(ntsteps/steps) <= 4
+
+################################################################################
+@pytest.mark.parametrize('npieces', [1, 2, 4])
+def test_coupled_run_counts_pieces(inputdir, weights, npieces):
+    mock_libadcpy.configure(dt=15.0)
+    (_, esbin2, _, elev), adcnn = run_coupler('ndA', nnweights=weights, seriesinterp='pchip',
+        seriespieces=npieces)
+    interp = adcnn.seriesinterpolator
+    # The NN output at the start is the first point, so every interval is interpolated.
+    plan = adcnn.schedule.plan()
+    assert all(iv.adcircntsteps == 4 for iv in plan)
+    assert interp.npiecesrun == len(plan)*npieces
+    # The series set by the NN is back at the end of the run.
+    np.testing.assert_array_equal(esbin2[adcnn.adcircedgestringesbin], elev)
@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+#------------------------------------------------------------------------------#
+# adcirc-nn - Software for physics-based machine learning with ADCIRC
+# LICENSE: BSD 3-Clause "New" or "Revised"
+#------------------------------------------------------------------------------#
+"""Harvest shards hold the records as given, and a resumed run continues their numbering."""
+import os
+import types
+
+import numpy as np
+import pytest
+
+from conftest import run_coupler
+from test_checkpoint import HOTSTART_INTERVAL, run_resumed
+from adcirc_nn.coupler import mock_libadcpy
+from adcirc_nn.coupler.training_harvest import (HARVEST_FILE_BASENAME, HARVEST_VERSION,
+    TrainingHarvest, iter_harvest, read_harvest_index, split_inputs)
+
+STEPS = [1, 0, 3, 2, 1, 4, 2] # NN steps of the recorded intervals
+
+################################################################################
+def record(harvest, index):
+    """Record coupling interval index, with STEPS[index] NN steps of inputs."""
+    anns = types.SimpleNamespace(adcirctprev=60.0*index,
+        nn=types.SimpleNamespace(timer=float(index), timefact=60.0, elev=np.array([0.5*index])))
+    harvest.record(anns, index, STEPS[index] > 0, np.array([index, -index]), inputs(index))
+
+################################################################################
+def inputs(index):
+    """Return the NN inputs recorded for interval index."""
+    return 100.0*index + np.arange(2*STEPS[index]).reshape(-1, 2)
+
+################################################################################
+def read_records(directory):
+    """Return the fields of all records of a harvest, and the NN inputs of each."""
+    shards = list(iter_harvest(directory))
+    fields = {name: np.concatenate([shard[name] for shard in shards]) for name in shards[0]
+        if name != 'nn_input'}
+    return fields, [x for shard in shards for x in split_inputs(shard)]
+
+################################################################################
+def test_shards_hold_the_records(tmp_path):
+    harvest = TrainingHarvest(str(tmp_path), 2, 1, 2, metadata={'nndt': 60.0}, shardsize=3)
+    for index in range(len(STEPS)):
+        record(harvest, index)
+    harvest.close()
+    index = read_harvest_index(str(tmp_path))
+    assert index['version'] == HARVEST_VERSION and index['metadata'] == {'nndt': 60.0}
+    assert index['fields']['nn_input'] == {'dtype': '<f8', 'shape': [2], 'ragged': True}
+    assert [shard['file'] for shard in index['shards']] == [
+        '{}.{:05d}.npz'.format(HARVEST_FILE_BASENAME, i) for i in range(3)]
+    assert [shard['nrecords'] for shard in index['shards']] == [3, 3, 1]
+    assert [shard['ninputrows'] for shard in index['shards']] == [4, 7, 2]
+    assert [shard['intervals'] for shard in index['shards']] == [[0, 2], [3, 5], [6, 6]]
+    fields, nninputs = read_records(str(tmp_path))
+    np.testing.assert_array_equal(fields['interval'], np.arange(len(STEPS)))
+    np.testing.assert_array_equal(fields['nnsteps'], STEPS)
+    np.testing.assert_array_equal(fields['nnrun'], np.array(STEPS) > 0)
+    np.testing.assert_array_equal(fields['nn_input_offset'], [0, 1, 1, 0, 2, 3, 0])
+    np.testing.assert_array_equal(fields['nn_output'][:,0], 0.5*np.arange(len(STEPS)))
+    np.testing.assert_array_equal(fields['response'][:,1], -np.arange(len(STEPS)))
+    for index, x in enumerate(nninputs):
+        np.testing.assert_array_equal(x, inputs(index))
+
+################################################################################
+def test_input_buffer_grows(tmp_path):
+    harvest = TrainingHarvest(str(tmp_path), 2, 1, 2, shardsize=len(STEPS))
+    for index in range(len(STEPS)-1):
+        record(harvest, index)
+    assert len(harvest.buffer['nn_input']) >= sum(STEPS[:-1]) > len(STEPS)
+    record(harvest, len(STEPS)-1)
+    harvest.close()
+    _, nninputs = read_records(str(tmp_path))
+    for index, x in enumerate(nninputs):
+        np.testing.assert_array_equal(x, inputs(index))
+
+################################################################################
+def test_resume_continues_the_shard_numbers(tmp_path):
+    harvest = TrainingHarvest(str(tmp_path), 2, 1, 2, shardsize=2)
+    for index in range(3):
+        record(harvest, index)
+    harvest.flush(wait=True) # A checkpoint, after shards 0 and 1
+    assert harvest.nshards == 2
+    for index in range(3, 6):
+        record(harvest, index) # Shard 2, and a partial one lost with the run
+    harvest.flush(wait=True)
+    assert os.path.exists(tmp_path / '{}.00002.npz'.format(HARVEST_FILE_BASENAME))
+    # The resumed run drops the shards after the checkpoint, and writes them again.
+    harvest = TrainingHarvest(str(tmp_path), 2, 1, 2, shardsize=2, resume=2)
+    assert not os.path.exists(tmp_path / '{}.00002.npz'.format(HARVEST_FILE_BASENAME))
+    assert (harvest.nshards, harvest.nrecords) == (2, 3)
+    for index in range(3, len(STEPS)):
+        record(harvest, index)
+    harvest.close()
+    assert [shard['file'] for shard in read_harvest_index(str(tmp_path))['shards']] == [
+        '{}.{:05d}.npz'.format(HARVEST_FILE_BASENAME, i) for i in range(4)]
+    fields, nninputs = read_records(str(tmp_path))
+    np.testing.assert_array_equal(fields['interval'], np.arange(len(STEPS)))
+    for index, x in enumerate(nninputs):
+        np.testing.assert_array_equal(x, inputs(index))
+
+################################################################################
+@pytest.mark.parametrize('couplingtype', ['ndA', 'AdndA'])
+def test_resumed_run_harvests_as_full_run(inputdir, weights, couplingtype):
+    # Adaptive coupling runs several NN steps in some intervals.
+    settings = dict(nnweights=weights, couplingtol=1.0e-6, couplingmaxspan=4, harvestshardsize=16)
+    mock_libadcpy.configure(nhsinc=HOTSTART_INTERVAL)
+    run_coupler(couplingtype, harvest=str(inputdir / 'full'), **settings)
+    run_resumed(couplingtype, harvest=str(inputdir / 'resumed'), **settings)
+    full, fullinputs = read_records(str(inputdir / 'full'))
+    resumed, resumedinputs = read_records(str(inputdir / 'resumed'))
+    assert full['nnsteps'].max() > 1
+    for name in full:
+        np.testing.assert_array_equal(full[name], resumed[name])
+    assert len(fullinputs) == len(resumedinputs)
+    for x, y in zip(fullinputs, resumedinputs):
+        np.testing.assert_array_equal(x, y)